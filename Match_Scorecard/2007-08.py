@@ -20,6 +20,18 @@ import random
 import re
 from urllib.parse import urljoin
 import sys # Import sys to use sys.exit() more reliably
+# Shared helper modules live in the repository root (one level up)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from layout_fingerprint import LayoutCache, select_layout
+from error_sink import ParseErrorSink, LayoutBrokenError
+import parquet_warehouse
+import season_summary
+import sqlite_store
+import snapshot_diff
+from html_archive import HtmlArchive
+from streaming_writer import StreamingTableWriter, merge_side_file, side_file_path
+from keyed_upsert import BATTING_KEY, BOWLING_KEY
+from pipeline_manifest import StageManifest, module_files, season_is_complete
 
 # --- Configuration ---
 # !!! UPDATE THIS FOR THE DESIRED SEASON !!!
@@ -29,6 +41,13 @@ TARGET_SEASON = '2007/08' # <--- UPDATED FOR 2025
 # Example URL: https://www.espncricinfo.com/records/season/team-match-results/2025-2025?trophy=XXXX <-- Find XXXX
 TROPHY_ID = '117' # Placeholder - Almost certainly incorrect for 2025. UPDATE THIS!
 RETRY_FAILED_SCORECARDS = True # Flag to enable retry mechanism
+WRITE_PARQUET_WAREHOUSE = True # Also write summary/batting/bowling to the Parquet warehouse (skipped if pyarrow is missing)
+WRITE_SQLITE_STORE = True # Also upsert summary/batting/bowling into the SQLite store (sqlite_store.py)
+WRITE_CHANGE_SETS = True # Diff each output against the previous run and write a change set (snapshot_diff.py)
+ARCHIVE_RAW_PAGES = True # Keep every fetched summary/scorecard page in the compressed page archive (html_archive.py)
+SKIP_IF_UP_TO_DATE = True # A completed season whose inputs, outputs, code and config are unchanged is not scraped again (pipeline_manifest.py)
+# Shared modules whose source counts as this script's code version in the manifest
+MANIFEST_CODE_MODULES = ['layout_fingerprint', 'error_sink', 'parquet_warehouse', 'sqlite_store', 'streaming_writer', 'keyed_upsert', 'season_summary']
 
 # --- Directory and File Naming ---
 # Base prefix for files/dirs based on season
@@ -52,18 +71,24 @@ BATTING_CSV_FILENAME = f"{season_file_prefix}_All_matches_batting.csv"
 BOWLING_CSV_FILENAME = f"{season_file_prefix}_All_matches_bowling.csv"
 BATTING_CSV_PATH = os.path.join(DATA_DIR, BATTING_CSV_FILENAME)
 BOWLING_CSV_PATH = os.path.join(DATA_DIR, BOWLING_CSV_FILENAME)
+PARSE_ERROR_REPORT_PATH = os.path.join(LOG_DIR, f"{season_file_prefix}_parse_errors.json")
+
+# --- Streamed Output Layout (rows are appended to the CSVs as each scorecard finishes) ---
+STREAM_BATCH_SIZE = 200
+BATTING_CSV_COLUMNS = ['Match ID', 'Innings', 'Batting Team', 'Batter', 'Batter id', 'Run Scored', 'Ball faced', 'Fours', 'Sixes', 'Strike rate', 'Dismissal Type', 'Dismissal Player', 'Dismissal Bowler']
+BATTING_INT_COLUMNS = ['Batter id', 'Run Scored', 'Ball faced', 'Fours', 'Sixes']
+BATTING_FLOAT_COLUMNS = ['Strike rate']
+BOWLING_CSV_COLUMNS = ['Match ID', 'Innings', 'Bowling Team', 'Bowler', 'Bowler id', 'Over bowled', 'Maiden Over', 'Run given', 'Wicket taken', 'Economy rate', 'Wides', 'No balls', 'Dot balls', 'Fours', 'Sixes']
+BOWLING_INT_COLUMNS = ['Bowler id', 'Maiden Over', 'Run given', 'Wicket taken', 'Wides', 'No balls', 'Dot balls', 'Fours', 'Sixes']
+BOWLING_FLOAT_COLUMNS = ['Over bowled', 'Economy rate']
 
 # --- URLs ---
 BASE_CRICINFO_URL = 'https://www.espncricinfo.com'
-SEASON_URL_TEMPLATE = '/records/season/team-match-results/{season_url_part}-{season_url_part}?trophy={trophy_id}'
 
 # --- Selectors (!!! CRITICAL: THESE NEED VERIFICATION/UPDATING FOR 2025 PAGES !!!) ---
 # The selectors below MIGHT FAIL for 2025. Website structure changes often.
 # You MUST inspect the 2025 pages and update these selectors if necessary.
-SEASON_WAIT_CONTAINER_SELECTOR = '#main-container div.ds-relative div div.ds-grow > div:nth-child(2) > div > div:nth-child(1)' # LIKELY NEEDS VERIFICATION for 2025
-SEASON_TABLE_SELECTOR_IN_SOUP = 'div.ds-overflow-x-auto > table' # LIKELY NEEDS VERIFICATION for 2025
-SEASON_TABLE_SELECTOR_SELENIUM = SEASON_TABLE_SELECTOR_IN_SOUP # LIKELY NEEDS VERIFICATION for 2025
-SEASON_COL_INDICES = {'Team 1': 1, 'Team 2': 2, 'Winner': 3, 'Margin': 4, 'Ground': 5, 'Match Date': 6, 'Scorecard': 7} # Verify column order for 2025
+# The season summary page (URL, selectors, columns) is fetched, parsed and cached by season_summary.py
 SCORECARD_WAIT_SELECTOR = '#main-container' # Might be okay, but verify
 
 # Scorecard selectors - VERY LIKELY WRONG/DIFFERENT for 2025 - MUST BE UPDATED
@@ -75,6 +100,21 @@ INNINGS_2_BATTING_TEAM_SELECTOR = '#main-container > div.ds-relative > div > div
 INNINGS_2_BATTING_TABLE_SELECTOR = '#main-container > div.ds-relative > div > div > div.ds-flex.ds-space-x-5 > div.ds-grow > div.ds-mt-3 > div:nth-child(1) > div:nth-child(3) > div > div.ds-p-0 > table.ci-scorecard-table'
 INNINGS_2_BOWLING_TABLE_SELECTOR = '#main-container > div.ds-relative > div > div > div.ds-flex.ds-space-x-5 > div.ds-grow > div.ds-mt-3 > div:nth-child(1) > div:nth-child(3) > div > div.ds-p-0 > table:nth-child(2)'
 
+# Known scorecard selector sets. Each fetched page is matched to a set through its layout
+# fingerprint (layout_fingerprint.py, cached on disk), so a page goes straight to the right set.
+# When the site layout changes, add a new set here instead of editing the one above.
+SCORECARD_SELECTOR_SETS = {
+    'ds_scorecard_v1': {
+        'INNINGS_1_BATTING_TEAM': INNINGS_1_BATTING_TEAM_SELECTOR,
+        'INNINGS_1_BATTING_TABLE': INNINGS_1_BATTING_TABLE_SELECTOR,
+        'INNINGS_1_BOWLING_TABLE': INNINGS_1_BOWLING_TABLE_SELECTOR,
+        'INNINGS_2_BATTING_TEAM': INNINGS_2_BATTING_TEAM_SELECTOR,
+        'INNINGS_2_BATTING_TABLE': INNINGS_2_BATTING_TABLE_SELECTOR,
+        'INNINGS_2_BOWLING_TABLE': INNINGS_2_BOWLING_TABLE_SELECTOR,
+    },
+}
+SCORECARD_ANY_TABLE_SELECTOR = '#main-container table' # Layout-agnostic readiness check
+
 DISMISSAL_DETAIL_SELECTOR = 'td > div > span > i'  # Verify dismissal structure for 2025
 BATTING_COL_INDICES = {'Batter': 1, 'Dismissal': 2, 'Runs': 3, 'Balls': 4, 'Mins': 5, '4s': 6, '6s': 7, 'SR': 8} # Verify column order for 2025
 BOWLING_COL_INDICES = {'Bowler': 1, 'Overs': 2, 'Mdns': 3, 'Runs': 4, 'Wkts': 5, 'Econ': 6, 'Dots': 7, '4s': 8, '6s': 9, 'WD': 10, 'NB': 11} # Verify column order for 2025
@@ -105,6 +145,9 @@ logging.info(f"Detailed Bowling Output CSV: {BOWLING_CSV_PATH}")
 logging.warning("!!! CRITICAL: Selectors in this script MAY NEED UPDATING for the {} season. Verify them by inspecting the website HTML structure !!!".format(TARGET_SEASON)) # Updated warning
 logging.warning(f"!!! CRITICAL: YOU MUST Verify TROPHY_ID '{TROPHY_ID}' is correct for the desired {TARGET_SEASON} tournament !!!") # Updated warning
 
+LAYOUT_CACHE = LayoutCache()
+PARSE_ERRORS = ParseErrorSink(f"{season_file_prefix} scorecards")
+HTML_ARCHIVE = HtmlArchive() if ARCHIVE_RAW_PAGES else None
 
 # --- Helper Functions ---
 # (Helper functions remain the same for now, but may need tweaks based on 2025 data formats)
@@ -118,14 +161,6 @@ def safe_get_text(element, default=pd.NA):
         return text if text else default
     return default
 
-def format_season_string(season):
-    """Formats the season string for URLs. Handles single year and year/year formats."""
-    if '/' in season:
-        # For '2020/21', format as '2020to21'
-        return season.replace('/', 'to')
-    # For single year like '2025', format as '2025-2025'
-    return f"{season}-{season}"
-
 def parse_margin(margin_string):
     """Parses the margin string to extract numeric value and type (runs/wickets)."""
     if pd.isna(margin_string) or margin_string == '-':
@@ -244,6 +279,10 @@ def parse_dismissal(dismissal_string):
     if isinstance(bowler, str): bowler = bowler.strip()
     return dismissal_type, fielder, bowler
 
+def scorecard_layout_matches(page_soup, selector_set):
+    """Cheap probe used by select_layout: a selector set matches if its Innings 1 batting table exists."""
+    return page_soup.select_one(selector_set['INNINGS_1_BATTING_TABLE']) is not None
+
 # --- Driver Setup ---
 def setup_driver(driver_path=None, browser_path=None):
     """Sets up the Selenium WebDriver with retries and undetected_chromedriver."""
@@ -271,80 +310,11 @@ def setup_driver(driver_path=None, browser_path=None):
 
 # --- Scraping Functions ---
 
-def scrape_season_summary(driver: WebDriver, season_str: str, season_url_part: str) -> list:
-    """Scrapes the summary data for all matches in a season, handling potential ads."""
-    target_url = urljoin(BASE_CRICINFO_URL, SEASON_URL_TEMPLATE.format(season_url_part=season_url_part, trophy_id=TROPHY_ID))
-    logging.info(f"Getting match summary list for season {season_str} from: {target_url}")
-    season_summary_list = []
-    # !!! Verify column indices for 2025 season summary table !!!
-    max_col_index = max(SEASON_COL_INDICES.values()) if SEASON_COL_INDICES else 0
-    try:
-        driver.get(target_url);
-        logging.info(f"Waiting up to {WAIT_TIME}s for season summary table to be visible: '{SEASON_TABLE_SELECTOR_SELENIUM}'")
-        try:
-            WebDriverWait(driver, WAIT_TIME).until(EC.visibility_of_element_located((By.CSS_SELECTOR, SEASON_TABLE_SELECTOR_SELENIUM)))
-            logging.info("Season summary table is visible.")
-        except TimeoutException:
-            logging.warning(f"Timed out waiting for table visibility. Waiting for container: '{SEASON_WAIT_CONTAINER_SELECTOR}'")
-            WebDriverWait(driver, WAIT_TIME).until(EC.visibility_of_element_located((By.CSS_SELECTOR, SEASON_WAIT_CONTAINER_SELECTOR)))
-            logging.info("Season summary container is visible.")
-        time.sleep(random.uniform(3.0, 5.0))
-        page_soup = BeautifulSoup(driver.page_source, 'lxml')
-        container_div = page_soup.select_one(SEASON_WAIT_CONTAINER_SELECTOR)
-        results_table = None
-        for attempt in range(TABLE_FIND_RETRIES):
-             table_search_area = container_div if container_div else page_soup
-             results_table = table_search_area.select_one(SEASON_TABLE_SELECTOR_IN_SOUP) # !!! Verify selector for 2025 !!!
-             if results_table: logging.info(f"Found season summary table in BeautifulSoup on attempt {attempt + 1}."); break
-             elif attempt < TABLE_FIND_RETRIES - 1:
-                 logging.warning(f"Season summary table not found in soup on attempt {attempt + 1}. Retrying in {TABLE_FIND_DELAY}s..."); time.sleep(TABLE_FIND_DELAY)
-                 page_soup = BeautifulSoup(driver.page_source, 'lxml'); container_div = page_soup.select_one(SEASON_WAIT_CONTAINER_SELECTOR)
-             else: logging.error(f"Season Summary: Results table not found in BeautifulSoup after {TABLE_FIND_RETRIES} attempts."); return []
-        table_body = results_table.find('tbody');
-        if not table_body: logging.warning(f"Season Summary: Table body (tbody) not found {season_str}"); return []
-        match_rows = table_body.find_all('tr', recursive=False); logging.info(f"Found {len(match_rows)} rows in season summary table.")
-        for i, row in enumerate(match_rows):
-            summary_data = {'Season': season_str}
-            try:
-                cols = row.find_all('td', recursive=False)
-                # Check if the number of columns is sufficient before trying to access them by index
-                if len(cols) < max_col_index:
-                    logging.debug(f"Skipping summary row {i + 1}: Found {len(cols)} cols, expected at least {max_col_index}. Likely header/footer/message row.")
-                    continue
-
-                # Check if the first cell indicates a non-data row (e.g., "No results found") - adjust text if needed
-                first_cell_text = safe_get_text(cols[0]).lower()
-                if "no result" in first_cell_text or len(cols) < max_col_index: # Added explicit check again
-                    logging.warning(f"Skipping summary row {i + 1} as it appears to be a non-data row. First cell: '{safe_get_text(cols[0])}'")
-                    continue
-
-                # !!! Verify column indices for 2025 !!!
-                summary_data['Team 1'] = safe_get_text(cols[SEASON_COL_INDICES['Team 1'] - 1])
-                summary_data['Team 2'] = safe_get_text(cols[SEASON_COL_INDICES['Team 2'] - 1])
-                summary_data['Winner'] = safe_get_text(cols[SEASON_COL_INDICES['Winner'] - 1])
-                margin_text = safe_get_text(cols[SEASON_COL_INDICES['Margin'] - 1])
-                net_margin, margin_type = parse_margin(margin_text)
-                summary_data['Net Margin'] = net_margin; summary_data['Margin Type'] = margin_type; summary_data['Margin Raw'] = margin_text
-                ground_cell = cols[SEASON_COL_INDICES['Ground'] - 1]
-                summary_data['Ground Name'] = safe_get_text(ground_cell.find('a'), default=safe_get_text(ground_cell))
-                _, summary_data['Ground ID'] = extract_id_from_href(ground_cell, 'Ground')
-                summary_data['Match Date'] = safe_get_text(cols[SEASON_COL_INDICES['Match Date'] - 1])
-                scorecard_cell = cols[SEASON_COL_INDICES['Scorecard'] - 1]
-                scorecard_href, match_id = extract_id_from_href(scorecard_cell, 'Match')
-                summary_data['Match ID'] = match_id; summary_data['Scorecard Link'] = scorecard_href
-                if pd.isna(match_id) or pd.isna(scorecard_href):
-                    logging.warning(f"Skipping row {i + 1} summary: Missing Match ID ('{match_id}') or Scorecard Link ('{scorecard_href}'). Check selectors/structure.")
-                    continue
-                season_summary_list.append(summary_data)
-            except IndexError:
-                 logging.error(f"Error processing season summary row {i + 1} due to IndexError. Found {len(cols)} columns. Row HTML: {row.prettify()}", exc_info=True)
-            except Exception as e:
-                 logging.error(f"Error processing season summary row {i + 1}: {e}", exc_info=True)
-        logging.info(f"Extracted {len(season_summary_list)} match summaries for season {season_str}.")
-        return season_summary_list
-    except TimeoutException: logging.error(f"Timed out waiting for season summary elements.")
-    except Exception as e: logging.error(f"Error getting season summary list {season_str}: {e}", exc_info=True)
-    return []
+def fetch_season_summary_page(driver: WebDriver, url: str) -> str | None:
+    """fetch_page for season_summary: loads the season's results page and archives it."""
+    page_html = season_summary.fetch_with_driver(driver, url, WAIT_TIME)
+    if page_html and HTML_ARCHIVE: HTML_ARCHIVE.store_page(url, page_html, 'season_summary')
+    return page_html
 
 def _process_batting_table(table_body: Tag, match_id: str, innings_num: int, batting_team: str) -> list:
     """Processes batting table BODY tag using paired-row logic, handling dismissal details."""
@@ -408,11 +378,9 @@ def _process_batting_table(table_body: Tag, match_id: str, innings_num: int, bat
                  logging.debug(f"No paired dismissal row found for {name}, using main row text: '{dismissal_text_main_row}'")
                  d_type, d_fielder, d_bowler = parse_dismissal(dismissal_text_main_row) # parse_dismissal may need updates
                  batter_data['Dismissal Type'] = d_type; batter_data['Dismissal Player'] = d_fielder; batter_data['Dismissal Bowler'] = d_bowler
-            batting_details.append(batter_data)
-        except IndexError:
-            logging.error(f"Match {match_id} Inn {innings_num}: IndexError processing batting row {i + 1} for {batter_data.get('Batter', 'UNKNOWN')}. Found {len(stat_cols)} cells. Row HTML: {stat_row.prettify()}", exc_info=True)
+            batting_details.append(batter_data); PARSE_ERRORS.record_success()
         except Exception as e:
-            logging.error(f"Match {match_id} Inn {innings_num}: Error processing batting row {i + 1} for {batter_data.get('Batter', 'UNKNOWN')}. Row HTML: {stat_row.prettify()}", exc_info=True)
+            PARSE_ERRORS.record('batting', stat_row, e, f"Match {match_id} Inn {innings_num} row {i + 1} ({batter_data.get('Batter', 'UNKNOWN')})")
     return batting_details
 
 def _process_bowling_table(table_body: Tag, match_id: str, innings_num: int, bowling_team: str) -> list:
@@ -448,11 +416,9 @@ def _process_bowling_table(table_body: Tag, match_id: str, innings_num: int, bow
             bowler_data['Sixes'] = safe_get_text(bowl_cols[BOWLING_COL_INDICES.get('6s', 9) - 1]) # Verify index
             bowler_data['Wides'] = safe_get_text(bowl_cols[BOWLING_COL_INDICES.get('WD', 10) - 1]) # Verify index
             bowler_data['No balls'] = safe_get_text(bowl_cols[BOWLING_COL_INDICES.get('NB', 11) - 1]) # Verify index
-            bowling_details.append(bowler_data)
-        except IndexError:
-             logging.error(f"Match {match_id} Inn {innings_num}: IndexError processing bowling row {j + 1} for {bowler_data.get('Bowler', 'UNKNOWN')}. Found {len(bowl_cols)} cells. Row HTML: {bowler_row.prettify()}", exc_info=True)
+            bowling_details.append(bowler_data); PARSE_ERRORS.record_success()
         except Exception as e:
-            logging.error(f"Match {match_id} Inn {innings_num}: Error processing bowling row {j + 1} for {bowler_data.get('Bowler', 'UNKNOWN')}: {e}", exc_info=True)
+            PARSE_ERRORS.record('bowling', bowler_row, e, f"Match {match_id} Inn {innings_num} row {j + 1} ({bowler_data.get('Bowler', 'UNKNOWN')})")
     return bowling_details
 
 def scrape_scorecard_details(driver: WebDriver, scorecard_rel_url: str, match_id: str) -> (list, list, bool): # Added success flag
@@ -467,50 +433,62 @@ def scrape_scorecard_details(driver: WebDriver, scorecard_rel_url: str, match_id
         driver.get(full_url);
         logging.info(f"Waiting up to {WAIT_TIME}s for scorecard container: '{SCORECARD_WAIT_SELECTOR}'")
         WebDriverWait(driver, WAIT_TIME).until(EC.presence_of_element_located((By.CSS_SELECTOR, SCORECARD_WAIT_SELECTOR)))
-        # !!! Verify wait condition and selector for 2025 scorecards !!!
-        # Increased wait time slightly and wait for a more specific element if possible
-        logging.info(f"Waiting up to {WAIT_TIME + 10}s for Innings 1 Batting Table: '{INNINGS_1_BATTING_TABLE_SELECTOR}'")
-        WebDriverWait(driver, WAIT_TIME + 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR, INNINGS_1_BATTING_TABLE_SELECTOR)))
+        # Wait for any table rather than a layout-specific selector; the selector set is picked from the page itself,
+        # so an unknown layout fails fast here instead of timing out on the wrong selectors.
+        WebDriverWait(driver, WAIT_TIME).until(EC.presence_of_element_located((By.CSS_SELECTOR, SCORECARD_ANY_TABLE_SELECTOR)))
         time.sleep(random.uniform(3.0, 5.0)) # Increased sleep
-        page_soup = BeautifulSoup(driver.page_source, 'lxml')
+        page_html = driver.page_source; page_soup = BeautifulSoup(page_html, 'lxml')
+        selector_set_name, layout_fingerprint = None, None
+        for attempt in range(TABLE_FIND_RETRIES):
+            selector_set_name, layout_fingerprint = select_layout(page_soup, SCORECARD_SELECTOR_SETS, scorecard_layout_matches, LAYOUT_CACHE, 'scorecard', full_url)
+            if selector_set_name: break
+            if attempt < TABLE_FIND_RETRIES - 1:
+                logging.warning(f"Match {match_id}: No selector set matched yet (attempt {attempt + 1}). Re-reading page in {TABLE_FIND_DELAY}s...")
+                time.sleep(TABLE_FIND_DELAY); page_html = driver.page_source; page_soup = BeautifulSoup(page_html, 'lxml')
+        if not selector_set_name:
+            logging.error(f"Match {match_id}: Page layout {layout_fingerprint} matches no entry in SCORECARD_SELECTOR_SETS. Skipping.")
+            return all_batting, all_bowling, False
+        selectors = SCORECARD_SELECTOR_SETS[selector_set_name]
+        if HTML_ARCHIVE: HTML_ARCHIVE.store_page(full_url, page_html, 'scorecard')
+        logging.info(f"Match {match_id}: Using selector set '{selector_set_name}' (layout {layout_fingerprint}).")
 
         # --- Innings 1 ---
         logging.info(f"Match {match_id}: Processing Innings 1...")
         # !!! Verify selectors for 2025 !!!
-        team1_name_tag = page_soup.select_one(INNINGS_1_BATTING_TEAM_SELECTOR)
+        team1_name_tag = page_soup.select_one(selectors['INNINGS_1_BATTING_TEAM'])
         if team1_name_tag: team1_name = safe_get_text(team1_name_tag, default=team1_name)
-        else: logging.warning(f"Match {match_id} Inn 1: Batting team name selector not found. Check: {INNINGS_1_BATTING_TEAM_SELECTOR}")
+        else: logging.warning(f"Match {match_id} Inn 1: Batting team name selector not found. Check: {selectors['INNINGS_1_BATTING_TEAM']}")
         logging.info(f"  Innings 1 Batting Team: {team1_name}")
-        batting_table_1 = page_soup.select_one(INNINGS_1_BATTING_TABLE_SELECTOR)
-        bowl_table_1 = page_soup.select_one(INNINGS_1_BOWLING_TABLE_SELECTOR)
+        batting_table_1 = page_soup.select_one(selectors['INNINGS_1_BATTING_TABLE'])
+        bowl_table_1 = page_soup.select_one(selectors['INNINGS_1_BOWLING_TABLE'])
         bat_body_1 = batting_table_1.find('tbody') if batting_table_1 else None
         bowl_body_1 = bowl_table_1.find('tbody') if bowl_table_1 else None
         innings1_bat_processed = False; innings1_bowl_processed = False
-        if not bat_body_1: logging.error(f"Match {match_id} Inn 1: BATTING TBODY NOT FOUND using selector {INNINGS_1_BATTING_TABLE_SELECTOR}")
+        if not bat_body_1: logging.error(f"Match {match_id} Inn 1: BATTING TBODY NOT FOUND using selector {selectors['INNINGS_1_BATTING_TABLE']}")
         else: all_batting.extend(_process_batting_table(bat_body_1, match_id, 1, team1_name)); innings1_bat_processed = True
-        if not bowl_body_1: logging.error(f"Match {match_id} Inn 1: BOWLING TBODY NOT FOUND using selector {INNINGS_1_BOWLING_TABLE_SELECTOR}")
+        if not bowl_body_1: logging.error(f"Match {match_id} Inn 1: BOWLING TBODY NOT FOUND using selector {selectors['INNINGS_1_BOWLING_TABLE']}")
         else: all_bowling.extend(_process_bowling_table(bowl_body_1, match_id, 1, "TBC_Opponent")); innings1_bowl_processed = True
 
         # --- Innings 2 ---
         logging.info(f"Match {match_id}: Processing Innings 2...")
          # !!! Verify selectors for 2025 !!!
-        team2_name_tag = page_soup.select_one(INNINGS_2_BATTING_TEAM_SELECTOR)
+        team2_name_tag = page_soup.select_one(selectors['INNINGS_2_BATTING_TEAM'])
         if team2_name_tag: team2_name = safe_get_text(team2_name_tag, default=team2_name)
-        else: logging.warning(f"Match {match_id} Inn 2: Batting team name selector not found. Check: {INNINGS_2_BATTING_TEAM_SELECTOR}")
+        else: logging.warning(f"Match {match_id} Inn 2: Batting team name selector not found. Check: {selectors['INNINGS_2_BATTING_TEAM']}")
         logging.info(f"  Innings 2 Batting Team: {team2_name}")
-        batting_table_2 = page_soup.select_one(INNINGS_2_BATTING_TABLE_SELECTOR)
-        bowl_table_2 = page_soup.select_one(INNINGS_2_BOWLING_TABLE_SELECTOR)
+        batting_table_2 = page_soup.select_one(selectors['INNINGS_2_BATTING_TABLE'])
+        bowl_table_2 = page_soup.select_one(selectors['INNINGS_2_BOWLING_TABLE'])
         bat_body_2 = batting_table_2.find('tbody') if batting_table_2 else None
         bowl_body_2 = bowl_table_2.find('tbody') if bowl_table_2 else None
         innings2_bat_processed = False; innings2_bowl_processed = False
         # Check if second innings exists before trying to process
         if batting_table_2 and bowl_table_2:
-            if not bat_body_2: logging.error(f"Match {match_id} Inn 2: BATTING TBODY NOT FOUND using selector {INNINGS_2_BATTING_TABLE_SELECTOR}")
+            if not bat_body_2: logging.error(f"Match {match_id} Inn 2: BATTING TBODY NOT FOUND using selector {selectors['INNINGS_2_BATTING_TABLE']}")
             else: all_batting.extend(_process_batting_table(bat_body_2, match_id, 2, team2_name)); innings2_bat_processed = True
-            if not bowl_body_2: logging.error(f"Match {match_id} Inn 2: BOWLING TBODY NOT FOUND using selector {INNINGS_2_BOWLING_TABLE_SELECTOR}")
+            if not bowl_body_2: logging.error(f"Match {match_id} Inn 2: BOWLING TBODY NOT FOUND using selector {selectors['INNINGS_2_BOWLING_TABLE']}")
             else: all_bowling.extend(_process_bowling_table(bowl_body_2, match_id, 2, team1_name)); innings2_bowl_processed = True
         else:
-             logging.info(f"Match {match_id}: Innings 2 tables not found (selectors: Bat='{INNINGS_2_BATTING_TABLE_SELECTOR}', Bowl='{INNINGS_2_BOWLING_TABLE_SELECTOR}'). Assuming only 1 innings or structure change.")
+             logging.info(f"Match {match_id}: Innings 2 tables not found (selectors: Bat='{selectors['INNINGS_2_BATTING_TABLE']}', Bowl='{selectors['INNINGS_2_BOWLING_TABLE']}'). Assuming only 1 innings or structure change.")
 
 
         # Post-process Bowling Team Name for Innings 1
@@ -535,25 +513,47 @@ def scrape_scorecard_details(driver: WebDriver, scorecard_rel_url: str, match_id
     except TimeoutException:
         logging.error(f"Timed out waiting for elements on scorecard page {match_id}")
         success = False
+    except LayoutBrokenError: raise
     except Exception as e:
         logging.error(f"Failed scorecard scrape {match_id}: {e}", exc_info=True)
         success = False
     return all_batting, all_bowling, success
 
+def archived_page_checksums() -> dict:
+    """Archive content hashes of the season summary page and the scorecard pages it links (the run's page inputs)."""
+    if not HTML_ARCHIVE: return {}
+    summary_path = season_summary.cached_summary_path(TROPHY_ID, TARGET_SEASON)
+    links = pd.read_csv(summary_path, dtype=str, encoding='utf-8-sig')['Scorecard Link'].dropna() if os.path.exists(summary_path) else []
+    urls = [season_summary.season_url(TROPHY_ID, TARGET_SEASON)] + [urljoin(BASE_CRICINFO_URL, link) for link in links]
+    return HTML_ARCHIVE.content_hashes(urls)
+
 # --- Main Execution Logic ---
 if __name__ == "__main__":
     overall_start_time = time.time(); driver = None; season_summary_data = [];
-    master_batting_list = []; master_bowling_list = []
+    # --- Skip the Whole Run if This Completed Season's Inputs (cached summary, archived pages) and Outputs Are Unchanged ---
+    stage_manifest = StageManifest(f"scorecards/{season_file_prefix}", outputs=[SEASON_SUMMARY_CSV_PATH, BATTING_CSV_PATH, BOWLING_CSV_PATH],
+                                   inputs=[season_summary.cached_summary_path(TROPHY_ID, TARGET_SEASON)], input_checksums=archived_page_checksums,
+                                   code_files=[__file__] + module_files(MANIFEST_CODE_MODULES),
+                                   config={'season': TARGET_SEASON, 'trophy': TROPHY_ID, 'retry_failed': RETRY_FAILED_SCORECARDS})
+    if SKIP_IF_UP_TO_DATE and season_is_complete(TARGET_SEASON) and stage_manifest.is_up_to_date():
+        print(f"\nSeason {TARGET_SEASON} is complete and its outputs are up to date ({stage_manifest.path}). Nothing to do.")
+        sys.exit(0)
+    run_completed = False; unrecovered_match_ids = set()
+    # Detailed rows go straight to disk in batches instead of accumulating for the whole season. They stream into side
+    # files that are merged into the season CSVs by key at the end, so an aborted rerun never truncates a complete season
+    batting_writer = StreamingTableWriter(side_file_path(BATTING_CSV_PATH), BATTING_CSV_COLUMNS, STREAM_BATCH_SIZE, int_columns=BATTING_INT_COLUMNS, float_columns=BATTING_FLOAT_COLUMNS, key=BATTING_KEY,
+                                          on_flush=(lambda batch: sqlite_store.store_dataframe('batting', batch)) if WRITE_SQLITE_STORE else None)
+    bowling_writer = StreamingTableWriter(side_file_path(BOWLING_CSV_PATH), BOWLING_CSV_COLUMNS, STREAM_BATCH_SIZE, int_columns=BOWLING_INT_COLUMNS, float_columns=BOWLING_FLOAT_COLUMNS, key=BOWLING_KEY,
+                                          on_flush=(lambda batch: sqlite_store.store_dataframe('bowling', batch)) if WRITE_SQLITE_STORE else None)
     failed_scorecards = []
     df_season_summary = None # Initialize DataFrame variable
 
     try:
         driver = setup_driver()
-        season_url_part = format_season_string(TARGET_SEASON) # Will produce '2025-2025'
 
         # --- Stage 1: Scrape Season Summary ---
         logging.info(f"\n--- STAGE 1: Scraping Match Summary for Season {TARGET_SEASON} ---") # Updated log
-        season_summary_data = scrape_season_summary(driver, TARGET_SEASON, season_url_part)
+        season_summary_data = season_summary.get_season_summary(TROPHY_ID, TARGET_SEASON, lambda url: fetch_season_summary_page(driver, url), parse_errors=PARSE_ERRORS).to_dict('records')
 
         # --- Process and Save Season Summary ---
         if season_summary_data:
@@ -584,6 +584,9 @@ if __name__ == "__main__":
                     # Save to DATA_DIR using updated path
                     df_season_summary.to_csv(SEASON_SUMMARY_CSV_PATH, index=False, encoding='utf-8-sig');
                     logging.info(f"Saved season summary: {SEASON_SUMMARY_CSV_PATH}"); print(f"\nSeason summary saved: {SEASON_SUMMARY_CSV_PATH}")
+                    if WRITE_PARQUET_WAREHOUSE: parquet_warehouse.write_table(df_season_summary, 'match_summary', TROPHY_ID, TARGET_SEASON)
+                    if WRITE_SQLITE_STORE: sqlite_store.store_dataframe('match_summary', df_season_summary)
+                    if WRITE_CHANGE_SETS: snapshot_diff.record_csv_snapshot(f"scorecards/{season_file_prefix}/match_summary", SEASON_SUMMARY_CSV_PATH, ['Match ID'])
 
             except Exception as e:
                  logging.error(f"Error processing/saving season summary: {e}", exc_info=True);
@@ -610,9 +613,9 @@ if __name__ == "__main__":
                     logging.info(f"\n--- Processing Scorecard {i + 1}/{total_matches} (Match ID: {match_id}) ---")
                     batting_data, bowling_data, success = scrape_scorecard_details(driver, scorecard_link, str(match_id))
                     if success:
-                        master_batting_list.extend(batting_data); master_bowling_list.extend(bowling_data)
+                        batting_writer.extend(batting_data); bowling_writer.extend(bowling_data)
                     else:
-                        logging.warning(f"Scorecard scrape failed for Match ID: {match_id}. Will retry later if enabled.")
+                        logging.warning(f"Scorecard scrape failed for Match ID: {match_id}. Will retry later if enabled."); unrecovered_match_ids.add(str(match_id))
                         if RETRY_FAILED_SCORECARDS: failed_scorecards.append(match_info)
                     if i < total_matches - 1:
                         sleep_duration = random.uniform(SCORECARD_SLEEP_MIN, SCORECARD_SLEEP_MAX);
@@ -626,17 +629,24 @@ if __name__ == "__main__":
                         logging.info(f"\n--- Retrying Scorecard {i + 1}/{len(failed_scorecards)} (Match ID: {match_id}) ---")
                         batting_data, bowling_data, success = scrape_scorecard_details(driver, scorecard_link, str(match_id))
                         if success:
-                            logging.info(f"Retry successful for Match ID: {match_id}")
-                            master_batting_list.extend(batting_data); master_bowling_list.extend(bowling_data)
+                            logging.info(f"Retry successful for Match ID: {match_id}"); unrecovered_match_ids.discard(str(match_id))
+                            batting_writer.extend(batting_data); bowling_writer.extend(bowling_data)
                         else: logging.error(f"Retry FAILED for Match ID: {match_id}.")
                         if i < len(failed_scorecards) - 1:
                             sleep_duration = random.uniform(SCORECARD_SLEEP_MIN, SCORECARD_SLEEP_MAX);
                             logging.info(f"--- Delaying {sleep_duration:.2f}s ---"); time.sleep(sleep_duration)
                 elif RETRY_FAILED_SCORECARDS: logging.info("\n--- STAGE 3: No failed scorecards to retry ---")
 
+        run_completed = df_season_summary is not None and not df_season_summary.empty
+
+    except LayoutBrokenError as e:
+        logging.critical(f"Stopping early, scorecard layout looks broken: {e}")
     except Exception as e:
         logging.critical(f"Critical error in main execution block: {e}", exc_info=True)
     finally:
+        try: LAYOUT_CACHE.save()
+        except OSError as cache_err: logging.warning(f"Could not save layout cache: {cache_err}")
+        if HTML_ARCHIVE: HTML_ARCHIVE.close()
         if driver:
             try:
                 logging.info("Quitting WebDriver...");
@@ -647,60 +657,29 @@ if __name__ == "__main__":
 
     # --- Process and Save Detailed Data ---
     logging.info(f"\n--- Processing and Saving Detailed Scorecard Data ---")
-    # Process Batting
-    if master_batting_list:
-        try:
-            df_batting = pd.DataFrame(master_batting_list);
-            # Add a more robust check for duplicates if needed, e.g., based on player ID if available
-            df_batting.drop_duplicates(subset=['Match ID', 'Innings', 'Batter', 'Run Scored', 'Ball faced'], keep='last', inplace=True)
-            logging.info(f"Created Batting DataFrame: {df_batting.shape[0]} unique rows.")
-            batting_cols_ordered = ['Match ID', 'Innings', 'Batting Team', 'Batter', 'Batter id', 'Run Scored', 'Ball faced', 'Fours', 'Sixes', 'Strike rate', 'Dismissal Type', 'Dismissal Player', 'Dismissal Bowler']
-            # Ensure all columns exist, adding missing ones with NA
-            for col in batting_cols_ordered:
-                 if col not in df_batting.columns:
-                     df_batting[col] = pd.NA
-            df_batting = df_batting[batting_cols_ordered] # Reorder
-            bat_numeric_cols = ['Batter id', 'Run Scored', 'Ball faced', 'Fours', 'Sixes', 'Strike rate'];
-            cols_to_convert = [col for col in bat_numeric_cols if col in df_batting.columns]
-            if cols_to_convert:
-                df_batting[cols_to_convert] = df_batting[cols_to_convert].fillna(pd.NA)
-                df_batting[cols_to_convert] = df_batting[cols_to_convert].apply(pd.to_numeric, errors='coerce');
-                logging.info(f"Converted detailed batting numeric cols: {cols_to_convert}")
-            else: logging.warning("No numeric batting columns found to convert.")
-            # Save to DATA_DIR using updated path
-            df_batting.to_csv(BATTING_CSV_PATH, index=False, encoding='utf-8-sig');
-            logging.info(f"Saved detailed batting data: {BATTING_CSV_PATH}"); print(f"\nDetailed batting data saved: {BATTING_CSV_PATH}")
-            print("\n--- Detailed Batting Performance Table (Head) ---"); pd.set_option('display.max_rows', 40);
-            print(df_batting.head(30).to_string(index=False, na_rep='<NA>')); print("--- End Detailed Batting Head ---")
-        except Exception as e: logging.error(f"Error processing/saving detailed batting data: {e}", exc_info=True)
-    else: logging.warning("No detailed batting data collected."); print("\n--- No detailed batting data collected/saved. ---")
-    # Process Bowling
-    if master_bowling_list:
+    # Rows were streamed to side files while scraping (and upserted batch by batch); flush the last batch and merge them into the season CSVs
+    for label, writer, row_key, csv_path, csv_columns in (('batting', batting_writer, BATTING_KEY, BATTING_CSV_PATH, BATTING_CSV_COLUMNS),
+                                                          ('bowling', bowling_writer, BOWLING_KEY, BOWLING_CSV_PATH, BOWLING_CSV_COLUMNS)):
         try:
-            df_bowling = pd.DataFrame(master_bowling_list);
-            df_bowling.drop_duplicates(subset=['Match ID', 'Innings', 'Bowler', 'Over bowled', 'Run given', 'Wicket taken'], keep='last', inplace=True)
-            logging.info(f"Created Bowling DataFrame: {df_bowling.shape[0]} unique rows.")
-            bowling_cols_ordered = ['Match ID', 'Innings', 'Bowling Team', 'Bowler', 'Bowler id', 'Over bowled', 'Maiden Over', 'Run given', 'Wicket taken', 'Economy rate', 'Wides', 'No balls', 'Dot balls', 'Fours', 'Sixes']
-            # Ensure all columns exist, adding missing ones with NA
-            for col in bowling_cols_ordered:
-                 if col not in df_bowling.columns:
-                     df_bowling[col] = pd.NA
-            df_bowling = df_bowling[bowling_cols_ordered] # Reorder
-            bowl_numeric_cols = ['Bowler id', 'Over bowled', 'Maiden Over', 'Run given', 'Wicket taken', 'Economy rate', 'Wides', 'No balls', 'Dot balls', 'Fours', 'Sixes'];
-            cols_to_convert = [col for col in bowl_numeric_cols if col in df_bowling.columns]
-            if cols_to_convert:
-                 df_bowling[cols_to_convert] = df_bowling[cols_to_convert].fillna(pd.NA)
-                 df_bowling[cols_to_convert] = df_bowling[cols_to_convert].apply(pd.to_numeric, errors='coerce');
-                 logging.info(f"Converted detailed bowling numeric cols: {cols_to_convert}")
-            else: logging.warning("No numeric bowling columns found to convert.")
-            # Save to DATA_DIR using updated path
-            df_bowling.to_csv(BOWLING_CSV_PATH, index=False, encoding='utf-8-sig');
-            logging.info(f"Saved detailed bowling data: {BOWLING_CSV_PATH}"); print(f"\nDetailed bowling data saved: {BOWLING_CSV_PATH}")
-            print("\n--- Detailed Bowling Performance Table (Head) ---"); pd.set_option('display.max_rows', 40);
-            print(df_bowling.head(30).to_string(index=False, na_rep='<NA>')); print("--- End Detailed Bowling Head ---")
-        except Exception as e: logging.error(f"Error processing/saving detailed bowling data: {e}", exc_info=True)
-    else: logging.warning("No detailed bowling data collected."); print("\n--- No detailed bowling data collected/saved. ---")
-
+            rows_written = writer.close()
+            if not rows_written:
+                logging.warning(f"No detailed {label} data collected."); print(f"\n--- No detailed {label} data collected/saved. ---"); continue
+            total_rows = merge_side_file(writer.path, csv_path, row_key, csv_columns)
+            logging.info(f"Saved detailed {label} data: {csv_path} ({rows_written} rows scraped, {writer.rows_replaced} replaced by a later row for the same player; {total_rows} rows in the file)"); print(f"\nDetailed {label} data saved: {csv_path}")
+            if run_completed: # A partial run's rows are merged in, but must not replace the warehouse partition or be diffed as the season
+                if WRITE_PARQUET_WAREHOUSE: parquet_warehouse.write_table(pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig'), label, TROPHY_ID, TARGET_SEASON)
+                if WRITE_CHANGE_SETS: snapshot_diff.record_csv_snapshot(f"scorecards/{season_file_prefix}/{label}", csv_path, row_key)
+            else: logging.warning(f"Run did not complete: skipping the warehouse and change-set writes for {label}.")
+            print(f"\n--- Detailed {label.capitalize()} Performance Table (Head) ---"); pd.set_option('display.max_rows', 40);
+            print(pd.read_csv(csv_path, nrows=30, encoding='utf-8-sig').to_string(index=False, na_rep='<NA>')); print(f"--- End Detailed {label.capitalize()} Head ---")
+        except Exception as e: logging.error(f"Error finalising detailed {label} data: {e}", exc_info=True)
+
+    PARSE_ERRORS.log_summary(); PARSE_ERRORS.write_report(PARSE_ERROR_REPORT_PATH)
+    # --- Record the Run (only a complete, error-free run lets the next one skip this season) ---
+    if run_completed and not unrecovered_match_ids and not PARSE_ERRORS.error_count:
+        stage_manifest.record()
+    elif run_completed:
+        logging.info(f"Manifest not updated: {len(unrecovered_match_ids)} scorecards failed and {PARSE_ERRORS.error_count} rows failed to parse; the next run will redo this season.")
     overall_end_time = time.time(); total_duration = overall_end_time - overall_start_time;
     logging.info(f"\nScript finished execution in {total_duration:.2f} seconds."); logging.info("--- Script End ---");
     print(f"\nScript finished in {total_duration:.2f} seconds.")
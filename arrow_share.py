@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped Arrow copies of the consolidated tables, shared across processes.
+
+Notebooks, backtests and simulation workers each used to parse the same CSVs
+into a private pandas copy. export_all() writes each consolidated table (all
+seasons of match_summary / batting / bowling, plus the career and innings
+outputs) once as an uncompressed Arrow IPC (Feather v2) file:
+
+    Shared_Arrow/<table>.arrow
+
+open_table() memory-maps that file: no parsing, and the column buffers are the
+OS page cache, so sixteen workers opening the same table share one physical
+copy. Compression is deliberately off, since compressed buffers have to be
+decoded into private memory and would defeat the sharing.
+
+    from arrow_share import open_table, load_dataframe
+    batting = open_table('batting')                 # pyarrow.Table, zero-copy
+    bowling = load_dataframe('bowling', columns=['Bowler id', 'Wicket taken'])
+
+to_pandas() copies string/categorical columns (and nullable numeric ones), so
+workers that only aggregate should stay on the Arrow table or select the
+columns they need.
+
+`python arrow_share.py export` rebuilds every table whose source CSVs or loader code
+changed (tracked by checksum in the pipeline manifest).
+"""
+import logging
+import os
+import sys
+import time
+import pandas as pd
+import compact_loader
+from pipeline_manifest import StageManifest
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError: # Optional dependency, like the Parquet warehouse
+    pa = feather = None
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SHARED_DIR = os.path.join(REPO_ROOT, "Shared_Arrow")
+SHARED_TABLES = ['match_summary', 'batting', 'bowling', 'career_batting', 'career_bowling', 'innings_batting']
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+def table_path(table_name: str, shared_dir: str = SHARED_DIR) -> str:
+    return os.path.join(shared_dir, f"{table_name}.arrow")
+
+def _source_paths(table_name: str) -> list:
+    if table_name in compact_loader.SEASON_CSV_SUFFIXES:
+        return list(compact_loader.find_season_csvs(table_name).values())
+    csv_path = compact_loader.ENGINE_CSV_PATHS[table_name]
+    return [csv_path] if os.path.exists(csv_path) else []
+
+def _stage_manifest(table_name: str, shared_dir: str) -> StageManifest:
+    return StageManifest(f"arrow/{table_name}", outputs=[table_path(table_name, shared_dir)], inputs=_source_paths(table_name),
+                         code_files=[__file__, compact_loader.__file__])
+
+def is_stale(table_name: str, shared_dir: str = SHARED_DIR) -> bool:
+    """True when the Arrow file is missing, modified, or its source CSVs / loader code changed since the last export."""
+    return not _stage_manifest(table_name, shared_dir).is_up_to_date()
+
+
+# --- Export ---
+def export_table(table_name: str, shared_dir: str = SHARED_DIR) -> str | None:
+    """Loads a table with the compact schema and writes it as one uncompressed Arrow IPC file. Returns the path."""
+    if not arrow_available():
+        raise ImportError("pyarrow is required for the shared Arrow tables.")
+    if table_name in compact_loader.SEASON_CSV_SUFFIXES:
+        df = compact_loader.load_scorecards(table_name)
+    elif os.path.exists(compact_loader.ENGINE_CSV_PATHS[table_name]):
+        df = compact_loader.load_engine_table(table_name)
+    else:
+        logging.warning(f"Arrow share {table_name}: no source CSV on disk, not exported.")
+        return None
+    if df.empty:
+        logging.warning(f"Arrow share {table_name}: source is empty, not exported.")
+        return None
+    os.makedirs(shared_dir, exist_ok=True)
+    final_path = table_path(table_name, shared_dir); tmp_path = f"{final_path}.tmp"
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, final_path) # Processes that already mapped the old file keep reading it safely
+    _stage_manifest(table_name, shared_dir).record()
+    logging.info(f"Arrow share {table_name}: exported {len(df)} rows to {final_path}")
+    return final_path
+
+def export_all(tables: list | None = None, force: bool = False, shared_dir: str = SHARED_DIR) -> list:
+    """Exports every stale table (or all of them with force=True). Returns the paths written."""
+    written = []
+    for table_name in tables or SHARED_TABLES:
+        if not force and not is_stale(table_name, shared_dir):
+            continue
+        path = export_table(table_name, shared_dir)
+        if path: written.append(path)
+    return written
+
+
+# --- Loading ---
+def open_table(table_name: str, columns: list | None = None, shared_dir: str = SHARED_DIR):
+    """Memory-maps a shared table and returns it as a pyarrow.Table without copying the column data."""
+    if not arrow_available():
+        raise ImportError("pyarrow is required for the shared Arrow tables.")
+    arrow_path = table_path(table_name, shared_dir)
+    if not os.path.exists(arrow_path):
+        raise FileNotFoundError(f"{arrow_path} not found; run `python arrow_share.py export` first.")
+    return feather.read_table(arrow_path, columns=columns, memory_map=True)
+
+def load_dataframe(table_name: str, columns: list | None = None, shared_dir: str = SHARED_DIR) -> pd.DataFrame:
+    """open_table() followed by to_pandas(); categoricals come back as categoricals."""
+    return open_table(table_name, columns, shared_dir).to_pandas()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'status'
+    if command == 'export':
+        export_all(force='--force' in sys.argv)
+    else:
+        for name in SHARED_TABLES:
+            if os.path.exists(table_path(name)):
+                start = time.perf_counter(); table = open_table(name)
+                print(f"{name}: {table.num_rows} rows, opened in {(time.perf_counter() - start) * 1000:.1f} ms{' (stale)' if is_stale(name) else ''}")
+            else:
+                print(f"{name}: not exported")
@@ -12,15 +12,19 @@ from selenium.common.exceptions import (
 )
 from bs4 import BeautifulSoup, Tag
 import pandas as pd
-import numpy as np # For NaN handling if needed during Mat merge
+import numpy as np # NaN handling and the vectorized Mat merge
 from urllib.parse import urljoin
 import traceback
 from datetime import datetime
 import re
 import logging
 import os
+import snapshot_diff
+import team_code
+from keyed_upsert import RecordKey
+from crawl_pool import DriverPool, RateLimiter, fetch_html, run_jobs
 
-# --- Team Information ---
+# --- Team Information (built-in fallback; main() resolves the current list via team_code.resolve_teams) ---
 IPL_TEAMS = {
     '4343': 'Chennai Super Kings',
     '4347': 'Deccan Chargers', # Defunct
@@ -39,6 +43,14 @@ IPL_TEAMS = {
     '5143': 'Sunrisers Hyderabad'
 }
 
+# --- Franchise Lineage (team ID -> current franchise; IDs not listed roll up under their IPL_TEAMS name) ---
+# Several IDs may map to one franchise (renamed/relocated sides listed under a new ID in other leagues).
+FRANCHISE_LINEAGE = {
+    '4344': 'Delhi Capitals', # Delhi Daredevils until 2018
+    '4342': 'Punjab Kings', # Kings XI Punjab until 2020
+    '4340': 'Royal Challengers Bengaluru', # Royal Challengers Bangalore until 2023
+}
+
 # --- Segment Information (Internal Use Only) ---
 SEGMENT_INFO = {
     'Batting': {'name': 'Batting', 'path': 'averages-batting'},
@@ -54,6 +66,35 @@ OUTPUT_DIR = "batting_bowling_stat_output"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 OUTPUT_CSV_FILENAME = "batting_bowling_stat.csv"
 OUTPUT_CSV_PATH = os.path.join(OUTPUT_DIR, OUTPUT_CSV_FILENAME)
+WRITE_CHANGE_SETS = True # Diff the CSV against the previous run and write a change set (snapshot_diff.py)
+PLAYER_TEAM_KEY = RecordKey(['Team ID'], 'Player ID', 'Player') # One row per player per franchise
+# --- Merged Output Layout / Types ---
+PLAYER_KEY_COLS = ['Team ID', 'Player ID']
+PLAYER_INFO_COLS = ['Player', 'First Season', 'Last Season']
+BATTING_STAT_TYPES = {'Mat_bat': 'Int32', 'Inns_bat': 'Int32', 'NO': 'Int32', 'Runs Scored': 'Int32', 'HS': 'Int32',
+                      'Batting Ave': 'float32', 'Batting SR': 'float32', '100': 'Int32', '50': 'Int32', '0': 'Int32'}
+BOWLING_STAT_TYPES = {'Mat_bowl': 'Int32', 'Inns_bowl': 'Int32', 'Mdns': 'Int32', 'Runs Conceded': 'Int32', 'Wkts': 'Int32',
+                      'BBI Wickets': 'Int32', 'BBI Runs': 'Int32', 'Bowling Ave': 'float32', 'Econ': 'float32', 'Bowling SR': 'float32',
+                      '5 Wkts': 'Int32', '10 Wkts': 'Int32'}
+FINAL_MERGED_COLS = [
+    'Player', 'Player ID', 'Team ID', 'First Season', 'Last Season', # Keys
+    'Mat', # Combined Matches
+    # Batting Stats
+    'Inns_bat', 'NO', 'Runs Scored', 'HS', 'Batting Ave', 'Batting SR', '100', '50', '0',
+    # Bowling Stats
+    'Inns_bowl', 'Mdns', 'Runs Conceded', 'Wkts',
+    'BBI Wickets', 'BBI Runs', # New BBI columns
+    'Bowling Ave', 'Econ', 'Bowling SR', '5 Wkts', '10 Wkts'
+]
+# --- Franchise Roll-up (a second CSV with one row per player per franchise lineage) ---
+FRANCHISE_CSV_PATH = os.path.join(OUTPUT_DIR, "batting_bowling_stat_by_franchise.csv")
+FRANCHISE_SUM_COLS = ['Mat', 'Inns_bat', 'NO', 'Runs Scored', '100', '50', '0', 'Inns_bowl', 'Mdns', 'Runs Conceded', 'Wkts', '5 Wkts', '10 Wkts']
+FRANCHISE_ROLLUP_COLS = ['Player', 'Player ID', 'Franchise', 'Team IDs', 'First Season', 'Last Season'] + FINAL_MERGED_COLS[5:]
+# --- Concurrent Crawl (CONCURRENT_WORKERS = 1 keeps the original one-driver serial loop) ---
+CONCURRENT_WORKERS = 3 # (team, segment) pages fetched in parallel; also the driver pool size
+FETCH_MODE = 'browser' # 'browser' or 'http' (plain GET first, falls back to a pooled browser if the table is not in the HTML)
+MIN_REQUEST_INTERVAL = 2.0 # Seconds between page requests across ALL workers (politeness limit)
+REQUEST_JITTER = 1.0
 
 # --- Logging Setup ---
 log_filename = os.path.join(OUTPUT_DIR, f"ipl_all_teams_merged_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
@@ -76,7 +117,7 @@ current_time_str = current_time_system.strftime('%Y-%m-%d %H:%M:%S %Z')
 logging.info(f"Log file: {log_filename}")
 logging.info(f"Script started at: {current_time_str} (System Time)")
 logging.info(f"Current Date according to system: {current_date_system}")
-logging.info(f"Processing ALL {len(IPL_TEAMS)} teams defined in IPL_TEAMS dictionary.")
+logging.info(f"Built-in team list has {len(IPL_TEAMS)} teams; the cached team codes (team_code.py) are merged in at start.")
 logging.info(f"Output CSV will be saved to: {OUTPUT_CSV_PATH}")
 logging.warning("Note: Fielding columns 'Ct' and 'St' are not included as they are not available on the scraped batting/bowling average pages.")
 logging.warning("Processing all teams will take a significant amount of time.")
@@ -148,15 +189,14 @@ def parse_career_span(span_str):
 # --- Core Scraping Function (for one segment) ---
 def scrape_segment_data(driver: WebDriver, team_id: str, segment_name: str, segment_path: str) -> list:
     """
-    Scrapes data for a specific team and segment. Renames specific
+    Scrapes data for a specific team and segment. Loads the page and hands
+    the parsed soup to parse_segment_table(), which renames specific
     columns ('Runs', 'Ave', 'SR', 'Mat', 'Inns', '5', '10') based on segment
-    and expected headers. Cleans 'HS' column. Splits 'BBI' column.
+    and expected headers, cleans 'HS' and splits 'BBI'.
     Returns a list of dictionaries containing refined data.
     """
     target_url = f"{BASE_URL_START}{segment_path}{BASE_URL_END.format(team_id)}"
     logging.info(f"Attempting to scrape {segment_name} data for Team {team_id} from: {target_url}")
-    refined_data = []
-    raw_data = [] # Holds data before refinement
 
     try:
         driver.get(target_url)
@@ -175,127 +215,7 @@ def scrape_segment_data(driver: WebDriver, team_id: str, segment_name: str, segm
             return []
 
         page_soup = BeautifulSoup(driver.page_source, 'lxml')
-        data_table = page_soup.select_one("table.ds-table")
-        if not data_table:
-            logging.error(f"Could not find data table element ('table.ds-table') for {segment_name} at {target_url}.")
-            return []
-
-        headers = []
-        header_row = data_table.select_one("thead tr")
-        if header_row:
-            header_cells = header_row.find_all(['th', 'td'], recursive=False)
-            headers = [safe_get_text(cell).replace('Span','Span Text') for cell in header_cells]
-            # logging.info(f"Extracted {segment_name} Headers for Team {team_id}: {headers}") # Reduce log noise
-        else:
-            logging.error(f"Could not find table header row (thead tr) for {segment_name} at {target_url}.")
-            return []
-
-        table_body = data_table.find('tbody')
-        if not table_body:
-            logging.error(f"Could not find table body (tbody) for {segment_name} at {target_url}.")
-            return []
-        else:
-            data_rows = table_body.find_all('tr', recursive=False)
-            processed_count = 0
-            # Define wanted base headers (before rename) + Player Link / Span Text
-            # Includes 'BBI' now for processing
-            wanted_bat_headers = ['Player', 'Player Link', 'Span Text', 'Mat', 'Inns', 'NO', 'Runs', 'HS', 'Ave', 'SR', '100', '50', '0']
-            wanted_bowl_headers = ['Player', 'Player Link', 'Span Text', 'Mat', 'Inns', 'Mdns', 'Runs', 'Wkts', 'BBI', 'Ave', 'Econ', 'SR', '5', '10']
-            wanted_headers = wanted_bat_headers if segment_name == 'Batting' else wanted_bowl_headers
-
-            for i, row in enumerate(data_rows):
-                cols = row.find_all('td', recursive=False)
-                if len(cols) == len(headers):
-                    row_data = {}
-                    valid_row = True
-                    for j, header in enumerate(headers):
-                        header_text = header
-                        if header_text not in wanted_headers:
-                            continue
-
-                        value = safe_get_text(cols[j])
-                        key_name = header_text # Keep track of original for special handling
-
-                        # Handle Player link extraction and ID (essential)
-                        if header_text == 'Player':
-                            player_cell = cols[j]
-                            value = safe_get_text(player_cell)
-                            link_tag = player_cell.find('a', href=True)
-                            player_link = urljoin(target_url, link_tag['href']) if link_tag and link_tag.get('href') else 'N/A'
-                            row_data['Player Link'] = player_link
-                            row_data['Player'] = value # Store player name
-                            if value == 'N/A' or value == '':
-                                 logging.warning(f"Row {i+1} (Team {team_id}, {segment_name}) skipped, missing player name.")
-                                 valid_row = False
-                                 break
-                            continue # Move to next header after handling Player
-
-                        # Handle BBI splitting (Bowling only)
-                        elif header_text == 'BBI' and segment_name == 'Bowling':
-                            bbi_wickets = 'N/A'
-                            bbi_runs = 'N/A'
-                            if value != 'N/A' and '/' in value:
-                                parts = value.split('/')
-                                if len(parts) == 2:
-                                    bbi_wickets = parts[0].strip()
-                                    bbi_runs = parts[1].strip()
-                                else:
-                                    logging.warning(f"Unexpected BBI format '{value}' for player in row {i+1}, Team {team_id}.")
-                            elif value != 'N/A' and value != '-': # Handle cases where BBI might just be '-' if no wickets
-                                logging.warning(f"Unexpected BBI value '{value}' (no '/') for player in row {i+1}, Team {team_id}.")
-
-                            row_data['BBI Wickets'] = bbi_wickets
-                            row_data['BBI Runs'] = bbi_runs
-                            continue # Move to next header after handling BBI
-
-                        # Perform renaming for other specific columns
-                        elif header_text == 'Runs':
-                            key_name = 'Runs Scored' if segment_name == 'Batting' else 'Runs Conceded'
-                        elif header_text == 'Ave':
-                            key_name = 'Batting Ave' if segment_name == 'Batting' else 'Bowling Ave'
-                        elif header_text == 'SR':
-                            key_name = 'Batting SR' if segment_name == 'Batting' else 'Bowling SR'
-                        elif header_text == 'Mat':
-                            key_name = 'Mat_bat' if segment_name == 'Batting' else 'Mat_bowl'
-                        elif header_text == 'Inns':
-                             key_name = 'Inns_bat' if segment_name == 'Batting' else 'Inns_bowl'
-                        elif header_text == '5':
-                             key_name = '5 Wkts'
-                        elif header_text == '10':
-                             key_name = '10 Wkts'
-                        elif header_text == 'HS':
-                             value = value.replace('*', '') # Clean HS value
-
-                        # Store the value with the final key name (if not handled above)
-                        row_data[key_name] = value
-
-                    if valid_row:
-                        raw_data.append(row_data)
-                        processed_count += 1
-                else:
-                    logging.warning(f"Skipping row {i+1} in {segment_name} table for Team {team_id} (column count mismatch).")
-            # logging.info(f"Extracted raw {segment_name} data for {processed_count} rows for Team {team_id}.")
-
-        # --- Refine Data ---
-        # logging.info(f"Refining {len(raw_data)} {segment_name} entries for Team {team_id}...")
-        for entry in raw_data:
-            refined_entry = entry.copy()
-            player_link = refined_entry.pop('Player Link', 'N/A')
-            player_id_val = extract_player_id(player_link)
-            if player_id_val == 'N/A':
-                logging.warning(f"Skipping refinement for entry (Team {team_id}, {segment_name}), missing Player ID: {entry.get('Player', 'Unknown Player')}")
-                continue
-            refined_entry['Player ID'] = player_id_val
-
-            span_text = refined_entry.pop('Span Text', 'N/A')
-            first_season, last_season = parse_career_span(span_text)
-            refined_entry['First Season'] = first_season
-            refined_entry['Last Season'] = last_season
-            refined_entry['Team ID'] = team_id
-            refined_data.append(refined_entry)
-
-        # logging.info(f"Finished refining {len(refined_data)} {segment_name} entries for Team {team_id}.")
-        return refined_data
+        return parse_segment_table(page_soup, team_id, segment_name, target_url)
 
     except NoSuchElementException as e:
         logging.error(f"Could not find required element for {segment_name} (Team {team_id}): {e}")
@@ -307,97 +227,267 @@ def scrape_segment_data(driver: WebDriver, team_id: str, segment_name: str, segm
         logging.error(f"Unexpected error during {segment_name} (Team {team_id}): {e_main}", exc_info=True)
         return []
 
-# --- Function to Scrape and Merge Data for ONE Team ---
-def scrape_and_merge_team_data(driver: WebDriver, team_id: str) -> pd.DataFrame | None:
+# --- Table Parsing (works on a saved page too, see parser_benchmark.py) ---
+def parse_segment_table(page_soup: BeautifulSoup, team_id: str, segment_name: str, target_url: str) -> list:
     """
-    Scrapes Batting and Bowling data for a single team, merges them,
-    handles 'Mat' column combination, and returns a merged DataFrame.
-    Returns None if scraping fails significantly for the team.
+    Extracts and refines the rows of a trophy averages table from a parsed page.
+    `target_url` is only used to resolve player links and for log messages.
     """
-    team_name = IPL_TEAMS.get(team_id, f"Unknown ({team_id})")
-    logging.info(f"--- Starting data collection for Team: {team_name} (ID: {team_id}) ---")
-
-    segment_info_bat = SEGMENT_INFO['Batting']
-    batting_data_list = scrape_segment_data(driver, team_id, segment_info_bat['name'], segment_info_bat['path'])
+    refined_data = []
+    raw_data = [] # Holds data before refinement
+    data_table = page_soup.select_one("table.ds-table")
+    if not data_table:
+        logging.error(f"Could not find data table element ('table.ds-table') for {segment_name} at {target_url}.")
+        return []
 
-    segment_info_bowl = SEGMENT_INFO['Bowling']
-    bowling_data_list = scrape_segment_data(driver, team_id, segment_info_bowl['name'], segment_info_bowl['path'])
+    headers = []
+    header_row = data_table.select_one("thead tr")
+    if header_row:
+        header_cells = header_row.find_all(['th', 'td'], recursive=False)
+        headers = [safe_get_text(cell).replace('Span','Span Text') for cell in header_cells]
+        # logging.info(f"Extracted {segment_name} Headers for Team {team_id}: {headers}") # Reduce log noise
+    else:
+        logging.error(f"Could not find table header row (thead tr) for {segment_name} at {target_url}.")
+        return []
 
-    if not batting_data_list and not bowling_data_list:
-        logging.warning(f"No data collected for Team ID {team_id}. Skipping merge.")
+    table_body = data_table.find('tbody')
+    if not table_body:
+        logging.error(f"Could not find table body (tbody) for {segment_name} at {target_url}.")
+        return []
+    else:
+        data_rows = table_body.find_all('tr', recursive=False)
+        processed_count = 0
+        # Define wanted base headers (before rename) + Player Link / Span Text
+        # Includes 'BBI' now for processing
+        wanted_bat_headers = ['Player', 'Player Link', 'Span Text', 'Mat', 'Inns', 'NO', 'Runs', 'HS', 'Ave', 'SR', '100', '50', '0']
+        wanted_bowl_headers = ['Player', 'Player Link', 'Span Text', 'Mat', 'Inns', 'Mdns', 'Runs', 'Wkts', 'BBI', 'Ave', 'Econ', 'SR', '5', '10']
+        wanted_headers = wanted_bat_headers if segment_name == 'Batting' else wanted_bowl_headers
+
+        for i, row in enumerate(data_rows):
+            cols = row.find_all('td', recursive=False)
+            if len(cols) == len(headers):
+                row_data = {}
+                valid_row = True
+                for j, header in enumerate(headers):
+                    header_text = header
+                    if header_text not in wanted_headers:
+                        continue
+
+                    value = safe_get_text(cols[j])
+                    key_name = header_text # Keep track of original for special handling
+
+                    # Handle Player link extraction and ID (essential)
+                    if header_text == 'Player':
+                        player_cell = cols[j]
+                        value = safe_get_text(player_cell)
+                        link_tag = player_cell.find('a', href=True)
+                        player_link = urljoin(target_url, link_tag['href']) if link_tag and link_tag.get('href') else 'N/A'
+                        row_data['Player Link'] = player_link
+                        row_data['Player'] = value # Store player name
+                        if value == 'N/A' or value == '':
+                             logging.warning(f"Row {i+1} (Team {team_id}, {segment_name}) skipped, missing player name.")
+                             valid_row = False
+                             break
+                        continue # Move to next header after handling Player
+
+                    # Handle BBI splitting (Bowling only)
+                    elif header_text == 'BBI' and segment_name == 'Bowling':
+                        bbi_wickets = 'N/A'
+                        bbi_runs = 'N/A'
+                        if value != 'N/A' and '/' in value:
+                            parts = value.split('/')
+                            if len(parts) == 2:
+                                bbi_wickets = parts[0].strip()
+                                bbi_runs = parts[1].strip()
+                            else:
+                                logging.warning(f"Unexpected BBI format '{value}' for player in row {i+1}, Team {team_id}.")
+                        elif value != 'N/A' and value != '-': # Handle cases where BBI might just be '-' if no wickets
+                            logging.warning(f"Unexpected BBI value '{value}' (no '/') for player in row {i+1}, Team {team_id}.")
+
+                        row_data['BBI Wickets'] = bbi_wickets
+                        row_data['BBI Runs'] = bbi_runs
+                        continue # Move to next header after handling BBI
+
+                    # Perform renaming for other specific columns
+                    elif header_text == 'Runs':
+                        key_name = 'Runs Scored' if segment_name == 'Batting' else 'Runs Conceded'
+                    elif header_text == 'Ave':
+                        key_name = 'Batting Ave' if segment_name == 'Batting' else 'Bowling Ave'
+                    elif header_text == 'SR':
+                        key_name = 'Batting SR' if segment_name == 'Batting' else 'Bowling SR'
+                    elif header_text == 'Mat':
+                        key_name = 'Mat_bat' if segment_name == 'Batting' else 'Mat_bowl'
+                    elif header_text == 'Inns':
+                         key_name = 'Inns_bat' if segment_name == 'Batting' else 'Inns_bowl'
+                    elif header_text == '5':
+                         key_name = '5 Wkts'
+                    elif header_text == '10':
+                         key_name = '10 Wkts'
+                    elif header_text == 'HS':
+                         value = value.replace('*', '') # Clean HS value
+
+                    # Store the value with the final key name (if not handled above)
+                    row_data[key_name] = value
+
+                if valid_row:
+                    raw_data.append(row_data)
+                    processed_count += 1
+            else:
+                logging.warning(f"Skipping row {i+1} in {segment_name} table for Team {team_id} (column count mismatch).")
+        # logging.info(f"Extracted raw {segment_name} data for {processed_count} rows for Team {team_id}.")
+
+    # --- Refine Data ---
+    # logging.info(f"Refining {len(raw_data)} {segment_name} entries for Team {team_id}...")
+    for entry in raw_data:
+        refined_entry = entry.copy()
+        player_link = refined_entry.pop('Player Link', 'N/A')
+        player_id_val = extract_player_id(player_link)
+        if player_id_val == 'N/A':
+            logging.warning(f"Skipping refinement for entry (Team {team_id}, {segment_name}), missing Player ID: {entry.get('Player', 'Unknown Player')}")
+            continue
+        refined_entry['Player ID'] = player_id_val
+
+        span_text = refined_entry.pop('Span Text', 'N/A')
+        first_season, last_season = parse_career_span(span_text)
+        refined_entry['First Season'] = first_season
+        refined_entry['Last Season'] = last_season
+        refined_entry['Team ID'] = team_id
+        refined_data.append(refined_entry)
+
+    # logging.info(f"Finished refining {len(refined_data)} {segment_name} entries for Team {team_id}.")
+    return refined_data
+
+# --- Function to Scrape ONE Team ---
+def scrape_team_segments(driver: WebDriver, team_id: str) -> dict:
+    """Scrapes the Batting and Bowling pages of one team. Returns {(team_id, segment_name): rows}."""
+    team_name = IPL_TEAMS.get(team_id, f"Unknown ({team_id})")
+    logging.info(f"--- Starting data collection for Team: {team_name} (ID: {team_id}) ---")
+    return {(team_id, segment['name']): scrape_segment_data(driver, team_id, segment['name'], segment['path']) for segment in SEGMENT_INFO.values()}
+
+# --- Merge All Teams in One Pass ---
+def _segment_long_table(segment_rows: dict, segment_name: str, stat_types: dict) -> pd.DataFrame:
+    """All teams' rows of one segment as one typed long table, one row per (Team ID, Player ID)."""
+    rows = [row for (_, name), team_rows in segment_rows.items() if name == segment_name for row in team_rows or []]
+    long_df = pd.DataFrame.from_records(rows).reindex(columns=PLAYER_KEY_COLS + PLAYER_INFO_COLS + list(stat_types))
+    for col, dtype in stat_types.items():
+        long_df[col] = pd.to_numeric(long_df[col].replace(['N/A', '-', ''], np.nan), errors='coerce').astype(dtype)
+    for col in ('First Season', 'Last Season'):
+        long_df[col] = pd.to_numeric(long_df[col], errors='coerce').astype('Int16')
+    duplicated = long_df.duplicated(PLAYER_KEY_COLS, keep='first')
+    if duplicated.any():
+        logging.warning(f"{segment_name}: {int(duplicated.sum())} repeated (Team ID, Player ID) rows dropped.")
+        long_df = long_df[~duplicated]
+    return long_df
+
+def merge_all_teams(segment_rows: dict) -> pd.DataFrame:
+    """
+    Joins the batting and bowling long tables of every team at once on (Team ID, Player ID).
+    A player's span is the widest of his batting and bowling spans; 'Mat' is the larger of the two segment counts.
+    """
+    batting_df = _segment_long_table(segment_rows, 'Batting', BATTING_STAT_TYPES)
+    bowling_df = _segment_long_table(segment_rows, 'Bowling', BOWLING_STAT_TYPES)
+    identity = (pd.concat([batting_df[PLAYER_KEY_COLS + PLAYER_INFO_COLS], bowling_df[PLAYER_KEY_COLS + PLAYER_INFO_COLS]])
+                .groupby(PLAYER_KEY_COLS, sort=False).agg({'Player': 'first', 'First Season': 'min', 'Last Season': 'max'}))
+    merged = (identity
+              .join(batting_df.set_index(PLAYER_KEY_COLS)[list(BATTING_STAT_TYPES)])
+              .join(bowling_df.set_index(PLAYER_KEY_COLS)[list(BOWLING_STAT_TYPES)])
+              .reset_index())
+    merged['Mat'] = pd.array(np.fmax(merged['Mat_bat'].to_numpy(dtype='float64', na_value=np.nan),
+                                     merged['Mat_bowl'].to_numpy(dtype='float64', na_value=np.nan)), dtype='float64').astype('Int32')
+    team_order = {team_id: position for position, team_id in enumerate(IPL_TEAMS)}
+    merged = (merged.assign(_team_order=merged['Team ID'].map(team_order).fillna(len(team_order)))
+              .sort_values(['_team_order', 'Player', 'Player ID'], kind='stable'))
+    return merged.reindex(columns=FINAL_MERGED_COLS).reset_index(drop=True)
+
+def roll_up_franchises(merged_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sums each player's rows over all team IDs of a franchise lineage (FRANCHISE_LINEAGE) and re-derives the rate columns.
+    Balls faced / balls bowled are recovered from Runs and SR / Econ, so the derived rates are weighted correctly.
+    """
+    df = merged_df.assign(
+        Franchise=merged_df['Team ID'].map(lambda team_id: FRANCHISE_LINEAGE.get(team_id, IPL_TEAMS.get(team_id, team_id))),
+        _balls_faced=merged_df['Runs Scored'].astype('float64') * 100 / merged_df['Batting SR'].astype('float64').replace(0, np.nan),
+        _balls_bowled=merged_df['Runs Conceded'].astype('float64') * 6 / merged_df['Econ'].astype('float64').replace(0, np.nan),
+    )
+    group_cols = ['Franchise', 'Player ID']
+    grouped = df.groupby(group_cols, sort=False)
+    rollup = grouped.agg(**{
+        'Player': ('Player', 'first'), 'Team IDs': ('Team ID', lambda ids: '|'.join(dict.fromkeys(ids))),
+        'First Season': ('First Season', 'min'), 'Last Season': ('Last Season', 'max'), 'HS': ('HS', 'max'),
+    })
+    sums = grouped[FRANCHISE_SUM_COLS + ['_balls_faced', '_balls_bowled']].sum(min_count=1)
+    best_bowling = (df.sort_values(['BBI Wickets', 'BBI Runs'], ascending=[False, True], na_position='last')
+                    .groupby(group_cols, sort=False)[['BBI Wickets', 'BBI Runs']].first())
+    rollup = rollup.join(sums).join(best_bowling).reset_index()
+    dismissals = (rollup['Inns_bat'] - rollup['NO']).astype('float64')
+    rollup['Batting Ave'] = (rollup['Runs Scored'].astype('float64') / dismissals.where(dismissals > 0)).astype('float32')
+    rollup['Batting SR'] = (rollup['Runs Scored'].astype('float64') * 100 / rollup['_balls_faced']).astype('float32')
+    wickets = rollup['Wkts'].astype('float64').where(rollup['Wkts'] > 0)
+    rollup['Bowling Ave'] = (rollup['Runs Conceded'].astype('float64') / wickets).astype('float32')
+    rollup['Econ'] = (rollup['Runs Conceded'].astype('float64') * 6 / rollup['_balls_bowled']).astype('float32')
+    rollup['Bowling SR'] = (rollup['_balls_bowled'] / wickets).astype('float32')
+    return rollup.reindex(columns=FRANCHISE_ROLLUP_COLS)
+
+# --- Concurrent Crawl ---
+def scrape_segment_data_http(team_id: str, segment_name: str, segment_path: str) -> list | None:
+    """Browserless fetch of one segment page. Returns None (not []) when the table is not in the served HTML, so the caller can fall back to a browser."""
+    target_url = f"{BASE_URL_START}{segment_path}{BASE_URL_END.format(team_id)}"
+    try:
+        page_soup = BeautifulSoup(fetch_html(target_url), 'lxml')
+    except Exception as e:
+        logging.warning(f"HTTP fetch failed for {segment_name} (Team {team_id}): {e}")
         return None
+    if not page_soup.select_one("table.ds-table tbody"):
+        logging.info(f"{segment_name} table for Team {team_id} not in the served HTML; falling back to the browser.")
+        return None
+    return parse_segment_table(page_soup, team_id, segment_name, target_url)
 
-    try:
-        batting_df = pd.DataFrame(batting_data_list)
-        bowling_df = pd.DataFrame(bowling_data_list)
-
-        key_cols = ['Player ID', 'Player', 'Team ID', 'First Season', 'Last Season']
-        valid_batting_df = not batting_df.empty and all(col in batting_df.columns for col in key_cols)
-        valid_bowling_df = not bowling_df.empty and all(col in bowling_df.columns for col in key_cols)
-        merged_df = pd.DataFrame()
-
-        if valid_batting_df and valid_bowling_df:
-            merged_df = pd.merge(batting_df, bowling_df, on=key_cols, how='outer')
-        elif valid_batting_df:
-             logging.warning(f"Only batting data found/valid for Team {team_id}.")
-             merged_df = batting_df
-        elif valid_bowling_df:
-             logging.warning(f"Only bowling data found/valid for Team {team_id}.")
-             merged_df = bowling_df
-        else:
-             logging.error(f"Neither batting nor bowling data valid for merge for Team {team_id}.")
-             return None
-
-        if not merged_df.empty:
-            # Combine Mat column
-            if 'Mat_bat' in merged_df.columns:
-                merged_df['Mat_bat_num'] = pd.to_numeric(merged_df['Mat_bat'], errors='coerce')
-            else: merged_df['Mat_bat_num'] = np.nan
-            if 'Mat_bowl' in merged_df.columns:
-                merged_df['Mat_bowl_num'] = pd.to_numeric(merged_df['Mat_bowl'], errors='coerce')
-            else: merged_df['Mat_bowl_num'] = np.nan
-
-            merged_df['Mat'] = merged_df[['Mat_bat_num', 'Mat_bowl_num']].max(axis=1)
-            merged_df['Mat'] = merged_df['Mat'].astype('Int64')
-
-            cols_to_drop = [col for col in ['Mat_bat', 'Mat_bowl', 'Mat_bat_num', 'Mat_bowl_num'] if col in merged_df.columns]
-            merged_df = merged_df.drop(columns=cols_to_drop)
-            return merged_df
-        else:
-            logging.warning(f"Resulting merged DataFrame is empty for Team {team_id}.")
-            return None
+def crawl_segments_concurrently(team_ids: list) -> dict:
+    """
+    Fetches every (team, segment) page using CONCURRENT_WORKERS threads that share one rate limit
+    and a pool of at most CONCURRENT_WORKERS drivers. Returns {(team_id, segment_name): rows} in job order.
+    """
+    limiter = RateLimiter(MIN_REQUEST_INTERVAL, REQUEST_JITTER)
+    pool = DriverPool(setup_driver, CONCURRENT_WORKERS)
+    jobs = [(team_id, segment['name']) for team_id in team_ids for segment in SEGMENT_INFO.values()]
+    logging.info(f"Crawling {len(jobs)} (team, segment) pages with {CONCURRENT_WORKERS} workers ({FETCH_MODE} mode, >= {MIN_REQUEST_INTERVAL}s between requests).")
+
+    def fetch_job(job):
+        team_id, segment_name = job
+        segment_path = SEGMENT_INFO[segment_name]['path']
+        if FETCH_MODE == 'http':
+            limiter.wait()
+            rows = scrape_segment_data_http(team_id, segment_name, segment_path)
+            if rows is not None:
+                return rows
+        with pool.driver() as driver:
+            limiter.wait()
+            return scrape_segment_data(driver, team_id, segment_name, segment_path)
 
-    except Exception as e_merge:
-        logging.error(f"Error merging data for Team {team_id}: {e_merge}", exc_info=True)
-        return None
+    try:
+        results = run_jobs(jobs, fetch_job, CONCURRENT_WORKERS)
+    finally:
+        pool.close_all()
+    return {job: rows or [] for job, rows in results.items()}
 
 # --- Main Execution Logic ---
 if __name__ == "__main__":
     overall_start_time = time.time()
     driver = None
-    all_teams_dataframes = [] # List to hold final DataFrame for each team
+    segment_rows = {} # {(team_id, segment_name): rows}, merged for all teams in one pass below
 
+    IPL_TEAMS = team_code.resolve_teams(fallback=IPL_TEAMS) # Cached team codes (TTL); new franchises need no code edit
     logging.info(f"--- Starting processing for all {len(IPL_TEAMS)} IPL teams ---")
 
     try:
-        driver = setup_driver() # Setup driver once for all teams
-
-        team_count = 0
-        total_teams = len(IPL_TEAMS)
-        for team_id, team_name in IPL_TEAMS.items():
-            team_count += 1
-            logging.info(f"\n>>> Processing Team {team_count}/{total_teams}: {team_name} (ID: {team_id}) <<<\n")
-
-            team_merged_df = scrape_and_merge_team_data(driver, team_id)
-
-            if team_merged_df is not None and not team_merged_df.empty:
-                all_teams_dataframes.append(team_merged_df)
-                logging.info(f"Successfully processed and stored data for {team_name}.")
-            else:
-                logging.warning(f"Failed to get complete merged data for {team_name} (ID: {team_id}). Team skipped.")
-            # Optional: Add delay between teams?
-            # time.sleep(random.uniform(3, 7)) # Example random delay
-
+        if CONCURRENT_WORKERS > 1:
+            segment_rows = crawl_segments_concurrently(list(IPL_TEAMS))
+        else:
+            driver = setup_driver() # Setup driver once for all teams
+            total_teams = len(IPL_TEAMS)
+            for team_count, team_id in enumerate(IPL_TEAMS, 1):
+                logging.info(f"\n>>> Team {team_count}/{total_teams}: {IPL_TEAMS[team_id]} (ID: {team_id}) <<<\n")
+                segment_rows.update(scrape_team_segments(driver, team_id))
 
     except Exception as e:
         logging.critical(f"A critical error occurred during driver setup or the main team processing loop: {e}", exc_info=True)
@@ -410,48 +500,37 @@ if __name__ == "__main__":
             except Exception as quit_err:
                 logging.error(f"Error occurred while closing the browser: {quit_err}")
 
-    # --- Concatenate All Team Results and Save to CSV ---
-    logging.info("\n" + "="*20 + f" Concatenating and Saving Data for ALL Processed Teams " + "="*20)
+    teams_with_data = [team_id for team_id in IPL_TEAMS if any(segment_rows.get((team_id, segment['name'])) for segment in SEGMENT_INFO.values())]
+    for team_id in IPL_TEAMS:
+        if team_id not in teams_with_data:
+            logging.warning(f"No data collected for {IPL_TEAMS[team_id]} (ID: {team_id}). Team skipped.")
 
-    if all_teams_dataframes: # Check if we got data for at least one team
+    # --- Merge All Teams and Save to CSV ---
+    logging.info("\n" + "="*20 + f" Merging and Saving Data for ALL Processed Teams " + "="*20)
+
+    if teams_with_data: # Check if we got data for at least one team
         try:
-            final_df = pd.concat(all_teams_dataframes, ignore_index=True)
-            logging.info(f"Concatenated DataFrames for {len(all_teams_dataframes)} teams. Final combined shape: {final_df.shape}")
+            final_df = merge_all_teams(segment_rows)
+            logging.info(f"Merged batting and bowling rows of {len(teams_with_data)} teams. Final combined shape: {final_df.shape}")
 
             if not final_df.empty:
-                # Define final column order including NEW BBI columns
-                final_merged_cols = [
-                    'Player', 'Player ID', 'Team ID', 'First Season', 'Last Season', # Keys
-                    'Mat', # Combined Matches
-                    # Batting Stats
-                    'Inns_bat', 'NO', 'Runs Scored', 'HS', 'Batting Ave', 'Batting SR', '100', '50', '0',
-                    # Bowling Stats
-                    'Inns_bowl', 'Mdns', 'Runs Conceded', 'Wkts',
-                    'BBI Wickets', 'BBI Runs', # New BBI columns
-                    'Bowling Ave', 'Econ', 'Bowling SR', '5 Wkts', '10 Wkts'
-                ]
-
-                # Filter/reorder based on columns actually present
-                final_cols_present = [col for col in final_merged_cols if col in final_df.columns]
-                missing_cols = [col for col in final_merged_cols if col not in final_df.columns]
-                if missing_cols:
-                    logging.warning(f"Columns missing from final concatenated data: {missing_cols}")
-
-                final_df = final_df[final_cols_present]
-                logging.info(f"Final columns selected and ordered for combined CSV: {final_cols_present}")
-
                 # --- Save to CSV ---
                 logging.info(f"Saving combined data for ALL processed teams to CSV file: {OUTPUT_CSV_PATH}")
                 final_df.to_csv(OUTPUT_CSV_PATH, index=False, encoding='utf-8-sig')
                 logging.info(f"Successfully saved data to {OUTPUT_CSV_PATH}")
+                if WRITE_CHANGE_SETS: snapshot_diff.record_csv_snapshot("batting_bowling_stat", OUTPUT_CSV_PATH, PLAYER_TEAM_KEY)
+
+                franchise_df = roll_up_franchises(final_df)
+                franchise_df.to_csv(FRANCHISE_CSV_PATH, index=False, encoding='utf-8-sig')
+                logging.info(f"Saved franchise roll-up ({len(franchise_df)} rows, {franchise_df['Franchise'].nunique()} franchises) to {FRANCHISE_CSV_PATH}")
                 print(f"\n*** Combined player data for ALL processed teams successfully saved to: {OUTPUT_CSV_PATH} ***")
                 print(f"    You can now connect Power BI to this CSV file.")
             else:
-                 logging.warning(f"Final concatenated DataFrame is empty after processing all teams. No CSV file generated.")
+                 logging.warning(f"Final merged DataFrame is empty after processing all teams. No CSV file generated.")
                  print(f"\n--- Final data is empty after processing all teams. No CSV file generated. ---")
 
         except Exception as e_proc:
-            logging.error(f"Error concatenating DataFrames or saving final CSV: {e_proc}", exc_info=True)
+            logging.error(f"Error merging team data or saving final CSV: {e_proc}", exc_info=True)
             print(f"\n--- Error processing or saving final combined data. Check logs: {log_filename} ---")
     else:
         logging.warning(f"No valid data collected for ANY team. Cannot generate CSV.")
@@ -468,5 +547,5 @@ if __name__ == "__main__":
              logging.info("Final combined DataFrame was empty or not created.")
     except NameError:
          logging.info("Final combined DataFrame was not created due to earlier errors.")
-    logging.info(f"Processed data for {len(all_teams_dataframes)} out of {len(IPL_TEAMS)} defined teams.")
+    logging.info(f"Processed data for {len(teams_with_data)} out of {len(IPL_TEAMS)} defined teams.")
     logging.info("="*50 + " Script End " + "="*50)
\ No newline at end of file
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Compact-dtype loader for the scraped CSVs.
+
+A plain pd.read_csv gives object columns for teams, players, grounds and
+dismissal types and int64/float64 for counts that never exceed a few hundred.
+This loader applies a fixed schema instead:
+
+    category          teams, grounds, player names, dismissal types, formats, seasons
+    Int32             Match ID, player IDs, Ground ID (nullable: a few rows have no ID)
+    Int16 / UInt8     runs, balls, fours, sixes, wickets, maidens, extras
+    float32           strike rates, economy, averages, overs
+
+and logs how much memory that saved. Groupbys over categorical keys are also
+much faster than over object columns (pass observed=True).
+
+    from compact_loader import load_scorecards
+    batting = load_scorecards('batting', seasons=['2023', '2024'])
+
+`python compact_loader.py` loads every scraped CSV found on disk and prints the savings.
+"""
+import glob
+import logging
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+NULL_PLACEHOLDERS = ['-', 'N/A', '']
+# Season scripts may be run from the repo root or from Match_Scorecard/
+SCORECARD_SEARCH_DIRS = [REPO_ROOT, os.path.join(REPO_ROOT, "Match_Scorecard")]
+SEASON_CSV_SUFFIXES = {
+    'match_summary': '_All_matches.csv',
+    'batting': '_All_matches_batting.csv',
+    'bowling': '_All_matches_bowling.csv',
+}
+ENGINE_CSV_PATHS = {
+    'career_batting': os.path.join(REPO_ROOT, "Career_Averages_Output", "career_batting_averages.csv"),
+    'career_bowling': os.path.join(REPO_ROOT, "Career_Averages_Output", "career_bowling_averages.csv"),
+    'innings_batting': os.path.join(REPO_ROOT, "Innings_By_Innings_output", "innings_by_innings_batting.csv"),
+    'innings_bowling': os.path.join(REPO_ROOT, "Innings_By_Innings_output", "innings_by_innings_bowling.csv"),
+    'career_fielding': os.path.join(REPO_ROOT, "Career_Averages_Output", "career_fielding.csv"),
+}
+
+# --- Compact Schemas ---
+# Column -> pandas dtype. Columns not listed are left as read.
+COMPACT_SCHEMAS = {
+    'match_summary': {
+        'Season': 'category', 'Match ID': 'Int32', 'Team 1': 'category', 'Team 2': 'category', 'Winner': 'category',
+        'Net Margin': 'float32', 'Margin Type': 'category', 'Ground Name': 'category', 'Ground ID': 'Int32',
+        'Match Date': 'datetime64[ns]', 'Scorecard Link': 'string', 'Margin Raw': 'string',
+    },
+    'batting': {
+        'Match ID': 'Int32', 'Innings': 'UInt8', 'Batting Team': 'category', 'Batter': 'category', 'Batter id': 'Int32',
+        'Run Scored': 'Int16', 'Ball faced': 'Int16', 'Fours': 'UInt8', 'Sixes': 'UInt8', 'Strike rate': 'float32',
+        'Dismissal Type': 'category', 'Dismissal Player': 'category', 'Dismissal Bowler': 'category',
+    },
+    'bowling': {
+        'Match ID': 'Int32', 'Innings': 'UInt8', 'Bowling Team': 'category', 'Bowler': 'category', 'Bowler id': 'Int32',
+        'Over bowled': 'float32', 'Maiden Over': 'UInt8', 'Run given': 'Int16', 'Wicket taken': 'UInt8',
+        'Economy rate': 'float32', 'Wides': 'UInt8', 'No balls': 'UInt8', 'Dot balls': 'UInt8', 'Fours': 'UInt8', 'Sixes': 'UInt8',
+    },
+    'career_batting': {
+        'Player Name': 'category', 'Player ID': 'Int32', 'Format': 'category', 'Span': 'category', 'Matches': 'Int16',
+        'Innings': 'Int16', 'NO': 'Int16', 'Runs': 'Int32', 'HS': 'Int16', 'Ave': 'float32', 'BF': 'Int32', 'SR': 'float32',
+        '100': 'Int16', '50': 'Int16', '0': 'Int16', '4s': 'Int16', '6s': 'Int16',
+    },
+    'career_bowling': {
+        'Player Name': 'category', 'Player ID': 'Int32', 'Format': 'category', 'Span': 'category', 'Matches': 'Int16',
+        'Innings': 'Int16', 'Overs': 'float32', 'Mdns': 'Int16', 'Runs': 'Int32', 'Wkts': 'Int16', 'BBI Wkts': 'UInt8',
+        'BBI Runs': 'Int16', 'Ave': 'float32', 'Econ': 'float32', 'SR': 'float32', '4w': 'Int16', '5w': 'Int16',
+    },
+    'innings_batting': {
+        'Player Name': 'category', 'Player ID': 'Int32', 'Runs': 'Int16', 'Mins': 'Int16', 'BF': 'Int16', '4s': 'UInt8',
+        '6s': 'UInt8', 'SR': 'float32', 'Pos': 'UInt8', 'Dismissal': 'category', 'Inns': 'UInt8',
+        'Opposition': 'category', 'Ground': 'category', 'Start Date': 'datetime64[ns]',
+    },
+    'innings_bowling': {
+        'Player Name': 'category', 'Player ID': 'Int32', 'Overs': 'float32', 'Mdns': 'UInt8', 'Runs': 'Int16', 'Wkts': 'UInt8',
+        'Econ': 'float32', 'Pos': 'UInt8', 'Inns': 'UInt8', 'Opposition': 'category', 'Ground': 'category', 'Start Date': 'datetime64[ns]',
+    },
+    'career_fielding': {
+        'Player Name': 'category', 'Player ID': 'Int32', 'Format': 'category', 'Span': 'category', 'Matches': 'Int16',
+        'Innings': 'Int16', 'Dis': 'Int16', 'Ct': 'Int16', 'St': 'Int16', 'Ct Wk': 'Int16', 'Ct Fi': 'Int16', 'MD': 'string', 'D/I': 'float32',
+    },
+}
+# Next wider type when a value does not fit (logged, never silently wrapped)
+_WIDER_INTEGER = {'UInt8': 'Int16', 'Int16': 'Int32', 'Int32': 'Int64'}
+
+
+# --- Conversion ---
+def _fit_integer(numeric: pd.Series, dtype: str, label: str) -> pd.Series:
+    fractional = numeric.notna() & (numeric % 1 != 0)
+    if fractional.any():
+        logging.warning(f"Compact {label}: {int(fractional.sum())} non-integer values set to null.")
+        numeric = numeric.mask(fractional)
+    values = numeric.dropna()
+    while dtype in _WIDER_INTEGER and not values.empty:
+        info = np.iinfo(dtype.lower())
+        if values.min() >= info.min and values.max() <= info.max:
+            break
+        logging.warning(f"Compact {label}: values outside {dtype} range, widening to {_WIDER_INTEGER[dtype]}.")
+        dtype = _WIDER_INTEGER[dtype]
+    return numeric.astype(dtype)
+
+def compact_dtypes(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """Returns a copy of df with the table's compact schema applied (placeholders -> NA in numeric/date columns)."""
+    out = df.copy()
+    for col, dtype in COMPACT_SCHEMAS[table_name].items():
+        if col not in out.columns:
+            continue
+        label = f"{table_name}.{col}"
+        if dtype in ('category', 'string'):
+            out[col] = out[col].astype('string').astype(dtype)
+        elif dtype.startswith('datetime'):
+            out[col] = pd.to_datetime(out[col], errors='coerce')
+        else:
+            numeric = pd.to_numeric(out[col].replace(NULL_PLACEHOLDERS, np.nan), errors='coerce')
+            out[col] = _fit_integer(numeric, dtype, label) if dtype in _WIDER_INTEGER else numeric.astype(dtype)
+    return out
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+def log_memory_saved(label: str, before: int, after: int) -> dict:
+    """Logs and returns the before/after footprint."""
+    ratio = before / after if after else 0.0
+    logging.info(f"Compact {label}: {before / 1024**2:.2f} MB -> {after / 1024**2:.2f} MB ({ratio:.1f}x smaller).")
+    return {'table': label, 'before_bytes': before, 'after_bytes': after, 'ratio': round(ratio, 2)}
+
+def concat_compact(frames: list) -> pd.DataFrame:
+    """pd.concat that keeps categorical columns categorical (plain concat falls back to object when categories differ)."""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    category_cols = [col for col in frames[0].columns if isinstance(frames[0][col].dtype, pd.CategoricalDtype)]
+    for col in category_cols:
+        union = union_categoricals([f[col] for f in frames if col in f.columns], ignore_order=True).categories
+        frames = [f.assign(**{col: f[col].cat.set_categories(union)}) if col in f.columns else f for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+# --- Loading ---
+def load_csv(path: str, table_name: str, report: bool = True) -> pd.DataFrame:
+    """Reads one scraper CSV and applies the compact schema. With report=True the saving is logged."""
+    raw = pd.read_csv(path, encoding='utf-8-sig', na_values=NULL_PLACEHOLDERS, low_memory=False)
+    compact = compact_dtypes(raw, table_name)
+    if report:
+        log_memory_saved(os.path.basename(path), memory_bytes(raw), memory_bytes(compact))
+    return compact
+
+def find_season_csvs(table_name: str, seasons: list | None = None, search_dirs: list | None = None) -> dict:
+    """Returns {season: csv path} for the season scorecard outputs on disk ('2007/08' and '2007-08' both accepted)."""
+    suffix = SEASON_CSV_SUFFIXES[table_name]
+    wanted = {str(s).replace('/', '-') for s in seasons} if seasons else None
+    found = {}
+    for base_dir in search_dirs or SCORECARD_SEARCH_DIRS:
+        for data_dir in sorted(glob.glob(os.path.join(base_dir, "*_Scorecard", "*_scorecard_data"))):
+            season = os.path.basename(data_dir)[:-len("_scorecard_data")]
+            csv_path = os.path.join(data_dir, f"{season}{suffix}")
+            if (wanted is None or season in wanted) and season not in found and os.path.exists(csv_path):
+                found[season] = csv_path
+    return found
+
+def load_scorecards(table_name: str, seasons: list | None = None, search_dirs: list | None = None, add_season: bool = True) -> pd.DataFrame:
+    """
+    Loads 'match_summary', 'batting' or 'bowling' for the given seasons (all on disk if None) as one compact DataFrame.
+    add_season adds a categorical 'Season' column to batting/bowling so rows can be grouped by season.
+    """
+    csv_paths = find_season_csvs(table_name, seasons, search_dirs)
+    if not csv_paths:
+        logging.warning(f"No {table_name} CSVs found for seasons {seasons or 'all'}.")
+        return pd.DataFrame(columns=list(COMPACT_SCHEMAS[table_name]))
+    frames = []; before = after = 0
+    for season, csv_path in sorted(csv_paths.items()):
+        raw = pd.read_csv(csv_path, encoding='utf-8-sig', na_values=NULL_PLACEHOLDERS, low_memory=False)
+        if add_season and 'Season' not in raw.columns: raw['Season'] = season
+        compact = compact_dtypes(raw, table_name)
+        if 'Season' in compact.columns: compact['Season'] = compact['Season'].astype('string').astype('category')
+        before += memory_bytes(raw); after += memory_bytes(compact)
+        frames.append(compact)
+    combined = concat_compact(frames)
+    log_memory_saved(f"{table_name} ({len(frames)} seasons, {len(combined)} rows)", before, after)
+    return combined
+
+def load_engine_table(table_name: str, path: str | None = None) -> pd.DataFrame:
+    """Loads an engine table ('career_batting', 'innings_bowling', ... see ENGINE_CSV_PATHS) from its default output path."""
+    return load_csv(path or ENGINE_CSV_PATHS[table_name], table_name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    tables = sys.argv[1:] or list(COMPACT_SCHEMAS)
+    for name in tables:
+        if name in SEASON_CSV_SUFFIXES:
+            df = load_scorecards(name)
+        elif os.path.exists(ENGINE_CSV_PATHS[name]):
+            df = load_engine_table(name)
+        else:
+            logging.info(f"{name}: no CSV on disk, skipped."); continue
+        print(f"\n{name}: {len(df)} rows, {memory_bytes(df) / 1024**2:.2f} MB")
+        print(df.dtypes.to_string())
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Shared pieces for crawling several pages at once.
+
+    RateLimiter   one politeness limit shared by every worker (minimum gap between requests)
+    AsyncRateLimiter  the same limit for asyncio tasks (engine_harvester.py)
+    DriverPool    a few browser drivers handed out to worker threads, created lazily
+    fetch_html    browserless GET for pages whose tables are in the server-rendered HTML
+    run_jobs      runs jobs on a thread pool and returns results in job order (deterministic merge)
+
+The scrapers keep their serial path; these are only used when a concurrent mode is configured.
+"""
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+# --- Configuration ---
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
+HTTP_TIMEOUT = 30
+
+
+class RateLimiter:
+    """Thread-safe: wait() returns no sooner than min_interval (+ jitter) after the previous caller's slot."""
+
+    def __init__(self, min_interval: float, jitter: float = 0.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock: # Reserve a slot, then sleep outside the lock so other workers can queue behind it
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval + random.uniform(0, self.jitter)
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AsyncRateLimiter:
+    """RateLimiter for tasks on one event loop: same slot reservation, but awaits instead of blocking a thread."""
+
+    def __init__(self, min_interval: float, jitter: float = 0.0):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self._next_slot = 0.0
+
+    async def wait(self):
+        # No await between reading and advancing the slot, so no lock is needed on a single event loop
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.min_interval + random.uniform(0, self.jitter)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class DriverPool:
+    """Up to `size` drivers built with setup_fn. Use `with pool.driver() as d:`; close_all() quits them."""
+
+    def __init__(self, setup_fn, size: int):
+        self.setup_fn = setup_fn
+        self.size = size
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock() # undetected_chromedriver patches its binary on start-up: create drivers one at a time
+
+    @contextmanager
+    def driver(self):
+        try:
+            drv = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._all) < self.size:
+                    drv = self.setup_fn(); self._all.append(drv)
+                    logging.info(f"Driver pool: started driver {len(self._all)}/{self.size}.")
+                else:
+                    drv = None
+            if drv is None:
+                drv = self._idle.get() # All drivers exist; wait for one to come back
+        try:
+            yield drv
+        finally:
+            self._idle.put(drv)
+
+    def close_all(self):
+        for drv in self._all:
+            try: drv.quit()
+            except Exception as e: logging.warning(f"Error quitting pooled driver: {e}")
+        logging.info(f"Driver pool: closed {len(self._all)} drivers.")
+        self._all = []; self._idle = queue.Queue()
+
+
+def fetch_html(url: str, timeout: float = HTTP_TIMEOUT, user_agent: str = DEFAULT_USER_AGENT) -> str:
+    """Plain HTTP GET (no JavaScript). Raises urllib errors on failure."""
+    request = urllib.request.Request(url, headers={'User-Agent': user_agent, 'Accept': 'text/html', 'Accept-Language': 'en-US,en;q=0.9'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        charset = response.headers.get_content_charset() or 'utf-8'
+        return response.read().decode(charset, errors='replace')
+
+
+def run_jobs(jobs: list, worker_fn, max_workers: int) -> dict:
+    """
+    Calls worker_fn(job) for every job on up to max_workers threads.
+    Returns {job: result} with keys in the order of `jobs`, whatever order they finished in.
+    A job that raises gets None (the error is logged).
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(worker_fn, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                results[job] = future.result()
+            except Exception as e:
+                logging.error(f"Concurrent job {job} failed: {e}", exc_info=True)
+                results[job] = None
+    return {job: results.get(job) for job in jobs}
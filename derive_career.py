@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Career batting and bowling averages computed from the scorecards instead of crawled.
+
+career_batting_averages.py and career_bowling_averages.py load one engine page per
+player just to read aggregates that follow from the season scorecard rows already on
+disk. derive_careers() builds both tables for every player in one groupby pass over
+all seasons (or a subset), optionally limited to a date range and to some teams, with
+the same columns as the scraped CSVs:
+
+    batting   Matches, Innings, NO, Runs, HS, Ave, BF, SR, 100, 50, 0, 4s, 6s
+    bowling   Matches, Innings, Overs, Mdns, Runs, Wkts, BBI Wkts/Runs, Ave, Econ, SR, 4w, 5w
+
+Conventions follow Statsguru: 'not out' and 'retired hurt' are not dismissals, 4w is
+exactly four wickets and 5w five or more, Overs are balls written as overs.balls.
+Matches counts the distinct matches a player batted or bowled in; the scorecards have
+no rows for players who did neither, so it can be lower than the engine's figure.
+
+reconcile() compares a derived table with the scraped one, stat by stat, and
+`python derive_career.py` writes both derived tables and the reconciliation reports
+to Career_Averages_Output/ (skipped while the scorecard and scraped CSVs it reads, its
+code and its arguments are unchanged; --force reruns it). The scorecards are IPL only,
+so the comparison is with the IPL-only engine records (SCRAPED_STAT_FORMAT, class=6;
+trophy=117), harvested with `player_harvest.py --formats ipl`. The default all-T20
+pages would flag every player with a T20 career outside the IPL.
+
+    from derive_career import derive_careers
+    batting, bowling = derive_careers(start='2023-01-01', teams=['Mumbai Indians'])
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import compact_loader
+import stat_formats
+from pipeline_manifest import StageManifest
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(REPO_ROOT, "Career_Averages_Output")
+DERIVED_CSV_PATHS = {
+    'career_batting': os.path.join(OUTPUT_DIR, "derived_career_batting.csv"),
+    'career_bowling': os.path.join(OUTPUT_DIR, "derived_career_bowling.csv"),
+}
+RECONCILIATION_CSV_PATHS = {
+    'career_batting': os.path.join(OUTPUT_DIR, "career_batting_reconciliation.csv"),
+    'career_bowling': os.path.join(OUTPUT_DIR, "career_bowling_reconciliation.csv"),
+}
+DERIVED_FORMAT = 'IPL' # 'Format' label of the derived rows
+SCRAPED_STAT_FORMAT = 'ipl' # stat_formats format reconciled against: the same population as the scorecards
+SCRAPED_FORMAT = stat_formats.STAT_FORMATS[SCRAPED_STAT_FORMAT]['label'] # 'Format' of those scraped rows
+NOT_OUT_DISMISSALS = ['not out', 'retired hurt', 'retired not out']
+RECONCILE_TOLERANCE = 0.01 # Rates are rounded to 2 places on both sides
+SKIP_IF_UP_TO_DATE = True # Inputs, outputs, code and arguments unchanged: nothing to derive (pipeline_manifest.py)
+
+CAREER_BATTING_CSV_COLUMNS = ['Player Name', 'Player ID', 'Format', 'Span', 'Matches', 'Innings', 'NO', 'Runs', 'HS', 'Ave', 'BF', 'SR', '100', '50', '0', '4s', '6s']
+CAREER_BOWLING_CSV_COLUMNS = ['Player Name', 'Player ID', 'Format', 'Span', 'Matches', 'Innings', 'Overs', 'Mdns', 'Runs', 'Wkts', 'BBI Wkts', 'BBI Runs', 'Ave', 'Econ', 'SR', '4w', '5w']
+BATTING_COUNT_COLUMNS = ['Innings', 'NO', 'Runs', 'BF', '100', '50', '0', '4s', '6s']
+BOWLING_COUNT_COLUMNS = ['Innings', 'Mdns', 'Runs', 'Wkts', '4w', '5w']
+# Written as integers like the scraped CSVs; HS and BBI stay empty for players who never batted / bowled
+BATTING_INT_COLUMNS = BATTING_COUNT_COLUMNS + ['HS']
+BOWLING_INT_COLUMNS = BOWLING_COUNT_COLUMNS + ['BBI Wkts', 'BBI Runs']
+
+
+# --- Scorecard Rows ---
+def overs_to_balls(overs: pd.Series) -> pd.Series:
+    """3.4 overs -> 22 balls (the digit after the point is balls, not tenths)."""
+    overs = overs.astype('float64')
+    whole = np.floor(overs)
+    return whole * 6 + ((overs - whole) * 10).round()
+
+def balls_to_overs(balls: pd.Series) -> pd.Series:
+    return (balls // 6) + (balls % 6) / 10
+
+def _with_match_dates(table: pd.DataFrame, match_dates: pd.DataFrame) -> pd.DataFrame:
+    table = table.dropna(subset=['Match ID']).astype({'Match ID': 'int64'})
+    return table.merge(match_dates, on='Match ID', how='left') if not match_dates.empty else table.assign(**{'Match Date': pd.NaT})
+
+def load_scorecard_rows(seasons: list | None = None, start=None, end=None, teams: list | None = None) -> tuple:
+    """(batting, bowling) scorecard rows with 'Match Date', filtered to start <= date <= end and to rows played for `teams`."""
+    match_dates = compact_loader.load_scorecards('match_summary', seasons)
+    if not match_dates.empty:
+        match_dates = match_dates[['Match ID', 'Match Date']].dropna(subset=['Match ID']).astype({'Match ID': 'int64'}).drop_duplicates('Match ID')
+    tables = []
+    for role, team_col in (('batting', 'Batting Team'), ('bowling', 'Bowling Team')):
+        table = _with_match_dates(compact_loader.load_scorecards(role, seasons), match_dates)
+        keep = pd.Series(True, index=table.index)
+        if start is not None: keep &= table['Match Date'] >= pd.Timestamp(start)
+        if end is not None: keep &= table['Match Date'] <= pd.Timestamp(end)
+        if teams: keep &= table[team_col].astype('string').isin(teams).fillna(False)
+        tables.append(table[keep].reset_index(drop=True))
+    return tuple(tables)
+
+def _appearances(batting: pd.DataFrame, bowling: pd.DataFrame) -> pd.DataFrame:
+    """One row per (player, match) with the player's name in that match, from batting and bowling rows."""
+    frames = [pd.DataFrame({'Player ID': table[id_col], 'Player Name': table[name_col].astype('string'), 'Match ID': table['Match ID'],
+                            'Match Date': table['Match Date'], 'Season': table['Season'].astype('string') if 'Season' in table.columns else pd.NA})
+              for table, id_col, name_col in ((batting, 'Batter id', 'Batter'), (bowling, 'Bowler id', 'Bowler'))]
+    appearances = pd.concat(frames, ignore_index=True).dropna(subset=['Player ID'])
+    appearances['Player ID'] = appearances['Player ID'].astype('int64').astype(str)
+    return appearances.sort_values(['Match Date', 'Match ID'], na_position='first', kind='stable').drop_duplicates(['Player ID', 'Match ID'], keep='last')
+
+def _player_frame(appearances: pd.DataFrame) -> pd.DataFrame:
+    """Per player: latest name, Span (first-last year) and Matches, indexed by Player ID."""
+    years = appearances['Match Date'].dt.year.astype('Int64').fillna(pd.to_numeric(appearances['Season'].str[:4], errors='coerce').astype('Int64'))
+    players = appearances.assign(_year=years).groupby('Player ID', sort=False).agg(**{
+        'Player Name': ('Player Name', 'last'), '_first': ('_year', 'min'), '_last': ('_year', 'max'), 'Matches': ('Match ID', 'nunique'),
+    })
+    players['Span'] = players['_first'].astype('string') + '-' + players['_last'].astype('string')
+    return players.drop(columns=['_first', '_last'])
+
+def _finish(players: pd.DataFrame, stats: pd.DataFrame, count_columns: list, int_columns: list, columns: list) -> pd.DataFrame:
+    table = players.join(stats, how='left')
+    table[count_columns] = table[count_columns].fillna(0) # Appeared but never batted / bowled: zero innings, as on the engine page
+    table[int_columns] = table[int_columns].round().astype('Int64')
+    table = table.assign(Format=DERIVED_FORMAT).reset_index()
+    return table.sort_values(['Matches', 'Player Name'], ascending=[False, True], kind='stable').reindex(columns=columns).reset_index(drop=True)
+
+
+# --- Aggregation ---
+def derive_career_batting(batting: pd.DataFrame, bowling: pd.DataFrame) -> pd.DataFrame:
+    """Career batting table (CAREER_BATTING_CSV_COLUMNS) for everyone who batted or bowled in the given rows."""
+    rows = batting.dropna(subset=['Batter id'])
+    runs = rows['Run Scored'].astype('float64')
+    not_out = rows['Dismissal Type'].astype('string').str.strip().str.lower().isin(NOT_OUT_DISMISSALS).fillna(False).to_numpy()
+    stats = pd.DataFrame({
+        'Player ID': rows['Batter id'].astype('int64').astype(str), 'Runs': runs, 'BF': rows['Ball faced'].astype('float64'),
+        'NO': not_out, '100': runs >= 100, '50': (runs >= 50) & (runs < 100), '0': (runs == 0) & ~not_out,
+        '4s': rows['Fours'].astype('float64'), '6s': rows['Sixes'].astype('float64'),
+    }).groupby('Player ID', sort=False).agg(
+        Innings=('Runs', 'size'), NO=('NO', 'sum'), Runs=('Runs', 'sum'), HS=('Runs', 'max'), BF=('BF', 'sum'),
+        **{'100': ('100', 'sum'), '50': ('50', 'sum'), '0': ('0', 'sum'), '4s': ('4s', 'sum'), '6s': ('6s', 'sum')},
+    )
+    dismissals = stats['Innings'] - stats['NO']
+    stats['Ave'] = (stats['Runs'] / dismissals.where(dismissals > 0)).round(2)
+    stats['SR'] = (stats['Runs'] * 100 / stats['BF'].where(stats['BF'] > 0)).round(2)
+    return _finish(_player_frame(_appearances(batting, bowling)), stats, BATTING_COUNT_COLUMNS, BATTING_INT_COLUMNS, CAREER_BATTING_CSV_COLUMNS)
+
+def derive_career_bowling(batting: pd.DataFrame, bowling: pd.DataFrame) -> pd.DataFrame:
+    """Career bowling table (CAREER_BOWLING_CSV_COLUMNS) for everyone who batted or bowled in the given rows."""
+    rows = bowling.dropna(subset=['Bowler id'])
+    wickets = rows['Wicket taken'].astype('float64')
+    spells = pd.DataFrame({
+        'Player ID': rows['Bowler id'].astype('int64').astype(str), 'Balls': overs_to_balls(rows['Over bowled']),
+        'Mdns': rows['Maiden Over'].astype('float64'), 'Runs': rows['Run given'].astype('float64'), 'Wkts': wickets,
+        '4w': wickets == 4, '5w': wickets >= 5,
+    })
+    stats = spells.groupby('Player ID', sort=False).agg(
+        Innings=('Balls', lambda balls: int((balls > 0).sum())), Balls=('Balls', 'sum'), Mdns=('Mdns', 'sum'), Runs=('Runs', 'sum'),
+        Wkts=('Wkts', 'sum'), **{'4w': ('4w', 'sum'), '5w': ('5w', 'sum')},
+    )
+    # Best figures: most wickets, then fewest runs
+    best = spells.dropna(subset=['Wkts', 'Runs']).sort_values(['Wkts', 'Runs'], ascending=[False, True], kind='stable').drop_duplicates('Player ID')
+    stats = stats.join(best.set_index('Player ID')[['Wkts', 'Runs']].rename(columns={'Wkts': 'BBI Wkts', 'Runs': 'BBI Runs'}))
+    stats['Overs'] = balls_to_overs(stats['Balls'])
+    stats['Ave'] = (stats['Runs'] / stats['Wkts'].where(stats['Wkts'] > 0)).round(2)
+    stats['Econ'] = (stats['Runs'] * 6 / stats['Balls'].where(stats['Balls'] > 0)).round(2)
+    stats['SR'] = (stats['Balls'] / stats['Wkts'].where(stats['Wkts'] > 0)).round(2)
+    return _finish(_player_frame(_appearances(batting, bowling)), stats, BOWLING_COUNT_COLUMNS + ['Overs'], BOWLING_INT_COLUMNS, CAREER_BOWLING_CSV_COLUMNS)
+
+def derive_careers(seasons: list | None = None, start=None, end=None, teams: list | None = None) -> tuple:
+    """(career batting, career bowling) from the scorecards of `seasons` (all on disk if None), see load_scorecard_rows for filters."""
+    batting, bowling = load_scorecard_rows(seasons, start, end, teams)
+    return derive_career_batting(batting, bowling), derive_career_bowling(batting, bowling)
+
+
+# --- Reconciliation ---
+def reconcile(derived: pd.DataFrame, scraped: pd.DataFrame, scraped_format: str | None = SCRAPED_FORMAT, tolerance: float = RECONCILE_TOLERANCE) -> pd.DataFrame:
+    """
+    One row per (player, stat): Derived, Scraped, Difference and Status
+    ('match', 'mismatch', 'missing derived', 'missing scraped'). Only players in either table are listed.
+    """
+    if scraped_format is not None and 'Format' in scraped.columns:
+        scraped = scraped[scraped['Format'].astype('string').str.strip() == scraped_format]
+    scraped = scraped.assign(**{'Player ID': scraped['Player ID'].astype('string').str.replace(r'\.0$', '', regex=True)}).drop_duplicates('Player ID')
+    stats = [col for col in derived.columns if col not in ('Player Name', 'Player ID', 'Format')]
+    joined = derived.merge(scraped.reindex(columns=['Player ID', 'Player Name'] + stats), on='Player ID', how='outer',
+                           suffixes=(' derived', ' scraped'), indicator=True)
+    names = joined['Player Name derived'].fillna(joined['Player Name scraped'])
+    reports = []
+    for stat in stats:
+        left, right = joined[f"{stat} derived"], joined[f"{stat} scraped"]
+        if stat == 'Span':
+            equal = left.astype('string').str.strip() == right.astype('string').str.strip()
+            difference = pd.Series(np.nan, index=joined.index)
+        else:
+            left, right = pd.to_numeric(left, errors='coerce'), pd.to_numeric(right, errors='coerce')
+            difference = left - right
+            equal = (difference.abs() <= tolerance) | (left.isna() & right.isna())
+        status = np.select([joined['_merge'] == 'right_only', joined['_merge'] == 'left_only', equal.fillna(False).astype(bool)],
+                           ['missing derived', 'missing scraped', 'match'], default='mismatch')
+        reports.append(pd.DataFrame({'Player ID': joined['Player ID'], 'Player Name': names, 'Stat': stat,
+                                     'Derived': left.astype('string'), 'Scraped': right.astype('string'), 'Difference': difference, 'Status': status}))
+    report = pd.concat(reports, ignore_index=True)
+    _log_reconciliation(report)
+    return report
+
+def _log_reconciliation(report: pd.DataFrame):
+    players = report.drop_duplicates('Player ID')['Status']
+    logging.info(f"Reconciliation: {int(players.isin(['match', 'mismatch']).sum())} players in both tables, "
+                 f"{int((players == 'missing scraped').sum())} only derived, {int((players == 'missing derived').sum())} only scraped.")
+    compared = report[report['Status'].isin(['match', 'mismatch'])]
+    for stat, statuses in compared.groupby('Stat', sort=False)['Status']:
+        mismatches = int((statuses == 'mismatch').sum())
+        if mismatches: logging.info(f"  {stat}: {mismatches} of {len(statuses)} players differ.")
+
+def load_scraped(table_name: str, stat_format: str = SCRAPED_STAT_FORMAT) -> pd.DataFrame | None:
+    """The scraped career CSV of a format (stat_formats.py) as strings, or None if it has not been scraped yet."""
+    path = stat_formats.csv_path(table_name, stat_format)
+    if not os.path.exists(path):
+        logging.warning(f"No scraped {table_name} for format '{stat_format}' at {path}; not reconciling. "
+                        f"Harvest it first: python player_harvest.py --formats {stat_format}")
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False, na_values=compact_loader.NULL_PLACEHOLDERS, encoding='utf-8-sig')
+
+def _stage_manifest(args: argparse.Namespace) -> StageManifest:
+    inputs = [path for table_name in ('match_summary', 'batting', 'bowling') for path in compact_loader.find_season_csvs(table_name, args.seasons).values()]
+    outputs = list(DERIVED_CSV_PATHS.values())
+    if not args.no_reconcile:
+        scraped_paths = {name: stat_formats.csv_path(name, args.stat_format) for name in DERIVED_CSV_PATHS}
+        inputs += list(scraped_paths.values())
+        outputs += [RECONCILIATION_CSV_PATHS[name] for name, path in scraped_paths.items() if os.path.exists(path)]
+    config = {k: v for k, v in vars(args).items() if k != 'force'}
+    return StageManifest("derive_career", outputs=outputs, inputs=inputs, code_files=[__file__, compact_loader.__file__, stat_formats.__file__], config=config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Derive career batting and bowling averages from the scorecards and reconcile them with the scraped ones.")
+    parser.add_argument('--seasons', nargs='+', default=None)
+    parser.add_argument('--start', default=None, help="First match date (YYYY-MM-DD)")
+    parser.add_argument('--end', default=None, help="Last match date (YYYY-MM-DD)")
+    parser.add_argument('--teams', nargs='+', default=None, help="Only innings played for these teams")
+    parser.add_argument('--stat-format', choices=list(stat_formats.STAT_FORMATS), default=SCRAPED_STAT_FORMAT, help="Scraped format to compare with (default: IPL only, like the scorecards)")
+    parser.add_argument('--scraped-format', default=None, help="'Format' of the scraped rows to compare with (default: the format's label)")
+    parser.add_argument('--no-reconcile', action='store_true')
+    parser.add_argument('--force', action='store_true', help="Run even if the inputs are unchanged since the last run")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    stage_manifest = _stage_manifest(args)
+    if SKIP_IF_UP_TO_DATE and not args.force and stage_manifest.is_up_to_date():
+        print(f"Scorecards and scraped careers unchanged, derived tables up to date ({stage_manifest.path})."); sys.exit(0)
+
+    start_time = time.perf_counter()
+    derived_tables = dict(zip(['career_batting', 'career_bowling'], derive_careers(args.seasons, args.start, args.end, args.teams)))
+    logging.info(f"Derived career tables for {len(derived_tables['career_batting'])} players in {time.perf_counter() - start_time:.2f} s.")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    for name, table in derived_tables.items():
+        table.to_csv(DERIVED_CSV_PATHS[name], index=False, encoding='utf-8-sig')
+        print(f"{name}: {len(table)} players -> {DERIVED_CSV_PATHS[name]}")
+        scraped = None if args.no_reconcile else load_scraped(name, args.stat_format)
+        if scraped is not None:
+            report = reconcile(table, scraped, args.scraped_format or stat_formats.STAT_FORMATS[args.stat_format]['label'])
+            report.to_csv(RECONCILIATION_CSV_PATHS[name], index=False, encoding='utf-8-sig')
+            print(f"{name} reconciliation: {int((report['Status'] == 'mismatch').sum())} mismatched stats -> {RECONCILIATION_CSV_PATHS[name]}")
+    stage_manifest.record()
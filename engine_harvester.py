@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Browserless harvester for stats.espncricinfo.com player engine pages.
+
+The engine pages (ci/engine/player/<id>.html) are server-rendered: the
+engineTable is in the HTML the server sends, so they need no browser. harvest()
+fetches them over plain HTTP from asyncio tasks and hands each page to the
+existing engine_table parsers:
+
+    connection pooling   one aiohttp session (keep-alive, TCPConnector limit = concurrency);
+                         without aiohttp, urllib requests on worker threads (new connection each)
+    bounded concurrency  at most `concurrency` requests in flight (asyncio.Semaphore)
+    rate limiting        one AsyncRateLimiter shared by all tasks (min gap + jitter between requests)
+    retries              429 / 5xx / timeouts retried with exponential backoff, honouring Retry-After
+
+Parsing runs on the default thread pool so the event loop keeps fetching.
+Results come back keyed by player ID in the order of the player list. With
+on_result the scripts stream them instead: it is called in that order as results
+arrive (so the output CSV matches a serial run), and they are not kept.
+
+    harvested = harvest(PLAYER_DATA, BASE_URL, parse_fn)   # parse_fn(page_soup, player) -> result
+    harvest(PLAYER_DATA, BASE_URL, parse_fn, on_result=lambda player, result: writer.extend(...))
+
+base_url replaces the scheme and host of every URL (e.g. a local stand-in server).
+HarvestSession holds the shared pieces, so a job that needs several pages per
+player (player_harvest.py) drives one session for all of them.
+
+    python engine_harvester.py selftest [--players 200] [--concurrency 8]
+        runs all three engine parsers against a local stand-in server (synthetic pages,
+        simulated latency, some transient 503s) and checks every player comes back parsed.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import threading
+import time
+import urllib.error
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+from bs4 import BeautifulSoup
+import engine_table
+from crawl_pool import DEFAULT_USER_AGENT, HTTP_TIMEOUT, AsyncRateLimiter, fetch_html
+
+try:
+    import aiohttp
+except ImportError: # Optional: falls back to urllib on worker threads
+    aiohttp = None
+
+# --- Configuration ---
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MIN_INTERVAL = 0.5 # Seconds between request starts across ALL tasks
+DEFAULT_JITTER = 0.25
+MAX_ATTEMPTS = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 2.0 # Seconds; doubles per attempt (plus jitter) unless the server sends Retry-After
+MAX_BACKOFF = 60.0
+
+
+class RetryableHttpError(Exception):
+    def __init__(self, status: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def _retry_after_seconds(value) -> float | None:
+    try: return max(0.0, float(value))
+    except (TypeError, ValueError): return None
+
+def rebase_url(url: str, base_url: str | None) -> str:
+    """Swaps the scheme and host of url for base_url's (path and query kept)."""
+    if not base_url:
+        return url
+    base = urlsplit(base_url); parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+
+# --- Fetching ---
+class EngineFetcher:
+    """One pooled HTTP client for a harvest (aiohttp session, or urllib on threads when aiohttp is missing)."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._session = None
+
+    async def __aenter__(self):
+        if aiohttp is not None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+                                                  headers={'User-Agent': DEFAULT_USER_AGENT, 'Accept': 'text/html', 'Accept-Language': 'en-US,en;q=0.9'})
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._session is not None:
+            await self._session.close()
+        return False
+
+    async def get(self, url: str) -> str:
+        """The page's HTML. Raises RetryableHttpError for 429/5xx, other exceptions for hard failures."""
+        if self._session is not None:
+            async with self._session.get(url) as response:
+                if response.status in RETRY_STATUSES:
+                    raise RetryableHttpError(response.status, _retry_after_seconds(response.headers.get('Retry-After')))
+                response.raise_for_status()
+                return await response.text(errors='replace')
+        try:
+            return await asyncio.to_thread(fetch_html, url)
+        except urllib.error.HTTPError as e:
+            if e.code in RETRY_STATUSES:
+                raise RetryableHttpError(e.code, _retry_after_seconds(e.headers.get('Retry-After') if e.headers else None)) from e
+            raise
+
+def _is_transient(error: Exception) -> bool:
+    """429/5xx, timeouts and dropped connections are worth retrying; 404s and the like are not."""
+    if isinstance(error, (RetryableHttpError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, urllib.error.URLError) and not isinstance(error, urllib.error.HTTPError):
+        return True
+    return aiohttp is not None and isinstance(error, aiohttp.ClientConnectionError)
+
+async def _fetch_page(fetcher: EngineFetcher, limiter: AsyncRateLimiter, url: str, label: str, stats: dict) -> str | None:
+    """Fetches one page with retries. Returns None (logged) once the attempts are used up or on a hard error."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.wait()
+        try:
+            return await fetcher.get(url)
+        except Exception as e:
+            if not _is_transient(e):
+                logging.error(f"{label}: {url} failed ({e}). Skipping.")
+                return None
+            if attempt == MAX_ATTEMPTS:
+                logging.error(f"{label}: {url} failed after {MAX_ATTEMPTS} attempts ({e}). Skipping.")
+                return None
+            retry_after = getattr(e, 'retry_after', None)
+            delay = retry_after if retry_after is not None else min(MAX_BACKOFF, BACKOFF_BASE * 2 ** (attempt - 1) + random.uniform(0, 1))
+            stats['retries'] += 1
+            logging.warning(f"{label}: {e} on attempt {attempt}/{MAX_ATTEMPTS}; retrying in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+    return None
+
+
+# --- Harvest ---
+class HarvestSession:
+    """
+    Everything the pages of one harvest share: the pooled fetcher, the rate limiter, the bound on requests
+    in flight, an optional page cache (html_archive.HtmlArchive) and the counters for the final log line.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, min_interval: float = DEFAULT_MIN_INTERVAL, jitter: float = DEFAULT_JITTER,
+                 base_url: str | None = None, cache=None, cache_max_age_days: float | None = None):
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.base_url = base_url
+        self.cache = cache
+        self.cache_max_age_seconds = cache_max_age_days * 86400 if cache_max_age_days is not None else None
+        self.limiter = AsyncRateLimiter(min_interval, jitter)
+        self.stats = {'fetched': 0, 'cached': 0, 'failed': 0, 'retries': 0}
+        self._fetcher = EngineFetcher(concurrency)
+        self._semaphore = None
+        self._start_time = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._start_time = time.monotonic()
+        await self._fetcher.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._fetcher.__aexit__(exc_type, exc, tb)
+        elapsed = time.monotonic() - self._start_time
+        logging.info(f"Harvest finished: {self.stats['fetched']} pages fetched, {self.stats['cached']} from cache, {self.stats['failed']} failed, "
+                     f"{self.stats['retries']} retries in {elapsed:.1f}s ({self.stats['fetched'] / elapsed if elapsed else 0:.1f} pages/s).")
+        return False
+
+    def _cached_page(self, url: str) -> str | None:
+        if self.cache is None or self.cache_max_age_seconds is None:
+            return None
+        fetched_at = self.cache.fetched_at(url)
+        if fetched_at is None or (datetime.now() - fetched_at).total_seconds() > self.cache_max_age_seconds:
+            return None
+        return self.cache.get(url)
+
+    async def fetch(self, url: str, label: str, page_kind: str = '') -> str | None:
+        """The page's HTML (fresh cache hit, or fetched with retries and stored in the cache); None on failure."""
+        html = self._cached_page(url)
+        if html is not None:
+            self.stats['cached'] += 1
+            return html
+        async with self._semaphore:
+            html = await _fetch_page(self._fetcher, self.limiter, rebase_url(url, self.base_url), label, self.stats)
+        if html is None:
+            self.stats['failed'] += 1
+            return None
+        self.stats['fetched'] += 1
+        if self.cache is not None: self.cache.store_page(url, html, page_kind) # Keyed by the real URL, whatever base_url served it
+        return html
+
+    async def parse(self, html: str, parse_fn, player: dict, label: str):
+        """parse_fn(page_soup, player) on the default thread pool. A parser error is logged and gives None."""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: parse_fn(BeautifulSoup(html, 'lxml'), player))
+        except Exception as e: # A parser bug must not lose the other players
+            logging.error(f"{label}: parsing failed: {e}", exc_info=True)
+            return None
+
+async def run_in_player_order(players: list, player_task, on_result=None) -> dict:
+    """
+    Runs player_task(player) for every player concurrently and returns {player_id: result} ordered like `players`.
+    With on_result(player, result) each result is handed over in player order as it arrives, whatever order the
+    tasks finish in, and is not kept (the dict returned is empty), so memory stays flat over a long harvest.
+    """
+    async def indexed(position: int, player: dict):
+        return position, await player_task(player)
+
+    results = {}; pending = {}; next_to_emit = 0
+    for future in asyncio.as_completed([indexed(i, p) for i, p in enumerate(players)]):
+        position, result = await future
+        pending[position] = result
+        while next_to_emit in pending:
+            player = players[next_to_emit]; result = pending.pop(next_to_emit)
+            if on_result: on_result(player, result)
+            else: results[player['id']] = result
+            next_to_emit += 1
+    return results
+
+async def harvest_async(players: list, url_template: str, parse_fn, on_result=None, page_kind: str = '', **session_options) -> dict:
+    """
+    Fetches url_template.format(player_id=...) for every {'id', 'name'} player and returns {player_id: parse_fn(page_soup, player)}
+    (None where the fetch failed), ordered like `players`, or passes each to on_result instead (see run_in_player_order).
+    session_options go to HarvestSession.
+    """
+    async with HarvestSession(**session_options) as session:
+        logging.info(f"Harvesting {len(players)} engine pages ({session.concurrency} concurrent, >= {session.min_interval}s between requests, "
+                     f"{'aiohttp' if aiohttp is not None else 'urllib threads'}{', base ' + session.base_url if session.base_url else ''}).")
+
+        async def player_task(player: dict):
+            label = f"{player['name']} (ID: {player['id']})"
+            html = await session.fetch(url_template.format(player_id=player['id']), label, page_kind)
+            return None if html is None else await session.parse(html, parse_fn, player, label)
+
+        return await run_in_player_order(players, player_task, on_result)
+
+def harvest(players: list, url_template: str, parse_fn, **kwargs) -> dict:
+    """Synchronous entry point for the scripts: runs harvest_async() on a fresh event loop."""
+    return asyncio.run(harvest_async(players, url_template, parse_fn, **kwargs))
+
+
+# --- Local Stand-in Server (selftest) ---
+ENGINE_URL_TEMPLATE = 'https://stats.espncricinfo.com/ci/engine/player/{player_id}.html?class=6;template=results;type={engine_type}'
+INNINGS_URL_TEMPLATE = ENGINE_URL_TEMPLATE.format(player_id='{player_id}', engine_type='batting') + ';view=innings'
+
+def _engine_page(tables_html: str) -> str:
+    # Three elements before the table so CAREER_TABLE_SELECTOR (table:nth-child(4)) matches, as on the live pages
+    return ("<html><body><div id='ciHomeContentlhs'><div class='pnl650M'><p>Player</p><p>Filters</p>"
+            f"<p><b>Summary</b></p>{tables_html}</div></div></body></html>")
+
+def _career_table(cells: list) -> str:
+    header = "".join(f"<th>{h}</th>" if i != 1 else f"<th title='sort by playing span'>{h}</th>" for i, h in enumerate(['Format', 'Span'] + [f'c{n}' for n in range(len(cells) - 2)]))
+    return f"<table class='engineTable'><thead><tr>{header}</tr></thead><tbody><tr>{''.join(f'<td>{c}</td>' for c in cells)}</tr></tbody></table>"
+
+def synthetic_engine_page(query: dict, player_id: str) -> str:
+    """A minimal engine page of the requested type with the structure engine_table expects."""
+    seed = int(player_id) % 97
+    if query.get('view') == 'innings':
+        rows = "".join(
+            f"<tr>{''.join(f'<td>{c}</td>' for c in [seed + n, 30, 20, 2, 1, '150.00', 3, 'caught', 1, ''])}"
+            f"<td><a>v Team {n}</a></td><td><a>Ground {n}</a></td><td><b>{1 + n % 28} Apr 20{10 + n % 15}</b></td><td><a>T20 # {n}</a></td></tr>"
+            for n in range(40))
+        return _engine_page(f"<p><b>Innings by innings list</b></p><table class='engineTable'><tbody>{rows}</tbody></table>")
+    if query.get('type') == 'bowling':
+        return _engine_page(_career_table(['T20s', '2008-2024', 100, 98, '350.0', 2, 2600, 90 + seed, '4/17', '28.9', '7.42', '23.3', 2, 0]))
+    return _engine_page(_career_table(['T20s', '2008-2024', 100, 95, 10, 2500 + seed, '113*', '29.4', 1900, '131.5', 1, 15, 4, 220, 80]))
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    flaky_every = 25 # Every n-th player's first request gets a 503
+    seen = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        player_id = parts.path.rsplit('/', 1)[-1].split('.')[0]
+        query = {k: v[0] for k, v in parse_qs(parts.query.replace(';', '&')).items()}
+        time.sleep(self.latency)
+        with self.lock:
+            first_request = (player_id, parts.query) not in self.seen
+            self.seen.add((player_id, parts.query))
+        if first_request and player_id.isdigit() and int(player_id) % self.flaky_every == 0:
+            self.send_response(503); self.send_header('Retry-After', '0'); self.end_headers()
+            return
+        body = synthetic_engine_page(query, player_id).encode('utf-8')
+        self.send_response(200); self.send_header('Content-Type', 'text/html; charset=utf-8'); self.send_header('Content-Length', str(len(body))); self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def run_selftest(n_players: int, concurrency: int) -> bool:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    players = [{'id': str(1000 + i), 'name': f"Player {i}"} for i in range(n_players)]
+    checks = {
+        'career batting': (ENGINE_URL_TEMPLATE.format(player_id='{player_id}', engine_type='batting'),
+                           lambda soup, p: engine_table.parse_career_summary(soup, engine_table.CAREER_BATTING_COLUMNS, p['id'], p['name']), 1),
+        'career bowling': (ENGINE_URL_TEMPLATE.format(player_id='{player_id}', engine_type='bowling'),
+                           lambda soup, p: engine_table.parse_career_summary(soup, engine_table.CAREER_BOWLING_COLUMNS, p['id'], p['name']), 1),
+        'innings': (INNINGS_URL_TEMPLATE,
+                    lambda soup, p: engine_table.parse_innings_list(soup, engine_table.INNINGS_BATTING_COLUMNS, p['id'], p['name']), 40),
+    }
+    logging.getLogger().setLevel(logging.WARNING) # Per-player parser logs would drown the summary
+    all_ok = True
+    try:
+        for label, (url_template, parse_fn, rows_per_player) in checks.items():
+            start_time = time.monotonic()
+            emitted = []; counted = []
+            def on_result(player, result):
+                emitted.append(player['id']); counted.append(len(result) if isinstance(result, list) else int(bool(result)))
+            harvest(players, url_template, parse_fn, on_result=on_result, concurrency=concurrency, min_interval=0.0, jitter=0.0, base_url=base_url)
+            elapsed = time.monotonic() - start_time
+            rows = sum(counted)
+            ok = rows == rows_per_player * n_players and emitted == [p['id'] for p in players]
+            all_ok &= ok
+            print(f"{label:15s} {n_players} players, {rows} rows in {elapsed:.2f}s "
+                  f"(serial at {_StandInHandler.latency * 1000:.0f} ms/page: ~{n_players * _StandInHandler.latency:.1f}s)  {'OK' if ok else 'FAILED'}")
+    finally:
+        server.shutdown()
+    return all_ok
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Browserless engine page harvester.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    selftest_parser = subparsers.add_parser('selftest', help="Harvest synthetic pages from a local stand-in server")
+    selftest_parser.add_argument('--players', type=int, default=200)
+    selftest_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+    if args.command == 'selftest':
+        sys.exit(0 if run_selftest(args.players, args.concurrency) else 1)
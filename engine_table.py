@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Shared extractor for stats.espncricinfo.com player engine pages.
+
+Every engine page we scrape (career batting, career bowling, innings by innings)
+renders its data in a `table.engineTable`. This module finds that table
+(caption lookup first, CSS selector fallback), walks its tbody rows exactly once
+and builds records from a declarative column spec, so the three player-stats
+scripts share one implementation.
+
+Column spec format (1-based cell indices, same convention as the scripts):
+    {'Runs': {'index': 1, 'clean': '*'},             # strip characters
+     'Opposition': {'index': 11, 'inner_tag': 'a'},  # read an inner tag's text
+     'HS': {'index': 7, 'convert': clean_highest_score},      # typed/cleaned value
+     'BBI': {'index': 9, 'expand': split_bbi}}       # callable returning several columns
+"""
+import logging
+import re
+from bs4 import BeautifulSoup, Tag
+import pandas as pd
+
+# --- Page Layout Constants ---
+ENGINE_CONTAINER_SELECTOR = '#ciHomeContentlhs > div.pnl650M'
+# Career summary table is the 4th child of the container for both batting and bowling
+CAREER_TABLE_SELECTOR = f'{ENGINE_CONTAINER_SELECTOR} > table:nth-child(4)'
+CAREER_SPAN_HEADER_INDEX = 2 # th:nth-child(2)
+EXPECTED_SPAN_TITLE_TEXT = "playing span"
+# Innings list is located via its caption, with this positional fallback
+INNINGS_CAPTION_TEXT = "Innings by innings list"
+INNINGS_FALLBACK_TABLE_SELECTOR = f'{ENGINE_CONTAINER_SELECTOR} > table:nth-child(5)'
+NON_STANDARD_ROW_MARKERS = ['dnb', 'absent', 'sub', 'retired hurt', 'tdnb']
+SUMMARY_ROW_CLASSES = ["dismissal", "inningsSummary", "note"]
+
+
+# --- Helper Functions ---
+def safe_get_text(element, default='N/A'):
+    """Safely extracts text from a BeautifulSoup Tag or returns default."""
+    if isinstance(element, Tag): text = element.get_text(strip=True); return text if text else default
+    elif isinstance(element, str): return element.strip()
+    return default if element is None else str(element)
+
+def clean_highest_score(score_str):
+    """Removes '*' and other non-digit characters, returns numeric part or N/A."""
+    if not score_str or score_str == 'N/A' or score_str == '-':
+        return 'N/A'
+    match = re.search(r'\d+', score_str)
+    return match.group(0) if match else 'N/A'
+
+def parse_bbi(bbi_string):
+    """
+    Parses a 'W/R' string (e.g., '3/15') into wickets and runs.
+    Returns (wickets, runs) as integers, or (pd.NA, pd.NA) on failure.
+    """
+    if pd.isna(bbi_string) or bbi_string in ('-', 'N/A'):
+        return pd.NA, pd.NA
+    if '/' not in bbi_string:
+        logging.warning(f"BBI parsing: Expected format 'W/R' not found in '{bbi_string}'.")
+        return pd.NA, pd.NA
+    parts = bbi_string.split('/')
+    if len(parts) != 2:
+        logging.warning(f"BBI parsing: Unexpected number of parts ({len(parts)}) after splitting '{bbi_string}' by '/'.")
+        return pd.NA, pd.NA
+    wkts_str = re.search(r'\d+', parts[0])
+    runs_str = re.search(r'\d+', parts[1])
+    if wkts_str and runs_str:
+        return int(wkts_str.group(0)), int(runs_str.group(0))
+    logging.warning(f"BBI parsing: Could not extract numeric parts from '{parts[0]}' or '{parts[1]}'.")
+    return pd.NA, pd.NA
+
+def split_bbi(bbi_string):
+    """Column-spec 'expand' hook: turns the BBI cell into 'BBI Wkts' and 'BBI Runs'."""
+    bbi_wkts, bbi_runs = parse_bbi(bbi_string)
+    return {'BBI Wkts': bbi_wkts, 'BBI Runs': bbi_runs}
+
+
+# --- Column Specs ---
+# Career batting summary (type=batting). Column 1 is the format label.
+CAREER_BATTING_COLUMNS = {
+    'Span': {'index': 2},       'Matches': {'index': 3},    'Innings': {'index': 4},    'NO': {'index': 5},
+    'Runs': {'index': 6},       'HS': {'index': 7, 'convert': clean_highest_score},     'Ave': {'index': 8},
+    'BF': {'index': 9},         'SR': {'index': 10},        '100': {'index': 11},       '50': {'index': 12},
+    '0': {'index': 13},         '4s': {'index': 14},        '6s': {'index': 15}
+}
+# Career bowling summary (type=bowling). BBI is split into two columns.
+CAREER_BOWLING_COLUMNS = {
+    'Span': {'index': 2},       'Matches': {'index': 3},    'Innings': {'index': 4},    'Overs': {'index': 5},
+    'Mdns': {'index': 6},       'Runs': {'index': 7},       'Wkts': {'index': 8},       'BBI': {'index': 9, 'expand': split_bbi},
+    'Ave': {'index': 10},       'Econ': {'index': 11},      'SR': {'index': 12},        '4w': {'index': 13},
+    '5w': {'index': 14}
+}
+# Innings by innings batting list (type=batting;view=innings). Column 10 is a spacer.
+INNINGS_BATTING_COLUMNS = {
+    'Runs': {'index': 1, 'clean': '*'}, 'Mins': {'index': 2}, 'BF': {'index': 3},
+    '4s': {'index': 4}, '6s': {'index': 5}, 'SR': {'index': 6}, 'Pos': {'index': 7},
+    'Dismissal': {'index': 8}, 'Inns': {'index': 9},
+    'Opposition': {'index': 11, 'inner_tag': 'a'}, 'Ground': {'index': 12, 'inner_tag': 'a'},
+    'Start Date': {'index': 13, 'inner_tag': 'b'}
+}
+
+# Career fielding summary (type=fielding). Column 1 is the format label.
+CAREER_FIELDING_COLUMNS = {
+    'Span': {'index': 2},       'Matches': {'index': 3},    'Innings': {'index': 4},    'Dis': {'index': 5},
+    'Ct': {'index': 6},         'St': {'index': 7},         'Ct Wk': {'index': 8},      'Ct Fi': {'index': 9},
+    'MD': {'index': 10},        'D/I': {'index': 11}
+}
+# Innings by innings bowling list (type=bowling;view=innings). Column 8 is a spacer.
+INNINGS_BOWLING_COLUMNS = {
+    'Overs': {'index': 1}, 'Mdns': {'index': 2}, 'Runs': {'index': 3}, 'Wkts': {'index': 4}, 'Econ': {'index': 5},
+    'Pos': {'index': 6}, 'Inns': {'index': 7},
+    'Opposition': {'index': 9, 'inner_tag': 'a'}, 'Ground': {'index': 10, 'inner_tag': 'a'},
+    'Start Date': {'index': 11, 'inner_tag': 'b'}
+}
+
+# --- Table Location ---
+def find_engine_table(page_soup: BeautifulSoup, caption_text: str | None = None, fallback_selector: str | None = None, label: str = '') -> Tag | None:
+    """
+    Locates an engineTable on a parsed engine page.
+    Tries the caption (<b> text followed by a sibling engineTable) first, then the CSS fallback selector.
+    """
+    data_table = None
+    if caption_text:
+        caption_element = page_soup.find("b", string=lambda text: text and caption_text in text.strip())
+        if caption_element and caption_element.parent:
+            data_table = caption_element.parent.find_next_sibling("table", class_="engineTable")
+            if data_table: logging.info(f"Found engine table via caption for {label}.")
+            else: logging.warning(f"Found caption but no valid sibling table for {label}. Trying fallback.")
+        else:
+            logging.warning(f"Could not find caption containing '{caption_text}' for {label}. Trying fallback.")
+    if data_table is None and fallback_selector:
+        data_table = page_soup.select_one(fallback_selector)
+        if data_table and caption_text: logging.info(f"Found engine table via CSS selector fallback for {label}.")
+    return data_table
+
+def iter_table_rows(data_table: Tag):
+    """Yields (row_number, row, cells) for each direct <tr> of the table body, in a single pass."""
+    table_body = data_table.find('tbody') if data_table else None
+    if not table_body:
+        return
+    row_number = 0
+    for row in table_body.children:
+        if not isinstance(row, Tag) or row.name != 'tr':
+            continue
+        row_number += 1
+        yield row_number, row, row.find_all('td', recursive=False)
+
+def max_spec_index(column_spec: dict) -> int:
+    """Highest 1-based cell index referenced by a column spec."""
+    return max(details['index'] for details in column_spec.values())
+
+def extract_record(cells: list, column_spec: dict, default='N/A') -> tuple[dict, list]:
+    """
+    Builds one record from a row's cells using the column spec.
+    Returns (record, missing_keys) where missing_keys lists columns whose index was out of range.
+    """
+    record = {}; missing_keys = []
+    for key_name, details in column_spec.items():
+        cell_index_0_based = details['index'] - 1
+        if cell_index_0_based >= len(cells):
+            missing_keys.append(key_name)
+            record[key_name] = default
+            continue
+        target_element = cells[cell_index_0_based]
+        if 'inner_tag' in details:
+            inner_element = target_element.find(details['inner_tag'])
+            if inner_element: target_element = inner_element
+        value = safe_get_text(target_element, default)
+        if 'clean' in details and isinstance(value, str): value = value.replace(details['clean'], '')
+        if 'convert' in details: value = details['convert'](value)
+        if 'expand' in details: record.update(details['expand'](value))
+        else: record[key_name] = value
+    return record, missing_keys
+
+
+# --- Page Parsers ---
+def parse_career_summary(page_soup: BeautifulSoup, column_spec: dict, player_id: str, player_name: str, table_selector: str = CAREER_TABLE_SELECTOR) -> dict | None:
+    """
+    Parses the career summary row of a type=batting / type=bowling engine page.
+    1. Checks the Span header (th:nth-child(2)) exists and its title contains 'playing span'.
+    2. Checks the Span data cell of the first body row is non-empty.
+    Returns the record dict, or None when the player should be skipped.
+    """
+    data_table = find_engine_table(page_soup, fallback_selector=table_selector, label=player_name)
+    if not data_table:
+        logging.warning(f"Skipping {player_name} (ID: {player_id}): Could not find the career table using selector: {table_selector}")
+        return None
+
+    # --- Step 1: Check the Span Header Cell ---
+    span_header_cell = data_table.select_one(f"thead > tr > th:nth-child({CAREER_SPAN_HEADER_INDEX})")
+    if not span_header_cell:
+        logging.warning(f"Skipping {player_name} (ID: {player_id}): Could not find the expected Span header cell (th:nth-child({CAREER_SPAN_HEADER_INDEX})).")
+        return None
+    title_attr = span_header_cell.get('title')
+    if not title_attr or EXPECTED_SPAN_TITLE_TEXT not in title_attr.lower():
+        logging.warning(f"Skipping {player_name} (ID: {player_id}): Span header cell found, but its title attribute ('{title_attr}') does not contain '{EXPECTED_SPAN_TITLE_TEXT}'.")
+        return None
+
+    # --- Only the first body row is needed: stop after it ---
+    first_row = next(iter_table_rows(data_table), None)
+    if first_row is None:
+        logging.warning(f"No data rows found in tbody for career table for {player_name}. Skipping.")
+        return None
+    _, _, cols = first_row
+    max_index = max_spec_index(column_spec)
+    if not cols or len(cols) < max_index:
+        logging.warning(f"Career summary row for {player_name} has insufficient columns ({len(cols)} found, need at least {max_index}). Skipping.")
+        return None
+
+    # --- Step 2: Check the Span Data Cell ---
+    span_text = safe_get_text(cols[column_spec['Span']['index'] - 1], default='')
+    if not span_text:
+        logging.warning(f"Skipping player {player_name} (ID: {player_id}): Header check passed, but Span data cell is missing or empty.")
+        return None
+
+    record = {'Player Name': player_name, 'Player ID': player_id, 'Format': safe_get_text(cols[0])}
+    spec_record, _ = extract_record(cols, column_spec)
+    record.update(spec_record)
+    return record
+
+def parse_innings_list(page_soup: BeautifulSoup, column_spec: dict, player_id: str, player_name: str, caption_text: str = INNINGS_CAPTION_TEXT, fallback_selector: str = INNINGS_FALLBACK_TABLE_SELECTOR) -> list:
+    """
+    Parses an innings-by-innings engine page (view=innings) into a list of row dicts.
+    Rows with too few cells are skipped unless they are DNB/absent style rows.
+    """
+    player_innings_list = []
+    data_table = find_engine_table(page_soup, caption_text=caption_text, fallback_selector=fallback_selector, label=player_name)
+    if not data_table:
+        logging.error(f"Could not find table using EITHER method for {player_name}. Skipping.")
+        return player_innings_list
+    if not data_table.find('tbody'):
+        logging.warning(f"Could not find table body (tbody) for {player_name}.")
+        return player_innings_list
+
+    max_index = max_spec_index(column_spec)
+    processed_count = 0; skipped_rows = 0
+    for i, row, cols in iter_table_rows(data_table):
+        # Skip header rows if they exist within tbody (sometimes they do)
+        if row.find('th'):
+            skipped_rows += 1
+            continue
+
+        first_cell_text = safe_get_text(cols[0]).lower() if cols else ""
+        is_non_standard_row = any(marker in first_cell_text for marker in NON_STANDARD_ROW_MARKERS)
+
+        if len(cols) <= max_index and not is_non_standard_row:
+            row_classes = row.get("class", [])
+            if not any(cls in row_classes for cls in SUMMARY_ROW_CLASSES):
+                logging.warning(f"Skipping row {i} for {player_name} (only {len(cols)} cells, needed >{max_index}, not standard non-batting row). Content: {[safe_get_text(c) for c in cols]}")
+            skipped_rows += 1
+            continue
+
+        row_data, missing_keys = extract_record(cols, column_spec)
+        # Non-standard rows (DNB etc.) are expected to have missing trailing cells
+        extraction_successful = not missing_keys or is_non_standard_row
+        if not extraction_successful:
+            logging.error(f"Cell indices out of bounds (found {len(cols)}) for row {i} for {player_name}. Assigned N/A to {missing_keys}.")
+
+        row_data['Player Name'] = player_name; row_data['Player ID'] = player_id
+        if extraction_successful:
+            player_innings_list.append(row_data); processed_count += 1
+        else:
+            skipped_rows += 1
+            logging.warning(f"Row {i} for {player_name} skipped due to data extraction issues.")
+
+    logging.info(f"Processed {processed_count} innings, skipped {skipped_rows} rows for {player_name}.")
+    return player_innings_list
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded error capture for row-level parse failures.
+
+Row parsers used to log `row.prettify()` with a full traceback for every failing
+row; after a layout change that meant every row of every match, and the
+formatting and log I/O dominated the run. A ParseErrorSink instead reduces each
+failure to a fingerprint (where it failed, the exception type and a compact
+structural signature of the row), logs and keeps one sample per fingerprint and
+only counts repeats. A run of consecutive failures with no successful row in
+between raises LayoutBrokenError so a broken layout stops the crawl early.
+"""
+import json
+import logging
+import os
+import traceback
+from bs4 import Tag
+
+# --- Configuration ---
+DEFAULT_FAIL_FAST_AFTER = 40 # Consecutive failing rows (no success in between) that abort the run
+SAMPLE_HTML_CHARS = 600 # Raw HTML kept per distinct failure, unformatted
+SIGNATURE_MAX_CELLS = 16
+
+
+class LayoutBrokenError(RuntimeError):
+    """Raised when so many rows fail in a row that the page layout has almost certainly changed."""
+
+
+def row_signature(row) -> str:
+    """
+    Compact structural description of a table row, e.g. 'tr.ds-bg-x|td×8|a t t t t t t t'.
+    Per cell: 'a' has a link, 't' has text, 'e' is empty. No prettify, no full text.
+    """
+    if not isinstance(row, Tag):
+        return type(row).__name__
+    classes = '.'.join(row.get('class', [])[:3])
+    cells = row.find_all(['td', 'th'], recursive=False)
+    cell_codes = []
+    for cell in cells[:SIGNATURE_MAX_CELLS]:
+        if cell.find('a', href=True): cell_codes.append('a')
+        elif cell.get_text(strip=True): cell_codes.append('t')
+        else: cell_codes.append('e')
+    if len(cells) > SIGNATURE_MAX_CELLS: cell_codes.append('…')
+    return f"{row.name}{'.' + classes if classes else ''}|td×{len(cells)}|{' '.join(cell_codes)}"
+
+
+class ParseErrorSink:
+    """Collects row parse failures for one run: one sample per fingerprint, counts for the rest."""
+
+    def __init__(self, run_name: str, fail_fast_after: int = DEFAULT_FAIL_FAST_AFTER):
+        self.run_name = run_name
+        self.fail_fast_after = fail_fast_after
+        self.samples = {} # fingerprint -> first sample + count
+        self.error_count = 0
+        self.success_count = 0
+        self.consecutive_failures = 0
+
+    def record_success(self):
+        """Call after every successfully parsed row; resets the fail-fast counter."""
+        self.success_count += 1
+        self.consecutive_failures = 0
+
+    def record(self, context: str, row, exc: BaseException, location: str = ''):
+        """
+        Records one failed row. `context` names the parser ('batting', 'season_summary', ...),
+        `location` says where it happened (e.g. 'Match 1234 Inn 1 row 5') and is only kept for the first sample.
+        Raises LayoutBrokenError once fail_fast_after rows have failed consecutively.
+        """
+        self.error_count += 1
+        self.consecutive_failures += 1
+        signature = row_signature(row)
+        last_frame = traceback.extract_tb(exc.__traceback__)[-1] if exc.__traceback__ else None
+        raised_at = f"{last_frame.name}:{last_frame.lineno}" if last_frame else '?'
+        fingerprint = f"{context}|{type(exc).__name__}|{raised_at}|{signature}"
+        entry = self.samples.get(fingerprint)
+        if entry:
+            entry['count'] += 1
+        else:
+            self.samples[fingerprint] = {
+                'context': context, 'exception': f"{type(exc).__name__}: {exc}", 'raised_at': raised_at,
+                'row_signature': signature, 'first_location': location, 'count': 1,
+                'sample_html': str(row)[:SAMPLE_HTML_CHARS] if row is not None else None,
+            }
+            # Full traceback only for the first occurrence of each distinct failure
+            logging.error(f"[{self.run_name}] New {context} parse failure at {location}: {type(exc).__name__}: {exc} | row {signature}", exc_info=exc)
+        if self.fail_fast_after and self.consecutive_failures >= self.fail_fast_after:
+            raise LayoutBrokenError(f"{self.consecutive_failures} consecutive {context} rows failed to parse (last at {location}); the page layout has probably changed.")
+
+    def log_summary(self):
+        """Writes the end-of-run error summary to the log."""
+        if not self.error_count:
+            logging.info(f"[{self.run_name}] Parse error summary: no row failures ({self.success_count} rows parsed).")
+            return
+        logging.warning(f"[{self.run_name}] Parse error summary: {self.error_count} failed rows in {len(self.samples)} distinct failure(s), {self.success_count} rows parsed.")
+        for entry in sorted(self.samples.values(), key=lambda e: -e['count']):
+            logging.warning(f"  {entry['count']:>6} x {entry['context']} {entry['exception']} at {entry['raised_at']} | row {entry['row_signature']} | first: {entry['first_location']}")
+
+    def write_report(self, path: str):
+        """Saves the per-fingerprint samples as JSON next to the run's logs (only when something failed)."""
+        if not self.samples:
+            return
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'run': self.run_name, 'errors': self.error_count, 'parsed_rows': self.success_count,
+                       'failures': sorted(self.samples.values(), key=lambda e: -e['count'])}, f, indent=2, ensure_ascii=False)
+        logging.info(f"[{self.run_name}] Parse error samples written to {path}")
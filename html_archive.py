@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Compressed archive of raw ESPNcricinfo pages, for reprocessing without refetching.
+
+Every page repeats the same navigation, scripts and layout markup, so pages are
+stored in three steps:
+
+    1. strip    script/style/noscript/svg bodies, comments and inline style attributes
+                are dropped. The tags themselves stay, so sibling positions (nth-child
+                selectors) and everything the parsers read are unchanged.
+    2. dedupe   the stripped page is hashed (sha256); URLs with identical content share one blob.
+    3. compress with a dictionary trained on the site's boilerplate: zstd when the
+                `zstandard` package is installed, otherwise zlib with a preset dictionary
+                of the lines most pages share.
+
+Everything lives in one SQLite file (HTML_Archive/pages.sqlite), indexed by URL,
+so reading a page back is one primary-key lookup plus one decompression.
+
+    archive = HtmlArchive()
+    archive.store_page(url, driver.page_source, 'scorecard')   # never raises
+    html = archive.get(url)
+
+`python html_archive.py stats|train|recompress` reports sizes, trains a new dictionary,
+or re-encodes older blobs with the newest one.
+"""
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+try:
+    import zstandard as zstd
+except ImportError: # Optional: zlib with a preset dictionary is the fallback
+    zstd = None
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE_PATH = os.path.join(REPO_ROOT, "HTML_Archive", "pages.sqlite")
+DEFAULT_CODEC = 'zstd' if zstd else 'zlib'
+ZSTD_LEVEL = 19
+ZLIB_LEVEL = 9
+ZSTD_DICT_SIZE = 112 * 1024
+ZLIB_DICT_MAX_BYTES = 32 * 1024 # zlib uses at most a 32 KB window of preset dictionary
+TRAIN_AFTER_PAGES = 40 # First dictionary is trained once this many distinct pages are stored
+TRAIN_SAMPLE_PAGES = 400 # Most recent pages used as training samples
+KEEP_SCRIPT_IDS = () # Script ids whose body is kept, e.g. ('__NEXT_DATA__',) to keep the embedded JSON
+
+# --- Stripping ---
+_EMPTIED_TAGS_RE = re.compile(r'<(script|style|noscript|svg)\b([^>]*)>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+_STYLE_ATTR_RE = re.compile(r'\sstyle="[^"]*"', re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r'[ \t]*\n\s*')
+
+
+def _empty_tag(match: re.Match) -> str:
+    tag, attrs = match.group(1), match.group(2)
+    if tag.lower() == 'script' and any(f'id="{script_id}"' in attrs for script_id in KEEP_SCRIPT_IDS):
+        return match.group(0)
+    return f"<{tag}{attrs}></{tag}>"
+
+def strip_page(html: str) -> str:
+    """Removes markup no parser reads while keeping the element tree the selectors rely on."""
+    html = _COMMENT_RE.sub('', html)
+    html = _EMPTIED_TAGS_RE.sub(_empty_tag, html)
+    html = _STYLE_ATTR_RE.sub('', html)
+    return _BLANK_LINES_RE.sub('\n', html)
+
+def content_hash(stripped_html: str) -> str:
+    return hashlib.sha256(stripped_html.encode('utf-8')).hexdigest()
+
+
+# --- Dictionaries ---
+def _build_zlib_dictionary(samples: list) -> bytes:
+    """Lines shared by at least half the samples, most common last (zlib favours the end of the dictionary)."""
+    line_counts = Counter()
+    for sample in samples:
+        line_counts.update(set(sample.split(b'\n')))
+    shared = [line for line, count in line_counts.items() if count >= max(2, len(samples) // 2) and len(line) > 8]
+    shared.sort(key=lambda line: (line_counts[line], len(line)))
+    return b'\n'.join(shared)[-ZLIB_DICT_MAX_BYTES:]
+
+def _build_dictionary(codec: str, samples: list) -> bytes:
+    if codec == 'zstd':
+        return zstd.train_dictionary(ZSTD_DICT_SIZE, samples).as_bytes()
+    return _build_zlib_dictionary(samples)
+
+def _compress(codec: str, data: bytes, dictionary: bytes | None) -> bytes:
+    if codec == 'zstd':
+        dict_data = zstd.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstd.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dict_data).compress(data)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary) if dictionary else zlib.compressobj(ZLIB_LEVEL)
+    return compressor.compress(data) + compressor.flush()
+
+
+class HtmlArchive:
+    """URL-indexed, deduplicated, dictionary-compressed page store in one SQLite file."""
+
+    def __init__(self, path: str = ARCHIVE_PATH, codec: str = DEFAULT_CODEC):
+        if codec == 'zstd' and zstd is None:
+            raise ImportError("The zstandard package is required for codec 'zstd'.")
+        self.path = path
+        self.codec = codec
+        self._conn = None
+        self._dictionaries = {} # dict_id -> (codec, bytes)
+        self._decompressors = {} # dict_id -> zstd decompressor (reused; zlib needs a fresh object per page)
+
+    # --- Connection / Schema ---
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL") # Season scripts running in parallel can share the archive
+            with self._conn:
+                self._conn.execute("CREATE TABLE IF NOT EXISTS dictionaries (dict_id INTEGER PRIMARY KEY AUTOINCREMENT, codec TEXT NOT NULL, created_at TEXT, data BLOB NOT NULL)")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (blob_hash TEXT PRIMARY KEY, codec TEXT NOT NULL, dict_id INTEGER, raw_size INTEGER, stored_size INTEGER, data BLOB NOT NULL)")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, blob_hash TEXT NOT NULL, page_kind TEXT, fetched_at TEXT)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_kind ON pages (page_kind)")
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close(); self._conn = None
+
+    def _dictionary(self, dict_id: int | None) -> bytes | None:
+        if dict_id is None:
+            return None
+        if dict_id not in self._dictionaries:
+            row = self.conn.execute("SELECT codec, data FROM dictionaries WHERE dict_id = ?", (dict_id,)).fetchone()
+            self._dictionaries[dict_id] = (row[0], bytes(row[1]))
+        return self._dictionaries[dict_id][1]
+
+    def _latest_dictionary_id(self) -> int | None:
+        row = self.conn.execute("SELECT MAX(dict_id) FROM dictionaries WHERE codec = ?", (self.codec,)).fetchone()
+        return row[0] if row else None
+
+    # --- Writing ---
+    def put(self, url: str, html: str, page_kind: str = '') -> str:
+        """Stores a page (stripped, deduplicated, compressed). Returns its content hash."""
+        stripped = strip_page(html)
+        blob_hash = content_hash(stripped)
+        with self.conn:
+            exists = self.conn.execute("SELECT 1 FROM blobs WHERE blob_hash = ?", (blob_hash,)).fetchone()
+            if not exists:
+                raw = stripped.encode('utf-8')
+                dict_id = self._latest_dictionary_id()
+                data = _compress(self.codec, raw, self._dictionary(dict_id))
+                self.conn.execute("INSERT INTO blobs (blob_hash, codec, dict_id, raw_size, stored_size, data) VALUES (?, ?, ?, ?, ?, ?)",
+                                  (blob_hash, self.codec, dict_id, len(raw), len(data), data))
+            self.conn.execute("INSERT INTO pages (url, blob_hash, page_kind, fetched_at) VALUES (?, ?, ?, ?) "
+                              "ON CONFLICT (url) DO UPDATE SET blob_hash = excluded.blob_hash, page_kind = excluded.page_kind, fetched_at = excluded.fetched_at",
+                              (url, blob_hash, page_kind, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        if not exists and self._latest_dictionary_id() is None:
+            blob_count = self.conn.execute("SELECT COUNT(*) FROM blobs WHERE codec = ?", (self.codec,)).fetchone()[0]
+            if blob_count >= TRAIN_AFTER_PAGES:
+                self.train_dictionary()
+        return blob_hash
+
+    def store_page(self, url: str, html: str, page_kind: str = '') -> str | None:
+        """put() for the scrapers: an archive problem is logged, never raised."""
+        try:
+            return self.put(url, html, page_kind)
+        except Exception as e:
+            logging.error(f"Could not archive page {url}: {e}", exc_info=True)
+            return None
+
+    # --- Reading ---
+    def _decode(self, codec: str, dict_id: int | None, data: bytes) -> str:
+        if codec == 'zstd':
+            if zstd is None:
+                raise ImportError("The zstandard package is required to read zstd-compressed pages.")
+            decompressor = self._decompressors.get(dict_id)
+            if decompressor is None:
+                dictionary = self._dictionary(dict_id)
+                decompressor = zstd.ZstdDecompressor(dict_data=zstd.ZstdCompressionDict(dictionary) if dictionary else None)
+                self._decompressors[dict_id] = decompressor
+            raw = decompressor.decompress(data)
+        else:
+            dictionary = self._dictionary(dict_id)
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            raw = decompressor.decompress(data) + decompressor.flush()
+        return raw.decode('utf-8')
+
+    def get(self, url: str) -> str | None:
+        """The stored (stripped) HTML for a URL, or None."""
+        row = self.conn.execute("SELECT b.codec, b.dict_id, b.data FROM pages p JOIN blobs b ON b.blob_hash = p.blob_hash WHERE p.url = ?", (url,)).fetchone()
+        return self._decode(row[0], row[1], bytes(row[2])) if row else None
+
+    def fetched_at(self, url: str) -> datetime | None:
+        """When the URL was last stored, or None (lets a harvester use the archive as a page cache)."""
+        row = self.conn.execute("SELECT fetched_at FROM pages WHERE url = ?", (url,)).fetchone()
+        return datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S') if row and row[0] else None
+
+    def __contains__(self, url: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    def content_hashes(self, urls: list) -> dict:
+        """{url: content hash} for the archived ones among `urls` (pipeline_manifest inputs)."""
+        hashes = {}
+        for url in urls:
+            row = self.conn.execute("SELECT blob_hash FROM pages WHERE url = ?", (url,)).fetchone()
+            if row: hashes[url] = row[0]
+        return hashes
+
+    def urls(self, page_kind: str | None = None) -> list:
+        if page_kind is None:
+            return [r[0] for r in self.conn.execute("SELECT url FROM pages ORDER BY url")]
+        return [r[0] for r in self.conn.execute("SELECT url FROM pages WHERE page_kind = ? ORDER BY url", (page_kind,))]
+
+    # --- Maintenance ---
+    def train_dictionary(self) -> int | None:
+        """Trains a dictionary on the most recent stored pages of this codec. Returns its id."""
+        rows = self.conn.execute("SELECT codec, dict_id, data FROM blobs WHERE codec = ? ORDER BY rowid DESC LIMIT ?", (self.codec, TRAIN_SAMPLE_PAGES)).fetchall()
+        if len(rows) < 2:
+            logging.warning("HTML archive: not enough pages to train a dictionary yet.")
+            return None
+        samples = [self._decode(codec, dict_id, bytes(data)).encode('utf-8') for codec, dict_id, data in rows]
+        dictionary = _build_dictionary(self.codec, samples)
+        with self.conn:
+            cursor = self.conn.execute("INSERT INTO dictionaries (codec, created_at, data) VALUES (?, ?, ?)",
+                                       (self.codec, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), dictionary))
+        logging.info(f"HTML archive: trained {self.codec} dictionary {cursor.lastrowid} ({len(dictionary)} bytes) on {len(samples)} pages.")
+        return cursor.lastrowid
+
+    def recompress(self) -> int:
+        """Re-encodes every blob not using the newest dictionary (e.g. pages stored before the first one was trained)."""
+        dict_id = self._latest_dictionary_id()
+        if dict_id is None:
+            return 0
+        dictionary = self._dictionary(dict_id)
+        stale = self.conn.execute("SELECT blob_hash, codec, dict_id, data FROM blobs WHERE codec != ? OR dict_id IS NULL OR dict_id != ?", (self.codec, dict_id)).fetchall()
+        with self.conn:
+            for blob_hash, codec, old_dict_id, data in stale:
+                raw = self._decode(codec, old_dict_id, bytes(data)).encode('utf-8')
+                new_data = _compress(self.codec, raw, dictionary)
+                self.conn.execute("UPDATE blobs SET codec = ?, dict_id = ?, stored_size = ?, data = ? WHERE blob_hash = ?",
+                                  (self.codec, dict_id, len(new_data), new_data, blob_hash))
+        self.conn.execute("VACUUM")
+        logging.info(f"HTML archive: re-encoded {len(stale)} blobs with dictionary {dict_id}.")
+        return len(stale)
+
+    def stats(self) -> dict:
+        pages, blobs = self.conn.execute("SELECT (SELECT COUNT(*) FROM pages), (SELECT COUNT(*) FROM blobs)").fetchone()
+        raw_size, stored_size = self.conn.execute("SELECT COALESCE(SUM(raw_size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+        return {'pages': pages, 'distinct_blobs': blobs, 'stripped_bytes': raw_size, 'stored_bytes': stored_size,
+                'compression_ratio': round(raw_size / stored_size, 2) if stored_size else 0.0,
+                'file_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    archive = HtmlArchive()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    if command == 'train':
+        archive.train_dictionary()
+    elif command == 'recompress':
+        archive.recompress()
+    elif command == 'bench':
+        all_urls = archive.urls(); start = time.perf_counter()
+        for page_url in all_urls: archive.get(page_url)
+        elapsed = time.perf_counter() - start
+        print(f"Read {len(all_urls)} pages in {elapsed:.2f}s ({len(all_urls) / elapsed if elapsed else 0:.0f} pages/s)")
+    print(archive.stats())
+    archive.close()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Links innings-by-innings engine rows to scorecard Match IDs.
+
+Rows from scrape_player_innings_by_index (and the bowling innings list) carry only
+'Opposition' ('v Mumbai Indians'), 'Ground' and 'Start Date' strings. MatchLinker
+normalizes those and looks each innings up in hash indexes built once over the match
+index (match_index.py, i.e. the season summaries):
+
+    (date, team)     every match's date with each of its two teams  -> Match ID
+    (date, ground)   date with the ground                           -> Match ID
+    date             dates with exactly one match                   -> Match ID
+
+tried in that order, the first two also one day either side (the engine and the
+scorecards occasionally disagree on the date of a late-night match). A key that
+points at two matches is dropped from its index, so a hit is never a guess. The
+date-only pass is used only when the row names no opposition or one of that
+match's teams: the default innings pages cover every T20, so a T20I or another
+league's innings on an IPL match day must stay unresolved, not take that match.
+
+Team and ground names are reduced to a key that survives the engine's abbreviations
+and renames: lower case, punctuation and a leading 'v' dropped, acronyms expanded
+(TEAM_ABBREVIATIONS), then the first word, mapped through FIRST_WORD_ALIASES where it
+is not the city ('Mumbai Indians' -> 'mumbai', 'Kings XI Punjab' -> 'punjab'). Teams
+sharing a key (Deccan Chargers / Sunrisers, Gujarat Lions / Titans) never played in
+the same season, so together with the date the key is unique.
+
+    from innings_linker import link_innings
+    linked, unresolved = link_innings(innings_df)          # adds 'Match ID', 'Link Method'
+    linked = enrich_with_match_context(linked)             # adds match index columns
+
+`python innings_linker.py` links the innings CSVs on disk and writes the linked
+tables and an unresolved-rows report next to them, skipping a table whose innings CSV,
+match index sources and linker code are unchanged since its last run; `python innings_linker.py
+--self-check` runs the linking rules against a two-match index and exits non-zero
+if one of them is broken.
+"""
+import logging
+import os
+import re
+import sys
+import pandas as pd
+import compact_loader
+import match_index
+from match_index import MatchIndex, load_match_index
+from pipeline_manifest import StageManifest
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+INNINGS_TABLES = ['innings_batting', 'innings_bowling']
+LINK_KEY_COLUMNS = ['Opposition', 'Ground', 'Start Date']
+DATE_TOLERANCE_DAYS = 1
+TEAM_ABBREVIATIONS = {
+    'csk': 'chennai', 'mi': 'mumbai', 'kkr': 'kolkata', 'rcb': 'bangalore', 'rr': 'rajasthan', 'srh': 'hyderabad',
+    'dc': 'delhi', 'dd': 'delhi', 'pbks': 'punjab', 'kxip': 'punjab', 'gt': 'gujarat', 'gl': 'gujarat', 'lsg': 'lucknow',
+    'rps': 'pune', 'pwi': 'pune', 'ktk': 'kochi',
+}
+# First words that are not the franchise's city
+FIRST_WORD_ALIASES = {'royal': 'bangalore', 'bengaluru': 'bangalore', 'kings': 'punjab', 'sunrisers': 'hyderabad', 'deccan': 'hyderabad', 'rising': 'pune'}
+UNRESOLVED_SUFFIX = "_unresolved.csv"
+LINKED_SUFFIX = "_linked.csv"
+SKIP_IF_UP_TO_DATE = True # A table whose inputs, outputs and code are unchanged is not linked again (pipeline_manifest.py)
+
+
+# --- Normalization ---
+def _clean_name(value) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    text = re.sub(r'[^a-z0-9 ]+', ' ', str(value).lower())
+    text = re.sub(r'^\s*v\s+', '', text) # 'v Mumbai Indians'
+    return ' '.join(text.split())
+
+def team_key(value) -> str:
+    name = _clean_name(value)
+    if not name:
+        return ''
+    if name in TEAM_ABBREVIATIONS:
+        return TEAM_ABBREVIATIONS[name]
+    first_word = name.split()[0]
+    return FIRST_WORD_ALIASES.get(first_word, first_word)
+
+def ground_key(value) -> str:
+    """First word of the ground ('Wankhede Stadium, Mumbai' -> 'wankhede'), so 'Wankhede' matches too."""
+    name = _clean_name(str(value).split(',')[0]) if isinstance(value, str) else ''
+    return name.split()[0] if name else ''
+
+def _date_strings(dates: pd.Series, offset_days: int = 0) -> pd.Series:
+    return (pd.to_datetime(dates, errors='coerce') + pd.Timedelta(days=offset_days)).dt.strftime('%Y-%m-%d')
+
+
+# --- Index ---
+class MatchLinker:
+    """Hash indexes from (date, team), (date, ground) and unique dates to Match ID, built once from a MatchIndex."""
+
+    def __init__(self, index: MatchIndex):
+        self.index = index
+        self.by_date_team, self.by_date_ground, self.by_date = {}, {}, {}
+        self.match_teams = {} # Match ID -> team keys, to check a date-only hit against the row's opposition
+        ambiguous = set()
+        for record in index.records:
+            if record['Match Date'] is None:
+                continue
+            self.match_teams[record['Match ID']] = {team_key(team) for team in (record['Team 1'], record['Team 2'])} - {''}
+            day = record['Match Date'].isoformat()
+            keys = [(self.by_date, day)]
+            keys += [(self.by_date_team, f"{day}|{team_key(team)}") for team in (record['Team 1'], record['Team 2']) if team_key(team)]
+            if ground_key(record['Ground Name']): keys.append((self.by_date_ground, f"{day}|{ground_key(record['Ground Name'])}"))
+            for table, key in keys:
+                if table.get(key, record['Match ID']) != record['Match ID']: ambiguous.add((id(table), key))
+                table[key] = record['Match ID']
+        for table in (self.by_date, self.by_date_team, self.by_date_ground):
+            for key in [k for k in table if (id(table), k) in ambiguous]:
+                del table[key]
+        logging.info(f"Match linker: {len(self.by_date_team)} (date, team), {len(self.by_date_ground)} (date, ground) and {len(self.by_date)} unique-date keys over {len(index)} matches.")
+
+    def link(self, innings: pd.DataFrame) -> tuple:
+        """(Match ID, Link Method) for every innings row, vectorized: each pass maps the still-unresolved rows through one index."""
+        teams = innings['Opposition'].map(team_key) if 'Opposition' in innings.columns else pd.Series('', index=innings.index)
+        grounds = innings['Ground'].map(ground_key) if 'Ground' in innings.columns else pd.Series('', index=innings.index)
+        match_ids = pd.Series(pd.NA, index=innings.index, dtype='Int64')
+        methods = pd.Series(pd.NA, index=innings.index, dtype='string')
+        passes = [(offset, 'team', self.by_date_team, teams) for offset in (0, *self._offsets())]
+        passes += [(offset, 'ground', self.by_date_ground, grounds) for offset in (0, *self._offsets())]
+        passes.append((0, 'date', self.by_date, None))
+        for offset, method, table, names in passes:
+            pending = match_ids.isna()
+            if not pending.any():
+                break
+            days = _date_strings(innings.loc[pending, 'Start Date'], offset)
+            keys = days if names is None else days + '|' + names[pending]
+            found = keys.map(table).dropna()
+            if method == 'date': # Only when the opposition is unknown or agrees with the match
+                agrees = [not teams[row] or teams[row] in self.match_teams.get(match_id, ()) for row, match_id in found.items()]
+                found = found[agrees]
+            match_ids[found.index] = found.astype('int64')
+            methods[found.index] = method if offset == 0 else f"{method} {offset:+d}d"
+        return match_ids, methods
+
+    @staticmethod
+    def _offsets() -> list:
+        return [sign * day for day in range(1, DATE_TOLERANCE_DAYS + 1) for sign in (-1, 1)]
+
+
+def link_innings(innings: pd.DataFrame, linker: MatchLinker | None = None) -> tuple:
+    """(innings with 'Match ID' and 'Link Method' added, the rows that could not be linked)."""
+    linker = linker or MatchLinker(load_match_index())
+    match_ids, methods = linker.link(innings)
+    linked = innings.assign(**{'Match ID': match_ids, 'Link Method': methods})
+    unresolved = linked[linked['Match ID'].isna()]
+    share = 100 * (1 - len(unresolved) / len(linked)) if len(linked) else 100.0
+    logging.info(f"Linked {len(linked) - len(unresolved)} of {len(linked)} innings to a Match ID ({share:.1f}%); methods: "
+                 + ', '.join(f"{method} {count}" for method, count in methods.value_counts().items()))
+    if len(unresolved):
+        logging.warning(f"{len(unresolved)} innings unresolved, e.g. " + '; '.join(
+            ' / '.join(str(row.get(col)) for col in LINK_KEY_COLUMNS) for row in unresolved.head(3).to_dict('records')))
+    return linked, unresolved
+
+def enrich_with_match_context(linked: pd.DataFrame, index: MatchIndex | None = None) -> pd.DataFrame:
+    """Adds the match index columns (Season, teams, winner, margin, ground) to linked innings rows by Match ID."""
+    context = (index or load_match_index()).to_frame().drop(columns=['Scorecard Link', 'Margin Raw'])
+    context = context.rename(columns={col: f"Match {col}" for col in context.columns if col not in ('Match ID', 'Match Date')})
+    return linked.merge(context.astype({'Match ID': 'Int64'}), on='Match ID', how='left')
+
+
+def _stage_manifest(table_name: str, csv_path: str) -> StageManifest:
+    stem = os.path.splitext(csv_path)[0]
+    return StageManifest(f"innings_linker/{table_name}", outputs=[stem + LINKED_SUFFIX, stem + UNRESOLVED_SUFFIX],
+                         inputs=[csv_path] + match_index.index_source_paths(), code_files=[__file__, match_index.__file__])
+
+
+# --- Self-check ---
+def self_check() -> list:
+    """Links a few known rows against a two-match index; returns the failed expectations (empty when all hold)."""
+    def match(match_id, day, team_1, team_2, ground):
+        return {'Match ID': match_id, 'Season': '2024', 'Match Date': pd.Timestamp(day).date(), 'Team 1': team_1, 'Team 2': team_2, 'Winner': None,
+                'Net Margin': None, 'Margin Type': None, 'Ground Name': ground, 'Ground ID': None, 'Scorecard Link': None, 'Margin Raw': None}
+    linker = MatchLinker(MatchIndex([match(1, '2024-04-01', 'Chennai Super Kings', 'Royal Challengers Bengaluru', 'MA Chidambaram Stadium, Chennai'),
+                                     match(2, '2024-04-03', 'Mumbai Indians', 'Delhi Capitals', 'Wankhede Stadium, Mumbai')]))
+    cases = [ # Opposition, Ground, Start Date, expected Match ID
+        ('v Royal Challengers Bangalore', 'Chennai', '01 Apr 2024', 1),
+        ('v Delhi Capitals', 'Wankhede', '04 Apr 2024', 2),
+        ('', '', '01 Apr 2024', 1),
+        ('v Australia', 'Sydney', '01 Apr 2024', None), # Contradicting opposition on a unique IPL date stays unlinked
+        ('v Mumbai Indians', 'Chennai', '01 Apr 2024', None),
+    ]
+    innings = pd.DataFrame([case[:3] for case in cases], columns=LINK_KEY_COLUMNS)
+    match_ids, methods = linker.link(innings)
+    failures = []
+    for (opposition, ground, start_date, expected), match_id, method in zip(cases, match_ids, methods):
+        got = None if pd.isna(match_id) else int(match_id)
+        if got != expected:
+            failures.append(f"{opposition or '<no opposition>'} / {ground or '<no ground>'} / {start_date}: expected {expected}, linked {got} ({method})")
+    return failures
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if '--self-check' in sys.argv[1:]:
+        check_failures = self_check()
+        for failure in check_failures: print(f"FAIL {failure}")
+        print("Linker self-check: " + (f"{len(check_failures)} failed." if check_failures else "all cases passed."))
+        sys.exit(1 if check_failures else 0)
+    match_linker = None # Built on first use: nothing to load when every table is up to date
+    for table_name in sys.argv[1:] or INNINGS_TABLES:
+        csv_path = compact_loader.ENGINE_CSV_PATHS[table_name]
+        if not os.path.exists(csv_path):
+            print(f"{table_name}: {csv_path} not found, skipped."); continue
+        stage_manifest = _stage_manifest(table_name, csv_path)
+        if SKIP_IF_UP_TO_DATE and stage_manifest.is_up_to_date():
+            print(f"{table_name}: innings and match index unchanged, links up to date ({stage_manifest.path})."); continue
+        match_linker = match_linker or MatchLinker(load_match_index())
+        innings_rows = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        linked_rows, unresolved_rows = link_innings(innings_rows, match_linker)
+        stem = os.path.splitext(csv_path)[0]
+        linked_rows.to_csv(stem + LINKED_SUFFIX, index=False, encoding='utf-8-sig')
+        unresolved_rows.to_csv(stem + UNRESOLVED_SUFFIX, index=False, encoding='utf-8-sig')
+        stage_manifest.record()
+        print(f"{table_name}: {len(linked_rows) - len(unresolved_rows)}/{len(linked_rows)} linked -> {stem + LINKED_SUFFIX} ({len(unresolved_rows)} unresolved -> {stem + UNRESOLVED_SUFFIX})")
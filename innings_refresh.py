@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental mode for innings_by_innings_batting.py.
+
+A full run re-downloads every player's complete innings list although only the
+last few innings are new. InningsRefreshState remembers, per Player ID, what the
+innings CSV already holds:
+
+    last_start_date   newest 'Start Date' stored for the player
+    innings           number of innings rows up to and including that date
+
+and a refresh then works in two steps:
+
+    needs_refresh()   skip the player unless the scorecards have a match for them
+                      after last_start_date (roster.derive_roster 'Last Match Date')
+    new_rows()        of the re-parsed page keep only the innings after last_start_date;
+                      if the older part no longer has `innings` rows (a corrected or
+                      re-numbered history) all rows are kept, so the keyed merge repairs it
+
+The state lives in a small JSON file beside the CSV (one per CSV, so per format). If it is missing it is seeded
+from the CSV itself, and it is ignored when the CSV is gone, so the two cannot
+disagree about which innings are already on disk.
+
+Only matches in the scorecards on disk trigger a refresh: the engine pages cover
+all T20s (class=6), so a player's non-IPL innings are picked up when their next
+IPL match is, or by a periodic full refetch (INCREMENTAL_MODE = False).
+"""
+import json
+import logging
+import os
+from datetime import datetime
+import pandas as pd
+import roster
+
+# --- Configuration ---
+STATE_SUFFIX = "_refresh_state.json" # innings_by_innings_batting.csv -> innings_by_innings_batting_refresh_state.json
+PLAYER_ID_COLUMN = 'Player ID'
+START_DATE_COLUMN = 'Start Date'
+
+
+def _to_timestamp(value) -> pd.Timestamp | None:
+    parsed = pd.to_datetime(value, errors='coerce')
+    return None if pd.isna(parsed) else parsed.normalize()
+
+def increment_path(csv_path: str) -> str:
+    """Where an incremental run streams its new rows before they are merged into csv_path."""
+    stem, ext = os.path.splitext(csv_path)
+    return f"{stem}_increment{ext}"
+
+def scorecard_last_match_dates(seasons: list | None = None) -> dict:
+    """{player id: newest scorecard match date (Timestamp or None)} from batting and bowling appearances."""
+    table = roster.derive_roster(seasons)
+    return {str(player_id): _to_timestamp(match_date) for player_id, match_date in zip(table['id'], table['Last Match Date'])}
+
+
+class InningsRefreshState:
+    """Per-player newest Start Date and innings count already in the innings CSV."""
+
+    def __init__(self, csv_path: str, state_path: str | None = None):
+        self.csv_path = csv_path
+        self.state_path = state_path or os.path.splitext(os.path.abspath(csv_path))[0] + STATE_SUFFIX
+        self.players = {}
+        if not os.path.exists(csv_path):
+            logging.info(f"Incremental refresh: {csv_path} does not exist yet, every player is fetched in full.")
+        elif os.path.exists(self.state_path):
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                self.players = json.load(f).get('players', {})
+            logging.info(f"Incremental refresh: state for {len(self.players)} players loaded from {self.state_path}.")
+        else:
+            self.players = self._seed_from_csv()
+            logging.info(f"Incremental refresh: state for {len(self.players)} players seeded from {csv_path}.")
+
+    def _seed_from_csv(self) -> dict:
+        table = pd.read_csv(self.csv_path, dtype=str, usecols=[PLAYER_ID_COLUMN, START_DATE_COLUMN], keep_default_na=False, encoding='utf-8-sig')
+        table[START_DATE_COLUMN] = pd.to_datetime(table[START_DATE_COLUMN], errors='coerce')
+        table = table.dropna(subset=[START_DATE_COLUMN])
+        seeded = table.groupby(PLAYER_ID_COLUMN)[START_DATE_COLUMN].agg(['max', 'size'])
+        return {player_id: {'last_start_date': last.date().isoformat(), 'innings': int(count)} for player_id, (last, count) in seeded.iterrows()}
+
+    def get(self, player_id) -> dict | None:
+        return self.players.get(str(player_id))
+
+    def needs_refresh(self, player_id, last_match_date) -> bool:
+        """True for players with no stored innings, no dated scorecard match, or a scorecard match after their last Start Date."""
+        stored = self.get(player_id)
+        if stored is None or last_match_date is None:
+            return True
+        return _to_timestamp(last_match_date) > _to_timestamp(stored['last_start_date'])
+
+    def players_to_refresh(self, players: list, last_match_dates: dict) -> list:
+        """The subset of [{'id', 'name'}, ...] that needs_refresh(), in the given order."""
+        selected = [p for p in players if self.needs_refresh(p['id'], last_match_dates.get(str(p['id'])))]
+        logging.info(f"Incremental refresh: {len(selected)} of {len(players)} players have scorecard matches after their last stored innings.")
+        return selected
+
+    def new_rows(self, player_id, rows: list) -> list:
+        """The rows of a freshly parsed innings list that are not in the CSV yet (see module docstring)."""
+        stored = self.get(player_id)
+        if stored is None or not rows:
+            return rows
+        last_start = _to_timestamp(stored['last_start_date'])
+        dates = [_to_timestamp(row.get(START_DATE_COLUMN)) for row in rows]
+        older = sum(1 for d in dates if d is not None and d <= last_start)
+        if older != stored['innings']:
+            logging.warning(f"Player {player_id}: {older} innings up to {stored['last_start_date']} on the page but {stored['innings']} stored; keeping all {len(rows)} rows.")
+            return rows
+        return [row for row, d in zip(rows, dates) if d is None or d > last_start]
+
+    def update(self, player_id, rows: list):
+        """Records the newest Start Date and innings count of a player's complete, freshly parsed innings list."""
+        dates = [d for d in (_to_timestamp(row.get(START_DATE_COLUMN)) for row in rows) if d is not None]
+        if dates:
+            self.players[str(player_id)] = {'last_start_date': max(dates).date().isoformat(), 'innings': len(dates)}
+
+    def save(self):
+        """Atomic write; call only once the rows it describes are in the CSV."""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated_at': datetime.now().isoformat(timespec='seconds'), 'players': self.players}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+        logging.info(f"Incremental refresh: state for {len(self.players)} players saved to {self.state_path}.")
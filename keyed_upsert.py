@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Key-based upserts for scorecard rows.
+
+Rows used to be deduplicated on their values (Match ID, Innings, Batter, Run
+Scored, Ball faced, ...). A corrected row then survived next to the stale one,
+and two different players with the same name and figures collapsed into one.
+Rows are now identified by what they describe:
+
+    batting: (Match ID, Innings, Batter id)    bowling: (Match ID, Innings, Bowler id)
+
+with the player name standing in only when the id could not be parsed. A row
+with neither id nor name cannot be told apart from any other such row, so it is
+rejected (and logged) rather than keyed. A KeyedTable keeps a dict from key to
+row position, so upserting a batch is O(rows in the batch), and a later row for
+the same key replaces the earlier one in place (last write wins).
+
+merge_into_csv() keeps the keys of a CSV's rows in a small index file beside it
+(<name>.csv.keys.json). Rows with new keys are appended, so merging a batch
+costs O(rows in the batch) and the existing file is neither read nor rewritten.
+Only a batch that replaces rows already in the file streams the file once.
+"""
+import csv
+import json
+import logging
+import math
+import os
+import pandas as pd
+
+# --- Configuration ---
+KEY_INDEX_SUFFIX = ".keys.json"
+REWRITE_CHUNK_ROWS = 50000 # Rows per chunk when a merge has to replace rows already in the CSV
+
+
+class RecordKey:
+    """Builds the key tuple of a record: key_columns + player id (or player name when the id is missing)."""
+
+    def __init__(self, key_columns: list, id_column: str | None = None, name_column: str | None = None):
+        self.key_columns = list(key_columns)
+        self.id_column = id_column
+        self.name_column = name_column
+
+    @staticmethod
+    def _normalise(value):
+        """'1234', 1234 and 1234.0 give the same key part; blanks/placeholders give None."""
+        if value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NA:
+            return None
+        text = str(value).strip()
+        if text in ('', '-', 'N/A', 'nan', '<NA>'):
+            return None
+        try:
+            number = float(text)
+            return str(int(number)) if number.is_integer() else text
+        except ValueError:
+            return text
+
+    def __call__(self, record: dict) -> tuple | None:
+        """The key tuple, or None for a player row with neither id nor name (it cannot be keyed)."""
+        parts = tuple(self._normalise(record.get(col)) for col in self.key_columns)
+        if self.id_column is None:
+            return parts
+        player_id = self._normalise(record.get(self.id_column))
+        if player_id is not None:
+            return parts + (player_id,)
+        player_name = self._normalise(record.get(self.name_column)) if self.name_column else None
+        if player_name is None:
+            return None
+        return parts + ('name:' + player_name,)
+
+    def describe(self) -> list:
+        return [self.key_columns, self.id_column, self.name_column]
+
+    def source_columns(self) -> list:
+        return self.key_columns + [c for c in (self.id_column, self.name_column) if c]
+
+BATTING_KEY = RecordKey(['Match ID', 'Innings'], 'Batter id', 'Batter')
+BOWLING_KEY = RecordKey(['Match ID', 'Innings'], 'Bowler id', 'Bowler')
+
+
+class KeyedTable:
+    """Rows plus a hash index from key to position. upsert() is O(1); a repeated key replaces its row in place."""
+
+    def __init__(self, key: RecordKey):
+        self.key = key
+        self.rows = []
+        self.index = {}
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0 # Rows without a key (no player id and no name)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, record_key: tuple):
+        return record_key in self.index
+
+    def upsert(self, record: dict) -> bool:
+        """Inserts or replaces one record. Returns True when an existing row was replaced. Rows without a key are rejected."""
+        record_key = self.key(record)
+        if record_key is None:
+            self.rejected += 1
+            return False
+        position = self.index.get(record_key)
+        if position is not None:
+            self.rows[position] = record; self.updated += 1
+            return True
+        self.index[record_key] = len(self.rows); self.rows.append(record); self.inserted += 1
+        return False
+
+    def upsert_many(self, records) -> int:
+        """Upserts an iterable of records; returns how many replaced an existing row."""
+        rejected_before = self.rejected
+        replaced = sum(self.upsert(record) for record in records)
+        if self.rejected > rejected_before:
+            logging.warning(f"Rejected {self.rejected - rejected_before} rows with neither {self.key.id_column} nor {self.key.name_column}.")
+        return replaced
+
+    def to_frame(self, columns: list | None = None) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(self.rows)
+        return frame.reindex(columns=columns) if columns else frame
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key: RecordKey) -> 'KeyedTable':
+        """Indexes existing rows (one pass). Duplicate keys already in df collapse to their last row."""
+        table = cls(key)
+        table.upsert_many(df.to_dict('records'))
+        table.inserted = table.updated = table.rejected = 0 # Counters describe what is merged in afterwards
+        return table
+
+
+# --- Merging Into Existing Outputs ---
+class CsvKeyIndex:
+    """
+    The keys of a CSV's rows, saved beside it with the CSV's size and mtime. If the CSV changed
+    behind the index's back (another writer, a manual edit) or the key definition differs, the
+    index is rebuilt from the key columns alone.
+    """
+
+    def __init__(self, path: str, key: RecordKey, encoding: str = 'utf-8-sig'):
+        self.path = path
+        self.index_path = path + KEY_INDEX_SUFFIX
+        self.key = key
+        self.encoding = encoding
+        self.keys = self._load()
+
+    def _signature(self) -> list:
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load(self) -> set:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get('signature') == self._signature() and saved.get('key') == self.key.describe():
+                    return {tuple(k) for k in saved['keys']}
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Key index {self.index_path} unreadable ({e}); rebuilding it.")
+        header = read_csv_header(self.path, self.encoding)
+        usecols = [c for c in self.key.source_columns() if c in header]
+        rows = pd.read_csv(self.path, dtype=str, keep_default_na=False, usecols=usecols, encoding=self.encoding).to_dict('records')
+        keys = {k for k in map(self.key, rows) if k is not None}
+        logging.info(f"Built the key index of {os.path.basename(self.path)}: {len(keys)} keys.")
+        return keys
+
+    def save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'signature': self._signature(), 'key': self.key.describe(), 'keys': sorted(self.keys, key=str)}, f)
+        os.replace(tmp_path, self.index_path)
+
+
+def read_csv_header(path: str, encoding: str = 'utf-8-sig') -> list:
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        return next(csv.reader(f), [])
+
+def _append_rows(path: str, records: list, columns: list):
+    """Appends rows under an existing header (plain utf-8: the BOM belongs at the start of the file only)."""
+    with open(path, 'rb') as f:
+        needs_newline = f.seek(0, os.SEEK_END) > 0 and f.seek(-1, os.SEEK_END) >= 0 and f.read(1) != b'\n'
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        if needs_newline: f.write('\n')
+        pd.DataFrame.from_records(records).reindex(columns=columns).to_csv(f, header=False, index=False)
+
+def _rewrite_with_replacements(path: str, replacements: dict, key: RecordKey, columns: list, encoding: str):
+    """Streams the CSV once in chunks, swapping in the replacement for every row whose key is in `replacements`."""
+    tmp_path = f"{path}.tmp"
+    first_chunk = True
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, encoding=encoding, chunksize=REWRITE_CHUNK_ROWS):
+        rows = [replacements.get(key(record), record) for record in chunk.to_dict('records')]
+        pd.DataFrame.from_records(rows).reindex(columns=columns).to_csv(tmp_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False,
+                                                                        encoding=encoding if first_chunk else 'utf-8')
+        first_chunk = False
+    if first_chunk: # Header-only file
+        pd.DataFrame(columns=columns).to_csv(tmp_path, index=False, encoding=encoding)
+    os.replace(tmp_path, path)
+
+def merge_into_csv(path: str, records, key: RecordKey, columns: list, encoding: str = 'utf-8-sig') -> int:
+    """
+    Upserts records into the CSV at `path` (created if missing). New keys are appended and recorded in the key
+    index; rows whose key is already in the file are replaced in one chunked pass. Untouched rows stay as they are
+    on disk. A CSV whose header is not `columns` is rewritten in the new layout. Returns the number of keys in the CSV.
+    """
+    incoming = KeyedTable(key) # Last write wins within the batch too
+    incoming.upsert_many(records)
+    if not os.path.exists(path) or read_csv_header(path, encoding) != list(columns):
+        existing = pd.read_csv(path, dtype=str, keep_default_na=False, encoding=encoding) if os.path.exists(path) else pd.DataFrame(columns=columns)
+        table = KeyedTable.from_frame(existing, key)
+        table.upsert_many(incoming.rows)
+        tmp_path = f"{path}.tmp"
+        table.to_frame(columns).to_csv(tmp_path, index=False, encoding=encoding)
+        os.replace(tmp_path, path)
+        index = CsvKeyIndex(path, key, encoding)
+        index.save()
+        logging.info(f"Merged into {os.path.basename(path)} (written in full): {table.inserted} new rows, {table.updated} replaced ({len(table)} total).")
+        return len(index.keys)
+    index = CsvKeyIndex(path, key, encoding)
+    new_rows, replacements = [], {}
+    for record_key, position in incoming.index.items():
+        if record_key in index.keys: replacements[record_key] = incoming.rows[position]
+        else: new_rows.append(incoming.rows[position])
+    if replacements:
+        _rewrite_with_replacements(path, replacements, key, columns, encoding)
+    if new_rows:
+        _append_rows(path, new_rows, columns)
+        index.keys.update(key(record) for record in new_rows)
+    index.save()
+    logging.info(f"Merged into {os.path.basename(path)}: {len(new_rows)} new rows appended, {len(replacements)} replaced ({len(index.keys)} total).")
+    return len(index.keys)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Layout fingerprints for fetched ESPNcricinfo pages.
+
+A fingerprint is a short hash of a page's structural skeleton: every table,
+its ancestor chain (tag names + class lists) and its header width. Text,
+links and row counts are ignored, so all pages rendered by the same site
+template share one fingerprint. A small persistent JSON cache maps each
+fingerprint to the name of the parser / selector set that is known to work
+for it, so a page goes straight to the right selectors instead of timing
+out on the wrong ones first.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from bs4 import BeautifulSoup, Tag
+
+# --- Configuration ---
+LAYOUT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Layout_Cache")
+LAYOUT_CACHE_PATH = os.path.join(LAYOUT_CACHE_DIR, "layout_fingerprints.json")
+FINGERPRINT_ANCESTOR_DEPTH = 6 # How many ancestors of each table make up its signature
+FINGERPRINT_LENGTH = 16 # Hex characters kept from the sha1 digest
+
+
+# --- Fingerprinting ---
+def _node_signature(tag: Tag) -> str:
+    """Tag name plus sorted class list, e.g. 'div.ds-grow.ds-mt-3'."""
+    classes = sorted(tag.get('class', []))
+    return '.'.join([tag.name] + classes)
+
+def compute_layout_fingerprint(page_soup: BeautifulSoup, root_selector: str | None = None) -> str:
+    """
+    Hashes the table/class skeleton of a parsed page.
+    Each table contributes its ancestor chain and header width; duplicates are
+    collapsed so a one-innings and a two-innings scorecard of the same template match.
+    """
+    root = page_soup.select_one(root_selector) if root_selector else page_soup
+    if root is None:
+        root = page_soup
+    signatures = set()
+    for table in root.find_all('table'):
+        chain = [_node_signature(table)]
+        for parent in table.parents:
+            if len(chain) > FINGERPRINT_ANCESTOR_DEPTH or parent.name in (None, '[document]'):
+                break
+            chain.append(_node_signature(parent))
+        header_row = table.find('tr')
+        header_width = len(header_row.find_all(['th', 'td'], recursive=False)) if header_row else 0
+        signatures.add(f"{'<'.join(chain)}#{header_width}")
+    skeleton = '\n'.join(sorted(signatures))
+    return hashlib.sha1(skeleton.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+
+
+# --- Persistent Cache ---
+class LayoutCache:
+    """JSON-backed map of layout fingerprint -> parser/selector set name."""
+
+    def __init__(self, path: str = LAYOUT_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+                logging.info(f"Loaded {len(self.entries)} layout fingerprints from {path}")
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not read layout cache {path}: {e}. Starting with an empty cache.")
+                self.entries = {}
+
+    def lookup(self, fingerprint: str) -> str | None:
+        """Returns the parser name recorded for a fingerprint, or None."""
+        entry = self.entries.get(fingerprint)
+        return entry['parser'] if entry else None
+
+    def record(self, fingerprint: str, parser_name: str, page_kind: str, example_url: str | None = None):
+        """Records (or refreshes) the parser that worked for a fingerprint."""
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entry = self.entries.get(fingerprint)
+        if entry and entry['parser'] == parser_name:
+            entry['hits'] += 1; entry['last_seen'] = now
+        else:
+            self.entries[fingerprint] = {'parser': parser_name, 'page_kind': page_kind, 'hits': 1,
+                                         'first_seen': now, 'last_seen': now, 'example_url': example_url}
+        self._dirty = True
+
+    def forget(self, fingerprint: str):
+        """Drops a fingerprint whose recorded parser stopped working."""
+        if self.entries.pop(fingerprint, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """Writes the cache atomically if anything changed."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+def select_layout(page_soup: BeautifulSoup, candidates: dict, probe, cache: LayoutCache, page_kind: str, url: str | None = None, root_selector: str | None = None) -> tuple[str | None, str]:
+    """
+    Picks the selector set for a page.
+    `candidates` maps set name -> selector set (tried in insertion order on a cache miss);
+    `probe(page_soup, selector_set)` returns True when the set matches the page.
+    Returns (set_name or None, fingerprint). Cache hits are still probed once (a cheap
+    soup lookup) so a stale entry falls back to the full candidate scan.
+    """
+    fingerprint = compute_layout_fingerprint(page_soup, root_selector)
+    cached_name = cache.lookup(fingerprint)
+    if cached_name in candidates:
+        if probe(page_soup, candidates[cached_name]):
+            cache.record(fingerprint, cached_name, page_kind, url)
+            logging.debug(f"Layout {fingerprint}: cache hit -> '{cached_name}'.")
+            return cached_name, fingerprint
+        logging.warning(f"Layout {fingerprint}: cached selector set '{cached_name}' no longer matches. Re-probing.")
+        cache.forget(fingerprint)
+    for name, selector_set in candidates.items():
+        if name == cached_name:
+            continue
+        if probe(page_soup, selector_set):
+            cache.record(fingerprint, name, page_kind, url)
+            logging.info(f"Layout {fingerprint}: new fingerprint mapped to selector set '{name}'.")
+            return name, fingerprint
+    logging.error(f"Layout {fingerprint}: no known selector set matches this {page_kind} page ({url}).")
+    return None, fingerprint
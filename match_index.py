@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+One match index over every season summary.
+
+Match metadata is written by scrape_season_summary (one <season>_All_matches.csv
+per season script) and by scrape_season_match_results
+(all_season_match_results.csv). build_match_index() merges them into one record
+per Match ID and builds the lookup structures once:
+
+    by_id       dict  Match ID -> record                          O(1)
+    dates       sorted list of match dates (parallel to records)  range query via bisect
+    by_ground   dict  Ground ID -> record positions
+    by_team     dict  team name -> record positions
+    by_season   dict  season -> record positions
+
+The merged records are pickled to Match_Index/match_index.pkl, so loading skips
+the CSVs entirely (the maps over ~1,100 matches are rebuilt in a few milliseconds);
+the file is rebuilt automatically when a source CSV changes (pipeline manifest).
+
+    from match_index import load_match_index
+    index = load_match_index()
+    index.get(1082591)
+    index.query(team='Mumbai Indians', opponent='Chennai Super Kings', start='2018-01-01')
+"""
+import bisect
+import logging
+import os
+import pickle
+import sys
+from datetime import date, datetime
+import pandas as pd
+import compact_loader
+from pipeline_manifest import StageManifest
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(REPO_ROOT, "Match_Index", "match_index.pkl")
+ALL_SEASON_RESULTS_CSV = os.path.join(REPO_ROOT, "All_Seasons_Match_Results_Output", "all_season_match_results.csv")
+INDEX_COLUMNS = ['Match ID', 'Season', 'Match Date', 'Team 1', 'Team 2', 'Winner', 'Net Margin', 'Margin Type',
+                 'Ground Name', 'Ground ID', 'Scorecard Link', 'Margin Raw']
+
+
+def _to_date(value) -> date | None:
+    if value is None or value == '' or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    parsed = pd.to_datetime(value, errors='coerce')
+    return None if pd.isna(parsed) else parsed.date()
+
+def _to_int(value) -> int | None:
+    try: return int(float(value))
+    except (TypeError, ValueError): return None
+
+
+class MatchIndex:
+    """Match records in date order plus hash maps and a sorted date array over them."""
+
+    def __init__(self, records: list):
+        # Undated matches sort last so the date array stays aligned with the records
+        self.records = sorted(records, key=lambda r: (r['Match Date'] is None, r['Match Date'] or date.max, r['Match ID']))
+        self.by_id = {r['Match ID']: r for r in self.records}
+        self.dates = [r['Match Date'] for r in self.records if r['Match Date'] is not None]
+        self.by_ground, self.by_team, self.by_season = {}, {}, {}
+        for position, record in enumerate(self.records):
+            if record['Ground ID'] is not None: self.by_ground.setdefault(record['Ground ID'], []).append(position)
+            for team in {record['Team 1'], record['Team 2']} - {None}:
+                self.by_team.setdefault(team, []).append(position)
+            self.by_season.setdefault(record['Season'], []).append(position)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, match_id) -> bool:
+        return _to_int(match_id) in self.by_id
+
+    # --- Lookups ---
+    def get(self, match_id) -> dict | None:
+        return self.by_id.get(_to_int(match_id))
+
+    def _date_positions(self, start=None, end=None) -> range:
+        low = bisect.bisect_left(self.dates, _to_date(start)) if start is not None else 0
+        high = bisect.bisect_right(self.dates, _to_date(end)) if end is not None else len(self.dates)
+        return range(low, high)
+
+    def between(self, start=None, end=None) -> list:
+        """Matches with start <= Match Date <= end (either bound optional)."""
+        return [self.records[p] for p in self._date_positions(start, end)]
+
+    def on_ground(self, ground_id) -> list:
+        return [self.records[p] for p in self.by_ground.get(_to_int(ground_id), [])]
+
+    def for_team(self, team: str) -> list:
+        return [self.records[p] for p in self.by_team.get(team, [])]
+
+    def between_teams(self, team: str, opponent: str) -> list:
+        opponent_positions = set(self.by_team.get(opponent, []))
+        return [self.records[p] for p in self.by_team.get(team, []) if p in opponent_positions]
+
+    def for_season(self, season) -> list:
+        return [self.records[p] for p in self.by_season.get(str(season).replace('-', '/'), self.by_season.get(str(season), []))]
+
+    def query(self, season=None, ground_id=None, team: str | None = None, opponent: str | None = None, start=None, end=None) -> list:
+        """Intersects the given filters, starting from the most selective hash-map bucket."""
+        candidate_sets = []
+        if season is not None: candidate_sets.append(set(self.by_season.get(str(season).replace('-', '/'), self.by_season.get(str(season), []))))
+        if ground_id is not None: candidate_sets.append(set(self.by_ground.get(_to_int(ground_id), [])))
+        if team is not None: candidate_sets.append(set(self.by_team.get(team, [])))
+        if opponent is not None: candidate_sets.append(set(self.by_team.get(opponent, [])))
+        if start is not None or end is not None: candidate_sets.append(set(self._date_positions(start, end)))
+        if not candidate_sets:
+            return list(self.records)
+        candidate_sets.sort(key=len)
+        positions = candidate_sets[0].intersection(*candidate_sets[1:])
+        return [self.records[p] for p in sorted(positions)]
+
+    def to_frame(self, records: list | None = None) -> pd.DataFrame:
+        """Records (default: all) as a DataFrame, e.g. to merge onto scorecard rows by 'Match ID'."""
+        frame = pd.DataFrame.from_records(self.records if records is None else records, columns=INDEX_COLUMNS)
+        frame['Match Date'] = pd.to_datetime(frame['Match Date'])
+        return frame
+
+
+# --- Building ---
+def index_source_paths() -> list:
+    """The CSVs the index is built from (also the inputs of stages that depend on it)."""
+    paths = list(compact_loader.find_season_csvs('match_summary').values())
+    return paths + ([ALL_SEASON_RESULTS_CSV] if os.path.exists(ALL_SEASON_RESULTS_CSV) else [])
+
+def build_match_index(source_paths: list | None = None) -> MatchIndex:
+    """Merges the all-season results CSV and the per-season summaries (per-season rows win) into one index."""
+    source_paths = source_paths if source_paths is not None else index_source_paths()
+    ordered = sorted(source_paths, key=lambda p: os.path.abspath(p) != os.path.abspath(ALL_SEASON_RESULTS_CSV)) # Combined file first
+    merged = {}
+    for path in ordered:
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        for row in frame.to_dict('records'):
+            match_id = _to_int(row.get('Match ID'))
+            if match_id is None:
+                continue
+            merged[match_id] = {
+                'Match ID': match_id, 'Season': (row.get('Season') or '').strip() or None,
+                'Match Date': _to_date(row.get('Match Date')),
+                'Team 1': row.get('Team 1') or None, 'Team 2': row.get('Team 2') or None, 'Winner': row.get('Winner') or None,
+                'Net Margin': pd.to_numeric(row.get('Net Margin'), errors='coerce') if row.get('Net Margin') else None,
+                'Margin Type': row.get('Margin Type') or None, 'Ground Name': row.get('Ground Name') or None,
+                'Ground ID': _to_int(row.get('Ground ID')), 'Scorecard Link': row.get('Scorecard Link') or None,
+                'Margin Raw': row.get('Margin Raw') or None,
+            }
+    index = MatchIndex(list(merged.values()))
+    logging.info(f"Match index: {len(index)} matches from {len(ordered)} source files.")
+    return index
+
+def _stage_manifest(index_path: str, source_paths: list) -> StageManifest:
+    return StageManifest("match_index", outputs=[index_path], inputs=source_paths, code_files=[__file__])
+
+def load_match_index(index_path: str = INDEX_PATH, rebuild: bool = False) -> MatchIndex:
+    """Loads the pickled index, rebuilding it first if a source CSV (or this module) changed."""
+    source_paths = index_source_paths()
+    manifest = _stage_manifest(index_path, source_paths)
+    if not rebuild and os.path.exists(index_path) and manifest.is_up_to_date():
+        with open(index_path, 'rb') as f:
+            return MatchIndex(pickle.load(f)['records'])
+    index = build_match_index(source_paths)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'wb') as f: # Plain records only, so the file does not depend on where MatchIndex was defined
+        pickle.dump({'records': index.records}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, index_path)
+    manifest.record()
+    return index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start_time = datetime.now()
+    match_index = load_match_index(rebuild='--rebuild' in sys.argv)
+    elapsed_ms = (datetime.now() - start_time).total_seconds() * 1000
+    print(f"{len(match_index)} matches, {len(match_index.by_season)} seasons, {len(match_index.by_ground)} grounds, {len(match_index.by_team)} teams ({elapsed_ms:.0f} ms)")
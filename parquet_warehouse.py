@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Optional Parquet warehouse for the scraped tables.
+
+Each scraper still writes its CSV; when pyarrow is installed it can also write
+the same DataFrame here with an explicit schema, partitioned hive-style:
+
+    Warehouse/<table>/trophy=<trophy id>/season=<season>/part-0.parquet
+
+The player-stat tables from the engine pages (FORMAT_PARTITIONED_TABLES) are not
+scoped to a trophy but to a stat format (stat_formats.STAT_FORMATS), so their
+first partition key is the format instead:
+
+    Warehouse/career_batting/format=<t20|t20i|ipl>/season=<season>/part-0.parquet
+
+Re-writing a partition replaces it. load_table() reads only the
+partitions and columns it is asked for, so a multi-season analysis is a pruned
+Parquet scan instead of re-parsing every CSV with type inference.
+
+    from parquet_warehouse import load_table
+    df = load_table('batting', columns=['Match ID', 'Batter id', 'Run Scored'], seasons=['2023', '2024'])
+
+`python parquet_warehouse.py backfill` loads the CSVs that already exist on disk.
+"""
+import glob
+import logging
+import os
+import sys
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError: # Optional dependency: scrapers keep writing CSVs without it
+    pa = ds = pq = None
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+WAREHOUSE_DIR = os.path.join(REPO_ROOT, "Warehouse")
+PARQUET_COMPRESSION = 'zstd'
+ALL_PARTITION = 'all' # Partition value for data not scoped to one trophy/season
+DEFAULT_STAT_FORMAT = 't20' # Format partition of engine rows written without a format (class=6, all T20s)
+
+# --- Table Schemas ---
+# Column -> logical type. 'str', 'date', 'float32', or a nullable integer width.
+TABLE_SCHEMAS = {
+    'match_summary': {
+        'Season': 'str', 'Match ID': 'int64', 'Team 1': 'str', 'Team 2': 'str', 'Winner': 'str',
+        'Net Margin': 'float32', 'Margin Type': 'str', 'Ground Name': 'str', 'Ground ID': 'int64',
+        'Match Date': 'date', 'Scorecard Link': 'str', 'Margin Raw': 'str',
+    },
+    'batting': {
+        'Match ID': 'int64', 'Innings': 'int16', 'Batting Team': 'str', 'Batter': 'str', 'Batter id': 'int64',
+        'Run Scored': 'int16', 'Ball faced': 'int16', 'Fours': 'int16', 'Sixes': 'int16', 'Strike rate': 'float32',
+        'Dismissal Type': 'str', 'Dismissal Player': 'str', 'Dismissal Bowler': 'str',
+    },
+    'bowling': {
+        'Match ID': 'int64', 'Innings': 'int16', 'Bowling Team': 'str', 'Bowler': 'str', 'Bowler id': 'int64',
+        'Over bowled': 'float32', 'Maiden Over': 'int16', 'Run given': 'int16', 'Wicket taken': 'int16',
+        'Economy rate': 'float32', 'Wides': 'int16', 'No balls': 'int16', 'Dot balls': 'int16', 'Fours': 'int16', 'Sixes': 'int16',
+    },
+    'career_batting': {
+        'Player Name': 'str', 'Player ID': 'int64', 'Format': 'str', 'Span': 'str', 'Matches': 'int32', 'Innings': 'int32',
+        'NO': 'int32', 'Runs': 'int32', 'HS': 'int32', 'Ave': 'float32', 'BF': 'int32', 'SR': 'float32',
+        '100': 'int32', '50': 'int32', '0': 'int32', '4s': 'int32', '6s': 'int32',
+    },
+    'career_bowling': {
+        'Player Name': 'str', 'Player ID': 'int64', 'Format': 'str', 'Span': 'str', 'Matches': 'int32', 'Innings': 'int32',
+        'Overs': 'float32', 'Mdns': 'int32', 'Runs': 'int32', 'Wkts': 'int32', 'BBI Wkts': 'int16', 'BBI Runs': 'int16',
+        'Ave': 'float32', 'Econ': 'float32', 'SR': 'float32', '4w': 'int32', '5w': 'int32',
+    },
+    'innings_batting': {
+        'Player Name': 'str', 'Player ID': 'int64', 'Runs': 'int16', 'Mins': 'int16', 'BF': 'int16', '4s': 'int16',
+        '6s': 'int16', 'SR': 'float32', 'Pos': 'int16', 'Dismissal': 'str', 'Inns': 'int16',
+        'Opposition': 'str', 'Ground': 'str', 'Start Date': 'date',
+    },
+    'innings_bowling': {
+        'Player Name': 'str', 'Player ID': 'int64', 'Overs': 'float32', 'Mdns': 'int16', 'Runs': 'int16', 'Wkts': 'int16',
+        'Econ': 'float32', 'Pos': 'int16', 'Inns': 'int16', 'Opposition': 'str', 'Ground': 'str', 'Start Date': 'date',
+    },
+    'career_fielding': {
+        'Player Name': 'str', 'Player ID': 'int64', 'Format': 'str', 'Span': 'str', 'Matches': 'int32', 'Innings': 'int32',
+        'Dis': 'int32', 'Ct': 'int32', 'St': 'int32', 'Ct Wk': 'int32', 'Ct Fi': 'int32', 'MD': 'str', 'D/I': 'float32',
+    },
+}
+# Tables without a season of their own are split into season partitions by this date column's year
+SEASON_FROM_DATE_COLUMN = {'innings_batting': 'Start Date', 'innings_bowling': 'Start Date'}
+PARTITION_COLUMNS = ['trophy', 'season']
+FORMAT_PARTITIONED_TABLES = ('career_batting', 'career_bowling', 'innings_batting', 'innings_bowling', 'career_fielding')
+FORMAT_PARTITION_COLUMNS = ['format', 'season']
+
+_PANDAS_DTYPES = {'int16': 'Int16', 'int32': 'Int32', 'int64': 'Int64', 'float32': 'float32', 'str': 'string', 'date': 'datetime64[ns]'}
+_INTEGER_TYPES = ('int16', 'int32', 'int64')
+
+
+def warehouse_available() -> bool:
+    return pa is not None
+
+def season_partition_value(season) -> str:
+    """'2007/08' -> '2007-08' (same convention as the season output folders)."""
+    return str(season).replace('/', '-') if season not in (None, '') else ALL_PARTITION
+
+def partition_columns(table_name: str) -> list:
+    return FORMAT_PARTITION_COLUMNS if table_name in FORMAT_PARTITIONED_TABLES else PARTITION_COLUMNS
+
+def _arrow_schema(table_name: str):
+    arrow_types = {'str': pa.string(), 'date': pa.timestamp('ns'), 'float32': pa.float32(),
+                   'int16': pa.int16(), 'int32': pa.int32(), 'int64': pa.int64()}
+    return pa.schema([(col, arrow_types[kind]) for col, kind in TABLE_SCHEMAS[table_name].items()])
+
+
+# --- Schema Coercion ---
+def conform_to_schema(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    Returns a copy of df with exactly the schema's columns, in order, cast to the schema types.
+    Placeholders ('-', 'N/A', '') become nulls in numeric/date columns; columns not in the schema are dropped.
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    extra_cols = [col for col in df.columns if col not in schema]
+    if extra_cols: logging.warning(f"Warehouse {table_name}: dropping columns not in schema: {extra_cols}")
+    out = pd.DataFrame(index=df.index)
+    for col, kind in schema.items():
+        series = df[col] if col in df.columns else pd.Series(pd.NA, index=df.index)
+        if kind == 'str':
+            out[col] = series.astype('string')
+        elif kind == 'date':
+            out[col] = pd.to_datetime(series, errors='coerce')
+        else:
+            numeric = pd.to_numeric(series.replace(['-', 'N/A', ''], pd.NA), errors='coerce')
+            if kind in _INTEGER_TYPES:
+                fractional = numeric.notna() & (numeric % 1 != 0)
+                if fractional.any():
+                    logging.warning(f"Warehouse {table_name}: {int(fractional.sum())} non-integer values in '{col}' set to null.")
+                    numeric = numeric.mask(fractional)
+            out[col] = numeric.astype(_PANDAS_DTYPES[kind])
+    return out.reset_index(drop=True)
+
+
+# --- Writing ---
+def _partition_dir(table_name: str, trophy, season, root: str, stat_format=None) -> str:
+    if table_name in FORMAT_PARTITIONED_TABLES:
+        first_level = f"format={stat_format or DEFAULT_STAT_FORMAT}"
+    else:
+        first_level = f"trophy={trophy if trophy else ALL_PARTITION}"
+    return os.path.join(root, table_name, first_level, f"season={season_partition_value(season)}")
+
+def _write_partition(frame: pd.DataFrame, table_name: str, partition_dir: str):
+    os.makedirs(partition_dir, exist_ok=True)
+    final_path = os.path.join(partition_dir, "part-0.parquet"); tmp_path = f"{final_path}.tmp"
+    arrow_table = pa.Table.from_pandas(frame, schema=_arrow_schema(table_name), preserve_index=False)
+    pq.write_table(arrow_table, tmp_path, compression=PARQUET_COMPRESSION)
+    os.replace(tmp_path, final_path) # Readers never see a half-written partition
+
+def write_table(df: pd.DataFrame, table_name: str, trophy=None, season=None, root: str = WAREHOUSE_DIR, stat_format=None) -> list:
+    """
+    Writes df as one warehouse partition (or one per year for tables in SEASON_FROM_DATE_COLUMN
+    when no season is given), replacing what was there. Returns the partition dirs written.
+    Tables in FORMAT_PARTITIONED_TABLES are partitioned by `stat_format` (default DEFAULT_STAT_FORMAT)
+    instead of `trophy`. Never raises: a warehouse problem must not cost the scraper its CSV output.
+    """
+    if not warehouse_available():
+        logging.warning(f"pyarrow not installed; skipping Parquet warehouse write for '{table_name}'.")
+        return []
+    if df is None or df.empty:
+        return []
+    try:
+        conformed = conform_to_schema(df, table_name)
+        date_col = SEASON_FROM_DATE_COLUMN.get(table_name)
+        if season is None and date_col:
+            groups = conformed.groupby(conformed[date_col].dt.year.astype('Int64').astype('string').fillna(ALL_PARTITION))
+        else:
+            groups = [(season, conformed)]
+        written = []
+        for season_value, frame in groups:
+            partition_dir = _partition_dir(table_name, trophy, season_value, root, stat_format)
+            _write_partition(frame.reset_index(drop=True), table_name, partition_dir)
+            written.append(partition_dir)
+        logging.info(f"Warehouse {table_name}: wrote {len(conformed)} rows into {len(written)} partition(s) under {os.path.join(root, table_name)}")
+        return written
+    except Exception as e:
+        logging.error(f"Warehouse write failed for '{table_name}' (trophy={trophy}, format={stat_format}, season={season}): {e}", exc_info=True)
+        return []
+
+
+# --- Reading ---
+def list_partitions(table_name: str, root: str = WAREHOUSE_DIR) -> list:
+    """Returns (trophy, season) pairs present for a table ((format, season) for FORMAT_PARTITIONED_TABLES)."""
+    pairs = []
+    for path in sorted(glob.glob(os.path.join(root, table_name, f"{partition_columns(table_name)[0]}=*", "season=*"))):
+        season_dir = os.path.basename(path); trophy_dir = os.path.basename(os.path.dirname(path))
+        pairs.append((trophy_dir.split('=', 1)[1], season_dir.split('=', 1)[1]))
+    return pairs
+
+def load_table(table_name: str, columns: list | None = None, trophies: list | None = None, seasons: list | None = None,
+               root: str = WAREHOUSE_DIR, formats: list | None = None) -> pd.DataFrame:
+    """
+    Reads a warehouse table, touching only the requested partitions and columns.
+    `columns` may include the partition columns ('trophy' or 'format', and 'season'). `formats`
+    filters FORMAT_PARTITIONED_TABLES, `trophies` the others.
+    """
+    if not warehouse_available():
+        raise ImportError("pyarrow is required to read the Parquet warehouse.")
+    table_dir = os.path.join(root, table_name)
+    if not os.path.isdir(table_dir):
+        return pd.DataFrame(columns=columns or list(TABLE_SCHEMAS[table_name]))
+    partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in partition_columns(table_name)]), flavor='hive')
+    dataset = ds.dataset(table_dir, format='parquet', partitioning=partitioning)
+    row_filter = None
+    if table_name in FORMAT_PARTITIONED_TABLES:
+        if trophies: raise ValueError(f"'{table_name}' is partitioned by stat format; filter it with formats=, not trophies=.")
+        if formats: row_filter = ds.field('format').isin([str(f) for f in formats])
+    elif trophies:
+        row_filter = ds.field('trophy').isin([str(t) for t in trophies])
+    if seasons:
+        season_filter = ds.field('season').isin([season_partition_value(s) for s in seasons])
+        row_filter = season_filter if row_filter is None else row_filter & season_filter
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+
+# --- Backfill From Existing CSVs ---
+def backfill_from_csvs(search_dirs: list | None = None, trophy: str = '117', root: str = WAREHOUSE_DIR):
+    """Loads every scraper CSV found on disk into the warehouse (season scripts may run from the repo root or Match_Scorecard/)."""
+    search_dirs = search_dirs or [REPO_ROOT, os.path.join(REPO_ROOT, "Match_Scorecard")]
+    season_files = (('match_summary', '_All_matches.csv'), ('batting', '_All_matches_batting.csv'), ('bowling', '_All_matches_bowling.csv'))
+    for base_dir in search_dirs:
+        for data_dir in sorted(glob.glob(os.path.join(base_dir, "*_Scorecard", "*_scorecard_data"))):
+            season = os.path.basename(data_dir)[:-len("_scorecard_data")]
+            for table_name, suffix in season_files:
+                csv_path = os.path.join(data_dir, f"{season}{suffix}")
+                if os.path.exists(csv_path):
+                    write_table(pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig'), table_name, trophy, season, root)
+    engine_files = (('career_batting', os.path.join("Career_Averages_Output", "career_batting_averages.csv")),
+                    ('career_bowling', os.path.join("Career_Averages_Output", "career_bowling_averages.csv")),
+                    ('innings_batting', os.path.join("Innings_By_Innings_output", "innings_by_innings_batting.csv")),
+                    ('innings_bowling', os.path.join("Innings_By_Innings_output", "innings_by_innings_bowling.csv")),
+                    ('career_fielding', os.path.join("Career_Averages_Output", "career_fielding.csv")))
+    for table_name, rel_path in engine_files:
+        csv_path = os.path.join(REPO_ROOT, rel_path)
+        if os.path.exists(csv_path):
+            write_table(pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig'), table_name, root=root, stat_format=DEFAULT_STAT_FORMAT)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        backfill_from_csvs()
+    else:
+        for name in TABLE_SCHEMAS:
+            print(f"{name}: {list_partitions(name)}")
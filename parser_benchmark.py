@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Parser benchmark over saved HTML fixtures.
+
+Times the offline parsing half of every scraper (no network, no browser):
+    - scorecard batting/bowling tables (_process_batting_table / _process_bowling_table),
+      one fixture match per season script in Match_Scorecard/
+    - stats-engine pages: career batting, career bowling, innings by innings (engine_table.py)
+    - trophy records averages pages (batting_bowling_stat.parse_segment_table)
+
+For each fixture kind it reports rows/s, per-page latency percentiles (p50/p95/p99)
+and peak traced memory, and compares them against a stored baseline so parser
+slowdowns show up before a production crawl.
+
+Usage:
+    python parser_benchmark.py capture                 # fetch missing fixture pages with a browser
+    python parser_benchmark.py run                     # benchmark and compare with the baseline
+    python parser_benchmark.py run --save-baseline     # benchmark and store the result as the new baseline
+
+Setup (required once per checkout): the fixture pages are live espncricinfo pages, so
+Benchmark_Fixtures/ has to be filled before the benchmark can measure anything:
+    1. the season scripts have written their summary CSVs (scorecard fixture URLs come from them),
+    2. `capture` has saved the pages (needs Chrome, like the scrapers), and
+    3. `run --save-baseline` has stored the baseline on the machine that runs the gate.
+Timings are machine-specific, so the baseline belongs with the fixtures on that machine.
+Until then `run` fails with exit code 2 (and lists what is missing) instead of passing
+without measuring: a gate must not go green on an empty corpus. A manifest fixture that
+was never captured, or a baseline kind with no fixtures left, fails the run the same way.
+"""
+import argparse
+import contextlib
+import glob
+import importlib.util
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+
+import engine_table
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SEASON_SCRIPT_DIR = os.path.join(REPO_ROOT, "Match_Scorecard")
+FIXTURE_DIR = os.path.join(REPO_ROOT, "Benchmark_Fixtures")
+FIXTURE_MANIFEST_PATH = os.path.join(FIXTURE_DIR, "manifest.json")
+BASELINE_PATH = os.path.join(FIXTURE_DIR, "baseline.json")
+# The scraper modules create output dirs and log files when imported; keep those out of the repo root
+IMPORT_SCRATCH_DIR = os.path.join(FIXTURE_DIR, "_import_scratch")
+
+DEFAULT_REPEAT = 5 # Timed passes over every fixture
+DEFAULT_TOLERANCE = 0.20 # Allowed relative slowdown / memory growth before a kind counts as regressed
+BENCHMARK_PLAYER = {'id': '253802', 'name': 'V Kohli'} # Long career: large innings list, non-trivial bowling record
+BENCHMARK_TEAM_ID = '4343' # Chennai Super Kings, played every season except 2016-17
+CAPTURE_SLEEP_MIN = 4.0
+CAPTURE_SLEEP_MAX = 8.0
+CAPTURE_WAIT_TIME = 40
+EXIT_SETUP_MISSING = 2 # `run` without the fixture corpus or a baseline: nothing was compared
+
+ENGINE_URL_TEMPLATE = 'https://stats.espncricinfo.com/ci/engine/player/{player_id}.html?class=6;template=results;type={engine_type}'
+TROPHY_URL_TEMPLATE = 'https://www.espncricinfo.com/records/trophy/{segment_path}/indian-premier-league-117?team={team_id}'
+SCORECARD_BASE_URL = 'https://www.espncricinfo.com'
+
+# Wait condition used when capturing each kind of page
+CAPTURE_WAIT_SELECTORS = {
+    'scorecard': '#main-container table',
+    'engine_career_batting': engine_table.ENGINE_CONTAINER_SELECTOR,
+    'engine_career_bowling': engine_table.ENGINE_CONTAINER_SELECTOR,
+    'engine_innings_batting': engine_table.ENGINE_CONTAINER_SELECTOR,
+    'trophy_batting': 'table.ds-table tbody',
+    'trophy_bowling': 'table.ds-table tbody',
+}
+
+
+# --- Module Loading ---
+@contextlib.contextmanager
+def _scratch_cwd():
+    """Runs a scraper module's import-time side effects (makedirs, log files) inside the scratch dir."""
+    os.makedirs(IMPORT_SCRATCH_DIR, exist_ok=True)
+    previous_cwd = os.getcwd()
+    os.chdir(IMPORT_SCRATCH_DIR)
+    try: yield
+    finally: os.chdir(previous_cwd)
+
+_module_cache = {}
+def load_script_module(path: str):
+    """Imports a scraper script by path (season scripts are not importable by name)."""
+    if path not in _module_cache:
+        module_name = "bench_" + os.path.splitext(os.path.basename(path))[0].replace('-', '_')
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        with _scratch_cwd():
+            spec.loader.exec_module(module)
+        _module_cache[path] = module
+    return _module_cache[path]
+
+def season_script_paths() -> dict:
+    """Season file stem (e.g. '2007-08') -> script path."""
+    return {os.path.splitext(os.path.basename(p))[0]: p for p in sorted(glob.glob(os.path.join(SEASON_SCRIPT_DIR, "*.py")))}
+
+
+# --- Fixture Parsers (soup -> list of rows) ---
+def parse_scorecard_fixture(page_soup: BeautifulSoup, fixture: dict) -> list:
+    """Runs a season script's batting and bowling table parsers over both innings of a saved scorecard."""
+    module = load_script_module(season_script_paths()[fixture['season']])
+    selectors = next((s for s in module.SCORECARD_SELECTOR_SETS.values() if module.scorecard_layout_matches(page_soup, s)), None)
+    if selectors is None:
+        raise ValueError(f"No selector set in {fixture['season']}.py matches fixture {fixture['name']}")
+    rows = []
+    for innings_num in (1, 2):
+        batting_table = page_soup.select_one(selectors[f'INNINGS_{innings_num}_BATTING_TABLE'])
+        bowling_table = page_soup.select_one(selectors[f'INNINGS_{innings_num}_BOWLING_TABLE'])
+        bat_body = batting_table.find('tbody') if batting_table else None
+        bowl_body = bowling_table.find('tbody') if bowling_table else None
+        if bat_body: rows.extend(module._process_batting_table(bat_body, fixture['match_id'], innings_num, f"Team_{innings_num}"))
+        if bowl_body: rows.extend(module._process_bowling_table(bowl_body, fixture['match_id'], innings_num, f"Team_{3 - innings_num}"))
+    return rows
+
+def parse_engine_career_fixture(page_soup: BeautifulSoup, fixture: dict) -> list:
+    column_spec = engine_table.CAREER_BATTING_COLUMNS if fixture['kind'] == 'engine_career_batting' else engine_table.CAREER_BOWLING_COLUMNS
+    record = engine_table.parse_career_summary(page_soup, column_spec, fixture['player_id'], fixture['player_name'])
+    return [record] if record else []
+
+def parse_engine_innings_fixture(page_soup: BeautifulSoup, fixture: dict) -> list:
+    return engine_table.parse_innings_list(page_soup, engine_table.INNINGS_BATTING_COLUMNS, fixture['player_id'], fixture['player_name'])
+
+def parse_trophy_fixture(page_soup: BeautifulSoup, fixture: dict) -> list:
+    module = load_script_module(os.path.join(REPO_ROOT, "batting_bowling_stat.py"))
+    segment_name = 'Batting' if fixture['kind'] == 'trophy_batting' else 'Bowling'
+    return module.parse_segment_table(page_soup, fixture['team_id'], segment_name, fixture['url'])
+
+FIXTURE_PARSERS = {
+    'scorecard': parse_scorecard_fixture,
+    'engine_career_batting': parse_engine_career_fixture,
+    'engine_career_bowling': parse_engine_career_fixture,
+    'engine_innings_batting': parse_engine_innings_fixture,
+    'trophy_batting': parse_trophy_fixture,
+    'trophy_bowling': parse_trophy_fixture,
+}
+
+
+# --- Fixture Manifest ---
+def _find_season_summary_row(season_stem: str) -> dict | None:
+    """First usable row of a season summary CSV written by Match_Scorecard/<season>.py (run from the repo root or Match_Scorecard/)."""
+    import pandas as pd
+    for base_dir in (REPO_ROOT, SEASON_SCRIPT_DIR):
+        summary_path = os.path.join(base_dir, f"{season_stem}_Scorecard", f"{season_stem}_scorecard_data", f"{season_stem}_All_matches.csv")
+        if not os.path.exists(summary_path):
+            continue
+        df_summary = pd.read_csv(summary_path, dtype=str, encoding='utf-8-sig').dropna(subset=['Match ID', 'Scorecard Link'])
+        if not df_summary.empty:
+            return df_summary.iloc[0].to_dict()
+    return None
+
+def build_default_manifest() -> list:
+    """One scorecard per season script, one engine page of each type and both trophy averages pages."""
+    fixtures = []
+    for season_stem in season_script_paths():
+        summary_row = _find_season_summary_row(season_stem)
+        fixtures.append({
+            'name': f"scorecard_{season_stem}", 'kind': 'scorecard', 'season': season_stem,
+            'match_id': summary_row['Match ID'] if summary_row else None,
+            'url': urljoin(SCORECARD_BASE_URL, summary_row['Scorecard Link']) if summary_row else None,
+        })
+    for kind, engine_type in (('engine_career_batting', 'batting'), ('engine_career_bowling', 'bowling'), ('engine_innings_batting', 'batting;view=innings')):
+        fixtures.append({
+            'name': f"{kind}_{BENCHMARK_PLAYER['id']}", 'kind': kind,
+            'player_id': BENCHMARK_PLAYER['id'], 'player_name': BENCHMARK_PLAYER['name'],
+            'url': ENGINE_URL_TEMPLATE.format(player_id=BENCHMARK_PLAYER['id'], engine_type=engine_type),
+        })
+    for kind, segment_path in (('trophy_batting', 'averages-batting'), ('trophy_bowling', 'averages-bowling')):
+        fixtures.append({
+            'name': f"{kind}_{BENCHMARK_TEAM_ID}", 'kind': kind, 'team_id': BENCHMARK_TEAM_ID,
+            'url': TROPHY_URL_TEMPLATE.format(segment_path=segment_path, team_id=BENCHMARK_TEAM_ID),
+        })
+    for fixture in fixtures:
+        fixture['file'] = os.path.join(fixture['kind'], f"{fixture['name']}.html")
+    return fixtures
+
+def load_manifest() -> list:
+    """Loads the fixture manifest, creating the default one on first use."""
+    if os.path.exists(FIXTURE_MANIFEST_PATH):
+        with open(FIXTURE_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return build_default_manifest()
+
+def save_manifest(fixtures: list):
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    with open(FIXTURE_MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(fixtures, f, indent=2)
+
+
+# --- Capture Mode ---
+def capture_fixtures(refresh: bool = False):
+    """Fetches every fixture page that is not saved yet (all of them with refresh=True)."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
+    fixtures = load_manifest()
+    # Fill in scorecard URLs for seasons whose summary CSV appeared since the manifest was written
+    for fixture in fixtures:
+        if fixture['kind'] == 'scorecard' and not fixture.get('url'):
+            summary_row = _find_season_summary_row(fixture['season'])
+            if summary_row:
+                fixture['match_id'] = summary_row['Match ID']; fixture['url'] = urljoin(SCORECARD_BASE_URL, summary_row['Scorecard Link'])
+    save_manifest(fixtures)
+
+    pending = [f for f in fixtures if f.get('url') and (refresh or not os.path.exists(os.path.join(FIXTURE_DIR, f['file'])))]
+    missing_url = [f['name'] for f in fixtures if not f.get('url')]
+    if missing_url:
+        logging.warning(f"No URL for {len(missing_url)} fixtures (run the season script first to get its summary CSV): {missing_url}")
+    if not pending:
+        logging.info("All fixtures with a URL are already captured.")
+        return
+
+    driver = load_script_module(os.path.join(REPO_ROOT, "batting_bowling_stat.py")).setup_driver()
+    try:
+        for i, fixture in enumerate(pending):
+            logging.info(f"Capturing {i + 1}/{len(pending)}: {fixture['name']} from {fixture['url']}")
+            try:
+                driver.get(fixture['url'])
+                WebDriverWait(driver, CAPTURE_WAIT_TIME).until(EC.presence_of_element_located((By.CSS_SELECTOR, CAPTURE_WAIT_SELECTORS[fixture['kind']])))
+                time.sleep(random.uniform(CAPTURE_SLEEP_MIN, CAPTURE_SLEEP_MAX))
+                fixture_path = os.path.join(FIXTURE_DIR, fixture['file'])
+                os.makedirs(os.path.dirname(fixture_path), exist_ok=True)
+                with open(fixture_path, 'w', encoding='utf-8') as f:
+                    f.write(driver.page_source)
+            except Exception as e:
+                logging.error(f"Failed to capture {fixture['name']}: {e}")
+    finally:
+        driver.quit()
+
+
+# --- Benchmark ---
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values: return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _parse_fixture(html: str, fixture: dict) -> list:
+    """Soup construction is part of the measured work, as it is in the scrapers."""
+    page_soup = BeautifulSoup(html, 'lxml')
+    return FIXTURE_PARSERS[fixture['kind']](page_soup, fixture)
+
+def captured_fixtures() -> list:
+    """Manifest entries whose page has been captured."""
+    return [f for f in load_manifest() if os.path.exists(os.path.join(FIXTURE_DIR, f['file']))]
+
+def run_benchmark(repeat: int = DEFAULT_REPEAT) -> dict:
+    """Benchmarks every captured fixture; returns per-kind metrics (empty without fixtures)."""
+    fixtures = captured_fixtures()
+    if not fixtures:
+        return {}
+    pages = []
+    for fixture in fixtures:
+        with open(os.path.join(FIXTURE_DIR, fixture['file']), 'r', encoding='utf-8') as f:
+            pages.append((fixture, f.read()))
+
+    by_kind = {}
+    for fixture, html in pages:
+        stats = by_kind.setdefault(fixture['kind'], {'pages': 0, 'rows': 0, 'latencies': [], 'peak_bytes': 0})
+        rows = _parse_fixture(html, fixture) # Warm-up pass: imports modules and yields the row count
+        stats['pages'] += 1; stats['rows'] += len(rows)
+        if not rows: logging.warning(f"Fixture {fixture['name']} produced no rows.")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _parse_fixture(html, fixture)
+            stats['latencies'].append(time.perf_counter() - start)
+        # Memory is traced in a separate pass; tracemalloc itself slows parsing down considerably
+        tracemalloc.start()
+        _parse_fixture(html, fixture)
+        stats['peak_bytes'] = max(stats['peak_bytes'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    results = {}
+    for kind, stats in by_kind.items():
+        latencies = sorted(stats['latencies'])
+        total_time = sum(latencies)
+        results[kind] = {
+            'pages': stats['pages'],
+            'rows': stats['rows'],
+            'rows_per_s': round(stats['rows'] * repeat / total_time, 1) if total_time else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'peak_kb': round(stats['peak_bytes'] / 1024, 1),
+        }
+    return results
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Returns a list of regression messages (empty when everything is within tolerance)."""
+    regressions = []
+    for kind, current in results.items():
+        previous = baseline.get(kind)
+        if not previous: continue
+        if current['rows'] != previous['rows'] and current['pages'] == previous['pages']:
+            regressions.append(f"{kind}: row count changed {previous['rows']} -> {current['rows']} on the same fixtures")
+        if previous['rows_per_s'] and current['rows_per_s'] < previous['rows_per_s'] * (1 - tolerance):
+            regressions.append(f"{kind}: throughput {current['rows_per_s']} rows/s vs baseline {previous['rows_per_s']}")
+        for metric in ('p95_ms', 'peak_kb'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{kind}: {metric} {current[metric]} vs baseline {previous[metric]}")
+    return regressions
+
+def print_report(results: dict, baseline: dict):
+    header = f"{'Kind':<24}{'Pages':>6}{'Rows':>8}{'Rows/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Peak KB':>10}{'Base rows/s':>13}"
+    print(header); print('-' * len(header))
+    for kind, r in sorted(results.items()):
+        base_rate = baseline.get(kind, {}).get('rows_per_s', '-')
+        print(f"{kind:<24}{r['pages']:>6}{r['rows']:>8}{r['rows_per_s']:>12}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['peak_kb']:>10}{base_rate:>13}")
+
+
+# --- Main Execution Logic ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the HTML parsers against saved fixture pages.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    capture_parser = sub.add_parser('capture', help="Fetch fixture pages with a browser.")
+    capture_parser.add_argument('--refresh', action='store_true', help="Re-fetch fixtures that are already saved.")
+    run_parser = sub.add_parser('run', help="Run the benchmark.")
+    run_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    run_parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline.")
+    args = parser.parse_args()
+
+    # Configured before the scraper modules are imported so their basicConfig calls become no-ops
+    # and per-row logging does not distort the timings
+    logging.basicConfig(level=logging.INFO if args.command == 'capture' else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s [%(funcName)s:%(lineno)d] - %(message)s')
+    logging.getLogger("selenium").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("undetected_chromedriver").setLevel(logging.WARNING)
+
+    if args.command == 'capture':
+        capture_fixtures(refresh=args.refresh)
+        sys.exit(0)
+
+    missing_fixtures = [f['name'] for f in load_manifest() if not os.path.exists(os.path.join(FIXTURE_DIR, f['file']))]
+    if missing_fixtures:
+        print(f"FAILED: {len(missing_fixtures)} fixture pages are not captured in {FIXTURE_DIR}: {missing_fixtures}\n"
+              "Set them up once (see the module docstring):\n"
+              "  python parser_benchmark.py capture\n"
+              "  python parser_benchmark.py run --save-baseline")
+        sys.exit(EXIT_SETUP_MISSING)
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+    elif not args.save_baseline:
+        print(f"FAILED: no baseline at {BASELINE_PATH}; store one with: python parser_benchmark.py run --save-baseline")
+        sys.exit(EXIT_SETUP_MISSING)
+    results = run_benchmark(repeat=args.repeat)
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f"\nBaseline saved to {BASELINE_PATH}")
+        sys.exit(0)
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    regressions += [f"{kind}: in the baseline but no fixture of this kind was benchmarked" for kind in baseline if kind not in results]
+    if regressions:
+        print("\nREGRESSIONS:")
+        for message in regressions: print(f"  - {message}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline.")
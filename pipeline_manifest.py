@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Build-style manifest so unchanged pipeline stages are skipped.
+
+For every stage (one season's scorecards, a warehouse/Arrow export, ...) the
+manifest records what produced its outputs:
+
+    inputs   sha256 of each input file (upstream CSVs, cached pages), plus content
+             hashes the stage supplies itself (pages in the HTML archive)
+    code     sha256 of the script and the shared modules it uses
+    config   hash of the settings that change the output
+    outputs  sha256 of each output file
+
+A stage is up to date when all four still match, i.e. its outputs exist
+untouched and nothing that went into them changed, exactly like a build system
+skipping an up-to-date target. Each stage has its own small JSON file under
+Pipeline_Manifest/, so season scripts running in parallel never race on one file.
+
+    manifest = StageManifest('scorecards/2019', outputs=[...], code_files=[__file__], config={...})
+    if manifest.is_up_to_date(): sys.exit(0)
+    ... run the stage ...
+    manifest.record()
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_DIR = os.path.join(REPO_ROOT, "Pipeline_Manifest")
+HASH_CHUNK_BYTES = 1 << 20
+
+
+# --- Hashing ---
+def file_checksum(path: str) -> str | None:
+    """sha256 of a file's bytes, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def code_version(code_files: list) -> str:
+    """One hash over the source of the given files (script + shared modules), order-independent."""
+    digest = hashlib.sha256()
+    for path in sorted(os.path.abspath(p) for p in code_files):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update((file_checksum(path) or 'missing').encode('utf-8'))
+    return digest.hexdigest()
+
+def module_files(module_names: list) -> list:
+    """Source paths of already-imported modules, for code_version() (e.g. the shared helpers a script imports)."""
+    return [sys.modules[name].__file__ for name in module_names if getattr(sys.modules.get(name), '__file__', None)]
+
+def config_hash(config: dict | None) -> str:
+    return hashlib.sha256(json.dumps(config or {}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def season_is_complete(season: str, today: datetime | None = None) -> bool:
+    """'2019' or '2007/08': complete once the calendar year it ends in is over (its pages no longer change)."""
+    years = re.findall(r'\d{2,4}', str(season))
+    if not years:
+        return False
+    end_year = int(years[-1])
+    if end_year < 100: # '2007/08' -> 2008
+        end_year += (int(years[0]) // 100) * 100
+    return end_year < (today or datetime.now()).year
+
+
+# --- Stage Manifest ---
+class StageManifest:
+    """Inputs, code, config and outputs of one stage, compared with what the last successful run recorded."""
+
+    def __init__(self, stage: str, outputs: list, inputs: list | None = None, code_files: list | None = None,
+                 config: dict | None = None, manifest_dir: str = MANIFEST_DIR, input_checksums=None):
+        """
+        input_checksums: optional callable returning {name: digest} for inputs that are not files of their own
+            (e.g. html_archive.HtmlArchive.content_hashes); called on every check and again by record().
+        """
+        self.stage = stage
+        self.outputs = [os.path.abspath(p) for p in outputs]
+        self.inputs = [os.path.abspath(p) for p in inputs or []]
+        self.input_checksums = input_checksums
+        self.code_files = list(code_files or [])
+        self.config = config or {}
+        self.path = os.path.join(manifest_dir, re.sub(r'[^A-Za-z0-9_.-]+', '_', stage) + ".json")
+
+    def _current_signature(self) -> dict:
+        return {
+            'inputs': dict({p: file_checksum(p) for p in self.inputs}, **(self.input_checksums() if self.input_checksums else {})),
+            'code': code_version(self.code_files),
+            'config': config_hash(self.config),
+        }
+
+    def load(self) -> dict | None:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read manifest {self.path}: {e}. Treating stage '{self.stage}' as out of date.")
+            return None
+
+    def stale_reason(self) -> str | None:
+        """Why the stage has to run, or None when it is up to date."""
+        recorded = self.load()
+        if recorded is None:
+            return "no previous successful run recorded"
+        current = self._current_signature()
+        if recorded.get('code') != current['code']:
+            return "code changed"
+        if recorded.get('config') != current['config']:
+            return "config changed"
+        changed_inputs = [os.path.basename(p) for p, digest in current['inputs'].items() if recorded.get('inputs', {}).get(p) != digest]
+        if changed_inputs:
+            return f"inputs changed: {', '.join(changed_inputs[:5])}{' ...' if len(changed_inputs) > 5 else ''}"
+        recorded_outputs = recorded.get('outputs', {})
+        for output_path in self.outputs:
+            if output_path not in recorded_outputs:
+                return f"output not recorded: {os.path.basename(output_path)}"
+            if file_checksum(output_path) != recorded_outputs[output_path]:
+                return f"output missing or modified: {os.path.basename(output_path)}"
+        return None
+
+    def is_up_to_date(self) -> bool:
+        reason = self.stale_reason()
+        if reason:
+            logging.info(f"Stage '{self.stage}' will run: {reason}.")
+            return False
+        logging.info(f"Stage '{self.stage}' is up to date (inputs, code, config and outputs unchanged); skipping.")
+        return True
+
+    def record(self):
+        """Call after the stage succeeded: stores the current signature and output checksums."""
+        entry = dict(self._current_signature(), stage=self.stage, recorded_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                     config_values=self.config, outputs={p: file_checksum(p) for p in self.outputs})
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Stage '{self.stage}' recorded in manifest {self.path}")
+
+    def invalidate(self):
+        """Forgets the stage, forcing the next run to redo it."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
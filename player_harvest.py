@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+One visit per player: every engine view of a player fetched together, all outputs written together.
+
+career_batting_averages.py, career_bowling_averages.py and innings_by_innings_batting.py
+each crawl one view of the same players in separate runs. This job schedules all
+requested views of a player at once on one engine_harvester.HarvestSession (one
+connection pool, one rate limiter, one page cache) and writes each view to the same
+CSV / SQLite / Parquet outputs the single-view scripts write.
+
+A player's views are fetched as a unit: if any page of a player cannot be fetched,
+none of that player's rows are written, so the outputs never mix a fresh career row
+with a stale or missing innings list. (A view the player has no record in, e.g. no
+bowling career, parses to nothing and is not a failure.)
+
+Each view can be fetched for several format classes in the same run (stat_formats.py:
+t20 = all T20s, t20i, ipl); every (view, format) pair is an output of its own, written
+to the format's CSV and warehouse partition.
+
+The crawl is incremental: HarvestState remembers when each player's (view, format)
+was last written and the player's newest scorecard match at the time. A player is
+fetched again only for the outputs that are missing, older than HARVEST_REFRESH_DAYS,
+or behind a newer scorecard match (--full fetches everything).
+
+Views (VIEWS registry; add an entry for another engine page):
+    career_batting    type=batting                 -> Career_Averages_Output/career_batting_averages.csv
+    career_bowling    type=bowling                 -> Career_Averages_Output/career_bowling_averages.csv
+    innings_batting   type=batting;view=innings    -> Innings_By_Innings_output/innings_by_innings_batting.csv
+    innings_bowling   type=bowling;view=innings    -> Innings_By_Innings_output/innings_by_innings_bowling.csv
+    career_fielding   type=fielding                -> Career_Averages_Output/career_fielding.csv
+
+    python player_harvest.py                                   # DEFAULT_VIEWS for roster batch 0
+    python player_harvest.py --views career_batting innings_bowling --batch-index 2
+    python player_harvest.py --all-batches                     # every roster batch, each merged as it finishes
+    python player_harvest.py --formats t20 t20i ipl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+import engine_harvester
+import engine_table
+import innings_refresh
+import parquet_warehouse
+import roster
+import sqlite_store
+import stat_formats
+from html_archive import HtmlArchive
+from keyed_upsert import RecordKey
+from streaming_writer import StreamingTableWriter
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(REPO_ROOT, "Player_Harvest_Output") # Logs; the data goes to each view's own output CSV
+ENGINE_URL_TEMPLATE = 'https://stats.espncricinfo.com/ci/engine/player/{player_id}.html?{format_query};template=results;{query}'
+DEFAULT_VIEWS = ['career_batting', 'career_bowling', 'innings_batting']
+DEFAULT_FORMATS = [stat_formats.DEFAULT_FORMAT]
+HARVEST_STATE_PATH = os.path.join(OUTPUT_DIR, "harvest_state.json")
+HARVEST_REFRESH_DAYS = 30 # Refetch outputs at least this often: matches outside the IPL scorecards leave no other trace
+WRITE_PARQUET_WAREHOUSE = True # Also write each view to the Parquet warehouse (skipped if pyarrow is missing)
+WRITE_SQLITE_STORE = True # Also upsert each view into the SQLite store (sqlite_store.py)
+STREAM_BATCH_SIZE = 250
+HARVEST_CONCURRENCY = 8
+HARVEST_MIN_INTERVAL = 0.5 # Seconds between requests across all players and views
+ENGINE_BASE_URL = None # e.g. 'http://127.0.0.1:8000' for a local stand-in server
+USE_PAGE_CACHE = True # Archive every fetched page (html_archive.py) and reuse pages younger than PAGE_CACHE_MAX_AGE_DAYS
+PAGE_CACHE_MAX_AGE_DAYS = 1.0 # A re-run the same day (e.g. after a failure) refetches nothing it already has
+ROSTER_SEASONS = None # Target players as in the single-view scripts (roster.py)
+ROSTER_BATCH_SIZE = 150
+ROSTER_BATCH_INDEX = 0
+
+CAREER_KEY = RecordKey(['Format'], 'Player ID', 'Player Name')
+INNINGS_KEY = RecordKey(['Start Date', 'Inns', 'Opposition'], 'Player ID', 'Player Name')
+
+# --- Views ---
+# query: engine URL parameters; parser: 'career' (one summary row) or 'innings' (innings list);
+# columns / int_columns / float_columns / date_columns: the output CSV layout (same as the single-view scripts).
+VIEWS = {
+    'career_batting': {
+        'query': 'type=batting', 'parser': 'career', 'column_spec': engine_table.CAREER_BATTING_COLUMNS, 'key': CAREER_KEY,
+        'columns': ['Player Name', 'Player ID', 'Format', 'Span', 'Matches', 'Innings', 'NO', 'Runs', 'HS', 'Ave', 'BF', 'SR', '100', '50', '0', '4s', '6s'],
+        'int_columns': ['Matches', 'Innings', 'NO', 'Runs', 'HS', 'BF', '100', '50', '0', '4s', '6s'], 'float_columns': ['Ave', 'SR'],
+    },
+    'career_bowling': {
+        'query': 'type=bowling', 'parser': 'career', 'column_spec': engine_table.CAREER_BOWLING_COLUMNS, 'key': CAREER_KEY,
+        'columns': ['Player Name', 'Player ID', 'Format', 'Span', 'Matches', 'Innings', 'Overs', 'Mdns', 'Runs', 'Wkts', 'BBI Wkts', 'BBI Runs', 'Ave', 'Econ', 'SR', '4w', '5w'],
+        'int_columns': ['Matches', 'Innings', 'Mdns', 'Runs', 'Wkts', 'BBI Wkts', 'BBI Runs', '4w', '5w'], 'float_columns': ['Overs', 'Ave', 'Econ', 'SR'],
+    },
+    'innings_batting': {
+        'query': 'type=batting;view=innings', 'parser': 'innings', 'column_spec': engine_table.INNINGS_BATTING_COLUMNS, 'key': INNINGS_KEY,
+        'columns': ['Player Name', 'Player ID', 'Runs', 'Mins', 'BF', '4s', '6s', 'SR', 'Pos', 'Dismissal', 'Inns', 'Opposition', 'Ground', 'Start Date'],
+        'int_columns': ['Runs', 'Mins', 'BF', '4s', '6s', 'Pos', 'Inns'], 'float_columns': ['SR'], 'date_columns': ['Start Date'],
+    },
+    'innings_bowling': {
+        'query': 'type=bowling;view=innings', 'parser': 'innings', 'column_spec': engine_table.INNINGS_BOWLING_COLUMNS, 'key': INNINGS_KEY,
+        'columns': ['Player Name', 'Player ID', 'Overs', 'Mdns', 'Runs', 'Wkts', 'Econ', 'Pos', 'Inns', 'Opposition', 'Ground', 'Start Date'],
+        'int_columns': ['Mdns', 'Runs', 'Wkts', 'Pos', 'Inns'], 'float_columns': ['Overs', 'Econ'], 'date_columns': ['Start Date'],
+    },
+    'career_fielding': {
+        'query': 'type=fielding', 'parser': 'career', 'column_spec': engine_table.CAREER_FIELDING_COLUMNS, 'key': CAREER_KEY,
+        'columns': ['Player Name', 'Player ID', 'Format', 'Span', 'Matches', 'Innings', 'Dis', 'Ct', 'St', 'Ct Wk', 'Ct Fi', 'MD', 'D/I'],
+        'int_columns': ['Matches', 'Innings', 'Dis', 'Ct', 'St', 'Ct Wk', 'Ct Fi'], 'float_columns': ['D/I'],
+    },
+}
+
+
+def view_url(view_name: str, player_id: str, stat_format: str = stat_formats.DEFAULT_FORMAT) -> str:
+    return ENGINE_URL_TEMPLATE.format(player_id=player_id, format_query=stat_formats.format_query(stat_format), query=VIEWS[view_name]['query'])
+
+def output_name(output: tuple) -> str:
+    """(view, format) -> 'career_batting' for the default format, 'career_batting@ipl' otherwise."""
+    view_name, stat_format = output
+    return view_name if stat_format == stat_formats.DEFAULT_FORMAT else f"{view_name}@{stat_format}"
+
+def parse_view(view_name: str, page_soup, player: dict, stat_format: str = stat_formats.DEFAULT_FORMAT) -> list:
+    """The view's rows for one player (a career view gives at most one row)."""
+    view = VIEWS[view_name]
+    if view['parser'] == 'career':
+        record = engine_table.parse_career_summary(page_soup, view['column_spec'], player['id'], player['name'])
+        return stat_formats.label_rows([record], view_name, stat_format) if record else []
+    return engine_table.parse_innings_list(page_soup, view['column_spec'], player['id'], player['name'])
+
+def open_view_writers(outputs: list, batch_index: int, incremental: bool = False) -> dict:
+    """
+    One StreamingTableWriter per (view, format). Every batch (or incremental run) writes a side file that is
+    merged into the output's CSV by key on close.
+    """
+    writers = {}
+    for view_name, stat_format in outputs:
+        view = VIEWS[view_name]
+        csv_path = stat_formats.csv_path(view_name, stat_format)
+        writers[(view_name, stat_format)] = StreamingTableWriter(
+            innings_refresh.increment_path(csv_path) if incremental else roster.batch_output_path(csv_path, batch_index), view['columns'], STREAM_BATCH_SIZE,
+            int_columns=view.get('int_columns'), float_columns=view.get('float_columns'), date_columns=view.get('date_columns'), key=view['key'],
+            on_flush=(lambda batch, table=view_name: sqlite_store.store_dataframe(table, batch)) if WRITE_SQLITE_STORE else None)
+    return writers
+
+
+# --- Incremental State ---
+class HarvestState:
+    """Per output ('view' / 'view@format') and player: when it was last written and the player's newest scorecard match then."""
+
+    def __init__(self, path: str = HARVEST_STATE_PATH):
+        self.path = path
+        self.outputs = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.outputs = json.load(f).get('outputs', {})
+
+    def is_current(self, name: str, player_id, last_match_date, now: datetime) -> bool:
+        entry = self.outputs.get(name, {}).get(str(player_id))
+        if entry is None or now - datetime.fromisoformat(entry['harvested_at']) > timedelta(days=HARVEST_REFRESH_DAYS):
+            return False
+        return last_match_date is None or (entry['last_match_date'] is not None and last_match_date.date().isoformat() <= entry['last_match_date'])
+
+    def mark(self, name: str, player_id, last_match_date, now: datetime):
+        self.outputs.setdefault(name, {})[str(player_id)] = {
+            'harvested_at': now.isoformat(timespec='seconds'), 'last_match_date': last_match_date.date().isoformat() if last_match_date is not None else None}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'outputs': self.outputs}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+def plan_outputs(players: list, outputs: list, state: HarvestState, last_match_dates: dict, now: datetime) -> dict:
+    """{player_id: [(view, format), ...] still to fetch}: outputs without a CSV yet are fetched for everyone."""
+    on_disk = {output for output in outputs if os.path.exists(stat_formats.csv_path(*output))}
+    plan = {}
+    for player in players:
+        last_match_date = last_match_dates.get(str(player['id']))
+        plan[player['id']] = [o for o in outputs if o not in on_disk or not state.is_current(output_name(o), player['id'], last_match_date, now)]
+    due = sum(1 for pending in plan.values() if pending)
+    logging.info(f"Incremental harvest: {due} of {len(players)} players have outputs to refresh "
+                 f"({sum(len(pending) for pending in plan.values())} of {len(players) * len(outputs)} pages).")
+    return plan
+
+
+# --- Harvest ---
+async def harvest_players_async(players: list, outputs: list, on_player=None, plan: dict | None = None, **session_options) -> dict:
+    """
+    Fetches every (view, format) of every player (or the player's entry in `plan`) on one shared session.
+    on_player(player, {(view, format): rows} or None) is called in player order as each player completes; None means
+    at least one of the player's pages could not be fetched (nothing is written for that player). Without on_player the
+    results are returned as {player_id: outputs or None} instead.
+    """
+    async with engine_harvester.HarvestSession(**session_options) as session:
+        total_pages = sum(len(plan.get(p['id'], outputs)) for p in players) if plan is not None else len(players) * len(outputs)
+        logging.info(f"Harvesting {len(outputs)} outputs ({', '.join(output_name(o) for o in outputs)}) for {len(players)} players: "
+                     f"{total_pages} pages, {session.concurrency} concurrent.")
+
+        async def player_task(player: dict):
+            label = f"{player['name']} (ID: {player['id']})"
+            wanted = plan.get(player['id'], outputs) if plan is not None else outputs
+            pages = await asyncio.gather(*(session.fetch(view_url(v, player['id'], f), f"{label} [{output_name((v, f))}]", f"engine_{v}") for v, f in wanted))
+            missing = [output_name(o) for o, html in zip(wanted, pages) if html is None]
+            if missing:
+                logging.error(f"{label}: could not fetch {missing}; none of this player's views are written.")
+                return None
+            parsed = await asyncio.gather(*(session.parse(html, lambda soup, p, v=v, f=f: parse_view(v, soup, p, f), player, f"{label} [{output_name((v, f))}]")
+                                            for (v, f), html in zip(wanted, pages)))
+            return {o: rows or [] for o, rows in zip(wanted, parsed)}
+
+        return await engine_harvester.run_in_player_order(players, player_task, on_player)
+
+def harvest_players(players: list, outputs: list, batch_index: int = 0, plan: dict | None = None, state: HarvestState | None = None,
+                    last_match_dates: dict | None = None, **session_options) -> dict:
+    """
+    Runs the harvest and streams each player's outputs to their CSVs. With a plan (incremental run) rows are merged
+    into the existing CSVs. The state, if given, is updated for the outputs that reached their CSV. Returns per-output row counts.
+    """
+    writers = open_view_writers(outputs, batch_index, incremental=plan is not None)
+    counts = {'players_written': 0, 'players_failed': 0}
+    written = {output: [] for output in outputs} # Player IDs per output, marked in the state once the CSV holds them
+    now = datetime.now()
+
+    def write_player(player: dict, views: dict | None):
+        if views is None:
+            counts['players_failed'] += 1
+            return
+        for output, rows in views.items():
+            writers[output].extend(rows); written[output].append(player['id'])
+        counts['players_written'] += 1
+
+    try:
+        asyncio.run(harvest_players_async(players, outputs, write_player, plan, **session_options))
+    finally:
+        for (view_name, stat_format), writer in writers.items():
+            rows_written = writer.close()
+            csv_path = stat_formats.csv_path(view_name, stat_format)
+            if rows_written: roster.merge_batch_output(writer.path, csv_path, VIEWS[view_name]['key'], VIEWS[view_name]['columns'])
+            counts[output_name((view_name, stat_format))] = rows_written
+            if rows_written and WRITE_PARQUET_WAREHOUSE and os.path.exists(csv_path):
+                parquet_warehouse.write_table(pd.read_csv(csv_path, dtype=str, encoding='utf-8-sig'), view_name, stat_format=stat_format)
+            if state is not None:
+                for player_id in written[(view_name, stat_format)]:
+                    state.mark(output_name((view_name, stat_format)), player_id, (last_match_dates or {}).get(str(player_id)), now)
+        if state is not None: state.save()
+    return counts
+
+
+# --- Main Execution Logic ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch several engine views and formats per player in one pass.")
+    parser.add_argument('--views', nargs='+', choices=list(VIEWS), default=DEFAULT_VIEWS)
+    parser.add_argument('--formats', nargs='+', choices=list(stat_formats.STAT_FORMATS), default=DEFAULT_FORMATS)
+    parser.add_argument('--seasons', nargs='+', default=ROSTER_SEASONS)
+    parser.add_argument('--batch-size', type=int, default=ROSTER_BATCH_SIZE)
+    batch_group = parser.add_mutually_exclusive_group()
+    batch_group.add_argument('--batch-index', type=int, default=ROSTER_BATCH_INDEX)
+    batch_group.add_argument('--all-batches', action='store_true', help="Run every roster batch in one go")
+    parser.add_argument('--base-url', default=ENGINE_BASE_URL)
+    parser.add_argument('--full', action='store_true', help="Fetch every player's outputs, not just the ones due for a refresh")
+    args = parser.parse_args()
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    log_filename = os.path.join(OUTPUT_DIR, f"player_harvest_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s [%(funcName)s:%(lineno)d] - %(message)s',
+                        handlers=[logging.FileHandler(log_filename, encoding='utf-8'), logging.StreamHandler()])
+    logging.info(f"Log file: {log_filename}")
+
+    overall_start_time = time.time()
+    harvest_outputs = [(view_name, stat_format) for stat_format in args.formats for view_name in args.views]
+    harvest_state = HarvestState()
+    scorecard_dates = innings_refresh.scorecard_last_match_dates(args.seasons)
+    page_cache = HtmlArchive() if USE_PAGE_CACHE else None
+    counts = {}
+    try:
+        for batch_index, players in roster.target_batches(args.seasons, args.batch_size, None if args.all_batches else args.batch_index):
+            harvest_plan = None
+            if not args.full:
+                harvest_plan = plan_outputs(players, harvest_outputs, harvest_state, scorecard_dates, datetime.now())
+                players = [player for player in players if harvest_plan[player['id']]]
+            batch_counts = harvest_players(players, harvest_outputs, batch_index, harvest_plan, harvest_state, scorecard_dates, concurrency=HARVEST_CONCURRENCY,
+                                           min_interval=HARVEST_MIN_INTERVAL, base_url=args.base_url, cache=page_cache, cache_max_age_days=PAGE_CACHE_MAX_AGE_DAYS)
+            for name, count in batch_counts.items(): counts[name] = counts.get(name, 0) + count
+    finally:
+        if page_cache is not None: page_cache.close()
+
+    total_duration = time.time() - overall_start_time
+    logging.info(f"Players written: {counts.get('players_written', 0)}, skipped (fetch failures): {counts.get('players_failed', 0)}.")
+    for harvest_output in harvest_outputs:
+        logging.info(f"  {output_name(harvest_output)}: {counts.get(output_name(harvest_output), 0)} rows -> {stat_formats.csv_path(*harvest_output)}")
+    logging.info(f"Script finished in {total_duration:.2f} seconds ({total_duration / 60:.2f} minutes).")
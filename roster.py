@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Target player set for the Statsguru engine scrapers, derived from the scorecards.
+
+career_batting_averages.py, career_bowling_averages.py and innings_by_innings_batting.py
+used to work from one season's hand-written squad list. derive_roster() builds the
+list from 'Batter id' / 'Bowler id' in the season scorecard CSVs instead:
+
+    one row per player ID     (batting and bowling appearances deduplicated)
+    name                      as written in the most recent scorecard
+    Last Match Date / Season  newest appearance; the roster is sorted newest first
+    Matches, Roles            distinct matches played, 'batting' / 'bowling'
+
+target_players() cuts that roster into batches (most recent players in batch 0) and
+falls back to the script's built-in list when no scorecards are on disk. Every batch,
+batch 0 included, streams to its own file and is then merged into the script's CSV by
+key (merge_batch_output), so batches accumulate and a re-run batch replaces its own
+rows without touching the others.
+
+The scripts take the batch from the command line (batch_selection): `--batch-index N`
+runs one batch, `--all-batches` covers the full population in one command, merging
+each batch as it finishes so an interrupted run keeps the batches already done.
+
+    from roster import target_batches
+    for batch_index, PLAYER_DATA in target_batches(seasons=['2024', '2025'], batch_size=150, batch_index=None):
+
+`python roster.py [season ...]` writes Roster_Output/roster.csv and prints the batch count
+(skipped while the scorecard CSVs it reads and this module are unchanged).
+"""
+import argparse
+import logging
+import os
+import sys
+import pandas as pd
+import compact_loader
+from keyed_upsert import RecordKey, merge_into_csv
+from pipeline_manifest import StageManifest
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+ROSTER_CSV_PATH = os.path.join(REPO_ROOT, "Roster_Output", "roster.csv")
+ROLE_COLUMNS = {'batting': ('Batter id', 'Batter'), 'bowling': ('Bowler id', 'Bowler')}
+ROSTER_COLUMNS = ['id', 'name', 'Last Match Date', 'Last Season', 'Matches', 'Roles']
+DEFAULT_BATCH_SIZE = 150
+SKIP_IF_UP_TO_DATE = True # `python roster.py` does nothing while its scorecard inputs, output and code are unchanged (pipeline_manifest.py)
+
+
+def _appearances(role: str, seasons: list | None) -> pd.DataFrame:
+    id_col, name_col = ROLE_COLUMNS[role]
+    table = compact_loader.load_scorecards(role, seasons)
+    if table.empty or id_col not in table.columns:
+        return pd.DataFrame(columns=['id', 'name', 'Match ID', 'Season', 'Role'])
+    return pd.DataFrame({
+        'id': table[id_col], 'name': table[name_col].astype('string'), 'Match ID': table['Match ID'],
+        'Season': table['Season'].astype('string') if 'Season' in table.columns else pd.NA, 'Role': role,
+    })
+
+def derive_roster(seasons: list | None = None, roles: tuple = ('batting', 'bowling')) -> pd.DataFrame:
+    """One row per player ID appearing in the given seasons' scorecards (all on disk if None), newest first."""
+    appearances = pd.concat([_appearances(role, seasons) for role in roles], ignore_index=True).dropna(subset=['id', 'Match ID'])
+    if appearances.empty:
+        return pd.DataFrame(columns=ROSTER_COLUMNS)
+    appearances['id'] = appearances['id'].astype('int64').astype(str)
+    appearances['Match ID'] = appearances['Match ID'].astype('int64')
+    match_dates = compact_loader.load_scorecards('match_summary', seasons)
+    if not match_dates.empty:
+        match_dates = match_dates[['Match ID', 'Match Date']].dropna(subset=['Match ID']).astype({'Match ID': 'int64'}).drop_duplicates('Match ID')
+        appearances = appearances.merge(match_dates, on='Match ID', how='left')
+    else:
+        appearances['Match Date'] = pd.NaT
+    # Undated matches sort by Match ID (ESPNcricinfo IDs grow over time), so 'last' is the most recent appearance
+    appearances = appearances.sort_values(['Match Date', 'Match ID'], na_position='first', kind='stable')
+    roster = appearances.groupby('id', sort=False).agg(**{
+        'name': ('name', 'last'), 'Last Match Date': ('Match Date', 'max'), 'Last Season': ('Season', 'last'),
+        '_last_match_id': ('Match ID', 'max'), 'Matches': ('Match ID', 'nunique'),
+        'Roles': ('Role', lambda role: '|'.join(sorted(set(role)))),
+    }).reset_index()
+    roster = roster.sort_values(['Last Match Date', '_last_match_id', 'Matches'], ascending=False, na_position='last', kind='stable')
+    logging.info(f"Roster: {len(roster)} players from {len(appearances)} {'/'.join(roles)} appearances ({'seasons ' + ', '.join(map(str, seasons)) if seasons else 'all seasons on disk'}).")
+    return roster.reindex(columns=ROSTER_COLUMNS).reset_index(drop=True)
+
+def batch_count(n_players: int, batch_size: int | None) -> int:
+    return 1 if not batch_size else max(1, -(-n_players // batch_size))
+
+def target_batches(seasons: list | None = None, batch_size: int | None = DEFAULT_BATCH_SIZE, batch_index: int | None = 0,
+                   roles: tuple = ('batting', 'bowling'), fallback: list | None = None) -> list:
+    """
+    [(batch index, [{'id', 'name'}, ...]), ...] for one batch of the derived roster, or for every batch in order when
+    batch_index is None (batch 0 = most recent players; batch_size None = one batch of all). The roster is derived once.
+    Falls back to [(0, fallback)] if no scorecards are found or the roster cannot be built. Never raises.
+    """
+    try:
+        roster = derive_roster(seasons, roles)
+    except Exception as e:
+        logging.error(f"Roster derivation failed: {e}", exc_info=True)
+        roster = pd.DataFrame(columns=ROSTER_COLUMNS)
+    if roster.empty:
+        logging.warning(f"No scorecard players found; using the built-in player list ({len(fallback or [])} players).")
+        return [(0, list(fallback or []))]
+    total_batches = batch_count(len(roster), batch_size)
+    if batch_index is not None and batch_index >= total_batches:
+        logging.warning(f"Roster batch {batch_index} requested but there are only {total_batches} batches of {batch_size}; nothing to do.")
+        return []
+    batches = []
+    for index in (range(total_batches) if batch_index is None else [batch_index]):
+        batch = roster if not batch_size else roster.iloc[index * batch_size:(index + 1) * batch_size]
+        logging.info(f"Roster batch {index + 1}/{total_batches}: {len(batch)} of {len(roster)} players.")
+        batches.append((index, batch[['id', 'name']].to_dict('records')))
+    return batches
+
+def target_players(seasons: list | None = None, batch_size: int | None = DEFAULT_BATCH_SIZE, batch_index: int = 0,
+                   roles: tuple = ('batting', 'bowling'), fallback: list | None = None) -> list:
+    """[{'id', 'name'}, ...] for one batch of the derived roster (see target_batches). Never raises."""
+    batches = target_batches(seasons, batch_size, batch_index, roles, fallback)
+    return batches[0][1] if batches else []
+
+def batch_selection(default_index: int = 0, argv: list | None = None) -> int | None:
+    """
+    The batch a script run covers, from its command line: `--batch-index N`, or None for `--all-batches`
+    (every batch, one after the other). Arguments it does not know are left alone.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--batch-index', type=int, default=default_index)
+    group.add_argument('--all-batches', action='store_true')
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    return None if args.all_batches else args.batch_index
+
+def batch_output_path(path: str, batch_index: int) -> str:
+    """Where a batch streams its rows before merge_batch_output: '<name>_batch<NN>.csv' beside the main CSV."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_batch{batch_index:02d}{ext}"
+
+def merge_batch_output(batch_path: str, path: str, key: RecordKey, columns: list) -> int:
+    """Upserts a batch's CSV into the main CSV (created if missing) and removes the batch file. Returns the main CSV's row count."""
+    if os.path.abspath(batch_path) == os.path.abspath(path) or not os.path.exists(batch_path):
+        return 0
+    batch = pd.read_csv(batch_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    total_rows = merge_into_csv(path, batch.to_dict('records'), key, columns)
+    os.remove(batch_path)
+    return total_rows
+
+
+def _stage_manifest(seasons: list | None) -> StageManifest:
+    inputs = [path for table_name in ('match_summary', 'batting', 'bowling') for path in compact_loader.find_season_csvs(table_name, seasons).values()]
+    return StageManifest("roster", outputs=[ROSTER_CSV_PATH], inputs=inputs, code_files=[__file__, compact_loader.__file__], config={'seasons': seasons})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    stage_manifest = _stage_manifest(sys.argv[1:] or None)
+    if SKIP_IF_UP_TO_DATE and stage_manifest.is_up_to_date():
+        print(f"Scorecards unchanged, {ROSTER_CSV_PATH} is up to date ({stage_manifest.path})."); sys.exit(0)
+    roster = derive_roster(sys.argv[1:] or None)
+    os.makedirs(os.path.dirname(ROSTER_CSV_PATH), exist_ok=True)
+    roster.to_csv(ROSTER_CSV_PATH, index=False, encoding='utf-8-sig')
+    stage_manifest.record()
+    print(f"{len(roster)} players -> {ROSTER_CSV_PATH} ({batch_count(len(roster), DEFAULT_BATCH_SIZE)} batches of {DEFAULT_BATCH_SIZE})")
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+One cached season-summary service for every script that needs a season's match list.
+
+all_season_match_result.py and every Match_Scorecard/<season>.py (Stage 1) used to
+load and parse the same team-match-results page with their own copy of the parser.
+Both now call get_season_summary(trophy, season, fetch_page): the page is parsed
+here, once, and the parsed rows are cached per (trophy, season):
+
+    Season_Summary_Cache/trophy=<trophy>/<season>.csv    parsed rows (text, as on the page)
+    Season_Summary_Cache/trophy=<trophy>/<season>.json   when fetched, URL, row count, complete?
+
+A season that was already complete when it was fetched (pipeline_manifest.season_is_complete)
+never changes again and is served from the cache for good. The in-progress season is
+re-fetched once its copy is older than IN_PROGRESS_MAX_AGE_HOURS. If a fetch fails or
+the page parses to nothing, the previous copy (if any) is served instead.
+
+fetch_page(url) -> html or None is the caller's: the scripts pass their browser
+(fetch_with_driver) and may archive the page. On a cache hit it is never called,
+so a full backfill over cached seasons needs no browser at all.
+
+    import season_summary
+    summary = season_summary.get_season_summary('117', '2024', lambda url: season_summary.fetch_with_driver(driver, url))
+
+`python season_summary.py` lists what is cached.
+"""
+import glob
+import json
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime
+import pandas as pd
+from bs4 import BeautifulSoup, Tag
+from error_sink import LayoutBrokenError
+from pipeline_manifest import season_is_complete
+
+try:
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+except ImportError: # Only fetch_with_driver needs it; reading the cache does not
+    TimeoutException = By = EC = WebDriverWait = None
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(REPO_ROOT, "Season_Summary_Cache")
+IN_PROGRESS_MAX_AGE_HOURS = 6
+SEASON_URL_TEMPLATE = 'https://www.espncricinfo.com/records/season/team-match-results/{season_url_part}-{season_url_part}?trophy={trophy_id}'
+CONTAINER_SELECTOR = '#main-container div.ds-relative div div.ds-grow > div:nth-child(2) > div > div:nth-child(1)'
+TABLE_SELECTOR = 'div.ds-overflow-x-auto > table'
+COL_INDICES = {'Team 1': 1, 'Team 2': 2, 'Winner': 3, 'Margin': 4, 'Ground': 5, 'Match Date': 6, 'Scorecard': 7}
+SUMMARY_COLUMNS = ['Season', 'Match ID', 'Team 1', 'Team 2', 'Winner', 'Net Margin', 'Margin Type', 'Ground Name', 'Ground ID', 'Match Date', 'Scorecard Link', 'Margin Raw']
+NUMERIC_COLUMNS = ['Net Margin', 'Ground ID', 'Match ID']
+WAIT_TIME = 40
+TABLE_FIND_RETRIES = 3
+TABLE_FIND_DELAY = 2
+
+
+# --- URL and Parsing ---
+def season_url_part(season: str) -> str:
+    """'2024' -> '2024', '2007/08' -> '2007to08' (the URL repeats it: .../2024-2024?trophy=117)."""
+    return str(season).replace('/', 'to')
+
+def season_url(trophy_id, season: str) -> str:
+    return SEASON_URL_TEMPLATE.format(season_url_part=season_url_part(season), trophy_id=trophy_id)
+
+def safe_get_text(element, default=pd.NA):
+    if isinstance(element, Tag):
+        text = element.get_text(strip=True)
+        return text if text else default
+    if isinstance(element, str):
+        text = element.strip()
+        return text if text else default
+    return default
+
+def parse_margin(margin_string):
+    """'5 wickets' -> (5, 'wickets'); anything else -> (NA, the raw text)."""
+    if pd.isna(margin_string) or margin_string == '-': return pd.NA, pd.NA
+    match = re.match(r"(\d+)\s+(runs|wickets|wicket|run)", margin_string, re.IGNORECASE)
+    if not match:
+        return pd.NA, margin_string
+    margin_type = match.group(2).lower()
+    return int(match.group(1)), {'wicket': 'wickets', 'run': 'runs'}.get(margin_type, margin_type)
+
+def extract_id_from_href(element, id_type: str):
+    """(href, Ground or Match ID) from the first link in a cell."""
+    if not isinstance(element, Tag): return pd.NA, pd.NA
+    link_tag = element.find('a', href=True)
+    if not link_tag: return pd.NA, pd.NA
+    href = link_tag['href']
+    match = re.search(r"-(\d+)$", href) if id_type == 'Ground' else re.search(r"-(\d+)/[^/]+$", href)
+    if not match:
+        logging.warning(f"Could not extract {id_type} ID pattern from href: {href}")
+        return href, pd.NA
+    return href, match.group(1)
+
+def find_results_table(page_soup: BeautifulSoup) -> Tag | None:
+    container_div = page_soup.select_one(CONTAINER_SELECTOR)
+    return (container_div or page_soup).select_one(TABLE_SELECTOR)
+
+def parse_season_summary_page(page_html: str, season: str, parse_errors=None) -> list:
+    """
+    One record per match row of a team-match-results page. Rows without a Match ID or scorecard
+    link (messages, 'no result' placeholders) are skipped. Row failures go to parse_errors (a ParseErrorSink) if given.
+    """
+    results_table = find_results_table(BeautifulSoup(page_html, 'lxml'))
+    table_body = results_table.find('tbody') if results_table else None
+    if table_body is None:
+        logging.error(f"Season {season}: results table (tbody) not found on the page.")
+        return []
+    max_col_index = max(COL_INDICES.values())
+    records = []
+    for i, row in enumerate(table_body.find_all('tr', recursive=False)):
+        try:
+            cols = row.find_all('td', recursive=False)
+            if len(cols) < max_col_index or 'no result' in str(safe_get_text(cols[0], default='')).lower():
+                logging.debug(f"Season {season}: skipping non-data row {i + 1}.")
+                continue
+            margin_text = safe_get_text(cols[COL_INDICES['Margin'] - 1])
+            net_margin, margin_type = parse_margin(margin_text)
+            ground_cell = cols[COL_INDICES['Ground'] - 1]
+            scorecard_href, match_id = extract_id_from_href(cols[COL_INDICES['Scorecard'] - 1], 'Match')
+            if pd.isna(match_id) or pd.isna(scorecard_href):
+                logging.warning(f"Season {season}: skipping row {i + 1}, missing Match ID ('{match_id}') or scorecard link ('{scorecard_href}').")
+                continue
+            records.append({
+                'Season': season, 'Match ID': match_id,
+                'Team 1': safe_get_text(cols[COL_INDICES['Team 1'] - 1]), 'Team 2': safe_get_text(cols[COL_INDICES['Team 2'] - 1]),
+                'Winner': safe_get_text(cols[COL_INDICES['Winner'] - 1]), 'Net Margin': net_margin, 'Margin Type': margin_type,
+                'Ground Name': safe_get_text(ground_cell.find('a'), default=safe_get_text(ground_cell)),
+                'Ground ID': extract_id_from_href(ground_cell, 'Ground')[1],
+                'Match Date': safe_get_text(cols[COL_INDICES['Match Date'] - 1]), 'Scorecard Link': scorecard_href, 'Margin Raw': margin_text,
+            })
+            if parse_errors is not None: parse_errors.record_success()
+        except Exception as e:
+            if parse_errors is None: raise
+            parse_errors.record('season_summary', row, e, f"season {season} row {i + 1}")
+    logging.info(f"Season {season}: parsed {len(records)} matches.")
+    return records
+
+def to_summary_frame(records) -> pd.DataFrame:
+    """Records (or the cached text CSV) -> SUMMARY_COLUMNS with Match Date as datetime and numeric IDs/margins."""
+    frame = pd.DataFrame(records).reindex(columns=SUMMARY_COLUMNS)
+    frame['Match Date'] = pd.to_datetime(frame['Match Date'], errors='coerce')
+    frame[NUMERIC_COLUMNS] = frame[NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    return frame
+
+
+# --- Fetching ---
+def fetch_with_driver(driver, url: str, wait_time: int = WAIT_TIME) -> str | None:
+    """fetch_page for a Selenium driver: waits for the results table (or its container) and returns the page source."""
+    try:
+        driver.get(url)
+        try:
+            WebDriverWait(driver, wait_time).until(EC.visibility_of_element_located((By.CSS_SELECTOR, TABLE_SELECTOR)))
+        except TimeoutException:
+            logging.warning("Timed out waiting for the results table; waiting for its container instead.")
+            WebDriverWait(driver, wait_time).until(EC.visibility_of_element_located((By.CSS_SELECTOR, CONTAINER_SELECTOR)))
+        time.sleep(random.uniform(3.0, 5.0))
+        for attempt in range(TABLE_FIND_RETRIES): # The table can render a moment after its container
+            page_html = driver.page_source
+            if find_results_table(BeautifulSoup(page_html, 'lxml')) is not None or attempt == TABLE_FIND_RETRIES - 1:
+                return page_html
+            logging.warning(f"Results table not in the page yet (attempt {attempt + 1}). Re-reading in {TABLE_FIND_DELAY}s...")
+            time.sleep(TABLE_FIND_DELAY)
+    except TimeoutException:
+        logging.error(f"Timed out waiting for the season summary page: {url}")
+    return None
+
+
+# --- Cache ---
+class SeasonSummaryCache:
+    """Parsed season summaries per (trophy, season); complete seasons are immutable, the in-progress one expires."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, in_progress_max_age_hours: float = IN_PROGRESS_MAX_AGE_HOURS):
+        self.cache_dir = cache_dir
+        self.in_progress_max_age_hours = in_progress_max_age_hours
+
+    def _paths(self, trophy_id, season: str) -> tuple:
+        stem = os.path.join(self.cache_dir, f"trophy={trophy_id}", str(season).replace('/', '-'))
+        return f"{stem}.csv", f"{stem}.json"
+
+    def csv_path(self, trophy_id, season: str) -> str:
+        return self._paths(trophy_id, season)[0]
+
+    def metadata(self, trophy_id, season: str) -> dict | None:
+        csv_path, meta_path = self._paths(trophy_id, season)
+        if not (os.path.exists(csv_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def is_fresh(self, trophy_id, season: str, now: datetime | None = None) -> bool:
+        meta = self.metadata(trophy_id, season)
+        if meta is None:
+            return False
+        if meta.get('complete'):
+            return True
+        age_hours = ((now or datetime.now()) - datetime.fromisoformat(meta['fetched_at'])).total_seconds() / 3600
+        return age_hours < self.in_progress_max_age_hours
+
+    def load(self, trophy_id, season: str) -> pd.DataFrame | None:
+        csv_path, _ = self._paths(trophy_id, season)
+        if self.metadata(trophy_id, season) is None:
+            return None
+        return to_summary_frame(pd.read_csv(csv_path, dtype=str, keep_default_na=False, na_values=[''], encoding='utf-8-sig'))
+
+    def store(self, trophy_id, season: str, records: list, url: str):
+        csv_path, meta_path = self._paths(trophy_id, season)
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        fetched_at = datetime.now()
+        pd.DataFrame(records).reindex(columns=SUMMARY_COLUMNS).to_csv(f"{csv_path}.tmp", index=False, encoding='utf-8-sig')
+        os.replace(f"{csv_path}.tmp", csv_path)
+        meta = {'trophy': str(trophy_id), 'season': season, 'url': url, 'matches': len(records),
+                'fetched_at': fetched_at.isoformat(timespec='seconds'), 'complete': season_is_complete(season, fetched_at)}
+        with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(f"{meta_path}.tmp", meta_path) # Written last: a CSV without its JSON is not served
+
+    def get(self, trophy_id, season: str, fetch_page, parse_errors=None, refresh: bool = False) -> pd.DataFrame:
+        """The season's summary (SUMMARY_COLUMNS), from the cache when fresh, else fetched, parsed and cached."""
+        if not refresh and self.is_fresh(trophy_id, season):
+            summary = self.load(trophy_id, season)
+            logging.info(f"Season summary {season} (trophy {trophy_id}): {len(summary)} matches from the cache.")
+            return summary
+        url = season_url(trophy_id, season)
+        logging.info(f"Season summary {season} (trophy {trophy_id}): fetching {url}")
+        records = []
+        try:
+            page_html = fetch_page(url)
+            records = parse_season_summary_page(page_html, season, parse_errors) if page_html else []
+        except LayoutBrokenError:
+            raise
+        except Exception as e:
+            logging.error(f"Season summary {season}: fetch failed: {e}", exc_info=True)
+        if records:
+            self.store(trophy_id, season, records, url)
+            return to_summary_frame(records)
+        stale = self.load(trophy_id, season)
+        if stale is not None:
+            logging.warning(f"Season summary {season}: nothing fetched, serving the cached copy from {self.metadata(trophy_id, season)['fetched_at']}.")
+            return stale
+        return to_summary_frame([])
+
+    def entries(self) -> list:
+        """Metadata of every cached season."""
+        entries = []
+        for path in sorted(glob.glob(os.path.join(self.cache_dir, "trophy=*", "*.json"))):
+            with open(path, 'r', encoding='utf-8') as f:
+                entries.append(json.load(f))
+        return entries
+
+
+_default_cache = SeasonSummaryCache()
+
+def get_season_summary(trophy_id, season: str, fetch_page, parse_errors=None, refresh: bool = False) -> pd.DataFrame:
+    """SeasonSummaryCache.get on the shared cache under CACHE_DIR."""
+    return _default_cache.get(trophy_id, season, fetch_page, parse_errors, refresh)
+
+def cached_summary_path(trophy_id, season: str) -> str:
+    """Where the shared cache keeps the season's summary CSV (a scorecard run's input)."""
+    return _default_cache.csv_path(trophy_id, season)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for entry in _default_cache.entries():
+        state = 'complete' if entry.get('complete') else 'in progress'
+        print(f"trophy {entry['trophy']} season {entry['season']}: {entry['matches']} matches, fetched {entry['fetched_at']} ({state})")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Change sets between scrape runs.
+
+A re-run used to overwrite its CSV, leaving downstream jobs no way to tell what
+changed. After a scraper writes its CSV, record_csv_snapshot() compares it with
+the previous run's snapshot and writes a change set:
+
+    Snapshots/<dataset>/changes_<timestamp>.csv   '_change' = insert | update | delete, then the row
+    Snapshots/<dataset>/changes_latest.csv        copy of the newest change set
+
+Rows are matched on their natural key (a keyed_upsert.RecordKey or a list of
+key columns). The previous snapshot is not a second copy of the data, only one
+64-bit hash per key (Snapshots/<dataset>/fingerprints.csv), so the comparison is
+a hash join on keys plus an integer compare, not a full-frame diff. Deleted rows
+carry their key columns only.
+"""
+import glob
+import logging
+import os
+import re
+import shutil
+from datetime import datetime
+import pandas as pd
+from keyed_upsert import RecordKey
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(REPO_ROOT, "Snapshots")
+CHANGE_SETS_KEPT = 20 # Older timestamped change sets per dataset are pruned
+CHANGE_COLUMN = '_change'
+KEY_SEPARATOR = '\x1f'
+
+
+def _as_record_key(key) -> RecordKey:
+    return key if isinstance(key, RecordKey) else RecordKey(list(key))
+
+def dataset_dir(dataset: str, root: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(root, *[re.sub(r'[^A-Za-z0-9_.-]+', '_', part) for part in dataset.split('/')])
+
+
+# --- Fingerprints ---
+def row_fingerprints(df: pd.DataFrame, key) -> pd.DataFrame:
+    """
+    One row per keyed row of df: '_key' (joined natural-key parts), '_hash' (uint64 hash of all columns)
+    and the key columns. Values are hashed as stripped text so a row read back from CSV hashes
+    the same way every run.
+    """
+    key = _as_record_key(key)
+    key_cols = [c for c in key.source_columns() if c in df.columns]
+    record_keys = [key(record) for record in df[key_cols].to_dict('records')]
+    keyed = [k is not None for k in record_keys]
+    if not all(keyed): # Rows with no player id and no name cannot be matched across snapshots
+        logging.warning(f"Snapshot: skipping {keyed.count(False)} rows with neither {key.id_column} nor {key.name_column}.")
+        df = df[keyed]
+    keys = [KEY_SEPARATOR.join(str(part) for part in k) for k in record_keys if k is not None]
+    text = df.astype('string').fillna('').apply(lambda col: col.str.strip())
+    fingerprints = pd.DataFrame({'_key': keys, '_hash': pd.util.hash_pandas_object(text, index=False).values})
+    for col in key_cols: fingerprints[col] = df[col].values
+    return fingerprints
+
+def _last_per_key(fingerprints: pd.DataFrame) -> pd.Series:
+    """Mask keeping the last row of each key (same rule as keyed_upsert)."""
+    keep = ~fingerprints['_key'].duplicated(keep='last')
+    if not keep.all():
+        logging.warning(f"Snapshot: {int((~keep).sum())} rows share a natural key with a later row; the later row is used.")
+    return keep
+
+
+# --- Diffing ---
+def diff_fingerprints(previous: pd.DataFrame | None, current: pd.DataFrame) -> dict:
+    """Returns {'insert': keys, 'update': keys, 'delete': previous rows (key columns)}."""
+    if previous is None or previous.empty:
+        return {'insert': list(current['_key']), 'update': [], 'delete': previous.iloc[0:0] if previous is not None else pd.DataFrame()}
+    previous_hash = dict(zip(previous['_key'], previous['_hash'].astype(str))) # Hashes round-trip through CSV as text
+    current_hash = dict(zip(current['_key'], current['_hash'].astype(str)))
+    inserted = [k for k in current_hash if k not in previous_hash]
+    updated = [k for k, h in current_hash.items() if k in previous_hash and previous_hash[k] != h]
+    deleted = previous[~previous['_key'].isin(list(current_hash))]
+    return {'insert': inserted, 'update': updated, 'delete': deleted}
+
+def _prune_change_sets(directory: str):
+    change_sets = sorted(glob.glob(os.path.join(directory, "changes_2*.csv")))
+    for old_path in change_sets[:-CHANGE_SETS_KEPT]:
+        os.remove(old_path)
+
+def record_snapshot(dataset: str, df: pd.DataFrame, key, root: str = SNAPSHOT_DIR) -> dict | None:
+    """
+    Diffs df against the dataset's previous snapshot, writes the change set and makes df the new snapshot.
+    Returns {'insert': n, 'update': n, 'delete': n, 'path': change set path}. Never raises.
+    """
+    try:
+        directory = dataset_dir(dataset, root)
+        os.makedirs(directory, exist_ok=True)
+        fingerprint_path = os.path.join(directory, "fingerprints.csv")
+        previous = pd.read_csv(fingerprint_path, dtype=str, keep_default_na=False, encoding='utf-8') if os.path.exists(fingerprint_path) else None
+        fingerprints = row_fingerprints(df, key)
+        keep = _last_per_key(fingerprints)
+        current = fingerprints[keep].reset_index(drop=True)
+        rows = df[keep.values].assign(_key=current['_key'].values).reset_index(drop=True)
+        changes = diff_fingerprints(previous, current)
+
+        change_kind = {k: 'insert' for k in changes['insert']}; change_kind.update({k: 'update' for k in changes['update']})
+        changed_rows = rows[rows['_key'].isin(list(change_kind))].copy()
+        changed_rows.insert(0, CHANGE_COLUMN, changed_rows['_key'].map(change_kind))
+        deleted_rows = changes['delete'].drop(columns=['_hash'], errors='ignore').copy()
+        deleted_rows.insert(0, CHANGE_COLUMN, 'delete')
+        change_set = pd.concat([changed_rows, deleted_rows], ignore_index=True).drop(columns=['_key'], errors='ignore')
+        change_set = change_set.reindex(columns=[CHANGE_COLUMN] + list(df.columns))
+
+        change_path = os.path.join(directory, f"changes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        change_set.to_csv(change_path, index=False, encoding='utf-8-sig')
+        shutil.copyfile(change_path, os.path.join(directory, "changes_latest.csv"))
+        current.to_csv(fingerprint_path, index=False, encoding='utf-8')
+        _prune_change_sets(directory)
+        summary = {'insert': len(changes['insert']), 'update': len(changes['update']), 'delete': len(changes['delete']), 'path': change_path}
+        logging.info(f"Snapshot {dataset}: {summary['insert']} inserted, {summary['update']} updated, {summary['delete']} deleted -> {change_path}")
+        return summary
+    except Exception as e:
+        logging.error(f"Snapshot diff failed for '{dataset}': {e}", exc_info=True)
+        return None
+
+def record_csv_snapshot(dataset: str, csv_path: str, key, root: str = SNAPSHOT_DIR) -> dict | None:
+    """record_snapshot() for a CSV a scraper just wrote (read as text, so values compare exactly as written)."""
+    if not os.path.exists(csv_path):
+        logging.warning(f"Snapshot {dataset}: {csv_path} not found, no change set written.")
+        return None
+    return record_snapshot(dataset, pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding='utf-8-sig'), key, root)
+
+def load_latest_changes(dataset: str, root: str = SNAPSHOT_DIR) -> pd.DataFrame:
+    """The newest change set for a dataset (empty frame if none yet)."""
+    path = os.path.join(dataset_dir(dataset, root), "changes_latest.csv")
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig') if os.path.exists(path) else pd.DataFrame(columns=[CHANGE_COLUMN])
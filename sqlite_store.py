@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Embedded SQLite store for the scraped tables (no server, one file).
+
+Every table has a natural key; re-scraped rows are upserted on it
+(INSERT ... ON CONFLICT DO UPDATE), so running a season or a player list again
+refreshes rows instead of duplicating them. Scorecard rows are keyed on the
+player id, like keyed_upsert.BATTING_KEY / BOWLING_KEY: a derived 'Player Key'
+column holds the id, or 'name:<player>' only when the id could not be parsed,
+so a renamed or re-spelt player does not get a second row. Lookup columns
+(Match ID, Batter id, Bowler id, Player ID, Ground ID) are indexed, so fetching
+one match or one player's rows is a millisecond query instead of a full CSV load.
+
+Column names are the CSV headers, quoted, so the same names work in pandas and SQL:
+    SELECT * FROM batting WHERE "Batter id" = ?
+
+Types come from the warehouse schemas (parquet_warehouse.TABLE_SCHEMAS); values are
+conformed with the same rules before they are written.
+"""
+import logging
+import os
+import sqlite3
+import pandas as pd
+from keyed_upsert import BATTING_KEY, BOWLING_KEY
+from parquet_warehouse import TABLE_SCHEMAS, conform_to_schema
+
+# --- Configuration ---
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+STORE_PATH = os.path.join(REPO_ROOT, "Store", "ipl_stats.sqlite")
+
+STORE_SCHEMAS = dict(TABLE_SCHEMAS)
+STORE_SCHEMAS['team_codes'] = {'Team ID': 'int64', 'Team Name': 'str'}
+# Scorecard tables: 'Player Key' is derived from the id (name only as a fallback) with these record keys
+PLAYER_KEY_COLUMN = 'Player Key'
+PLAYER_KEYS = {'batting': BATTING_KEY, 'bowling': BOWLING_KEY}
+for _table_name in PLAYER_KEYS:
+    STORE_SCHEMAS[_table_name] = {**TABLE_SCHEMAS[_table_name], PLAYER_KEY_COLUMN: 'str'}
+
+# Natural key per table: what identifies "the same row" when it is scraped again
+NATURAL_KEYS = {
+    'match_summary': ['Match ID'],
+    'batting': ['Match ID', 'Innings', PLAYER_KEY_COLUMN],
+    'bowling': ['Match ID', 'Innings', PLAYER_KEY_COLUMN],
+    'career_batting': ['Player ID', 'Format'],
+    'career_bowling': ['Player ID', 'Format'],
+    'innings_batting': ['Player ID', 'Start Date', 'Inns', 'Opposition'],
+    'innings_bowling': ['Player ID', 'Start Date', 'Inns', 'Opposition'],
+    'career_fielding': ['Player ID', 'Format'],
+    'team_codes': ['Team ID'],
+}
+# Secondary indexes for point lookups
+LOOKUP_INDEXES = {
+    'match_summary': [['Ground ID'], ['Season']],
+    'batting': [['Batter id'], ['Match ID']],
+    'bowling': [['Bowler id'], ['Match ID']],
+    'career_batting': [['Player ID']],
+    'career_bowling': [['Player ID']],
+    'innings_batting': [['Player ID'], ['Ground']],
+    'innings_bowling': [['Player ID'], ['Ground']],
+    'career_fielding': [['Player ID']],
+    'team_codes': [],
+}
+_SQL_TYPES = {'str': 'TEXT', 'date': 'TEXT', 'float32': 'REAL', 'int16': 'INTEGER', 'int32': 'INTEGER', 'int64': 'INTEGER'}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# --- Connection / Schema ---
+def connect(db_path: str = STORE_PATH) -> sqlite3.Connection:
+    """Opens (and if needed creates) the store."""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL") # Readers are not blocked while a scraper writes
+    conn.execute("PRAGMA synchronous=NORMAL")
+    create_schema(conn)
+    return conn
+
+def create_schema(conn: sqlite3.Connection):
+    with conn:
+        for table_name, schema in STORE_SCHEMAS.items():
+            column_defs = ', '.join(f"{_quote(col)} {_SQL_TYPES[kind]}" for col, kind in schema.items())
+            key_def = ', '.join(_quote(col) for col in NATURAL_KEYS[table_name])
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({column_defs}, PRIMARY KEY ({key_def}))")
+            for index_cols in LOOKUP_INDEXES[table_name]:
+                index_name = f"idx_{table_name}_" + '_'.join(c.lower().replace(' ', '_') for c in index_cols)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({', '.join(_quote(c) for c in index_cols)})")
+
+
+# --- Writing ---
+def _with_player_key(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """Adds the derived 'Player Key' column (player id, or 'name:<player>' without one; None when neither is known)."""
+    key = PLAYER_KEYS[table_name]
+    record_keys = map(key, df[[key.id_column, key.name_column]].to_dict('records'))
+    return df.assign(**{PLAYER_KEY_COLUMN: [k[-1] if k is not None else None for k in record_keys]})
+
+def _to_sql_value(value):
+    if value is None or pd.isna(value): # None, NaN, pd.NA and NaT
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'): # numpy scalar -> Python scalar
+        return value.item()
+    return value
+
+def upsert_dataframe(conn: sqlite3.Connection, table_name: str, df: pd.DataFrame) -> int:
+    """
+    Upserts df into a table in one transaction. Rows missing any natural-key value are skipped.
+    Returns the number of rows written.
+    """
+    if df is None or df.empty:
+        return 0
+    schema = STORE_SCHEMAS[table_name]; key_cols = NATURAL_KEYS[table_name]
+    conformed = conform_to_schema(df, table_name) if table_name in TABLE_SCHEMAS else df.reindex(columns=list(schema))
+    if table_name in PLAYER_KEYS:
+        conformed = _with_player_key(conformed, table_name)
+    missing_key = conformed[key_cols].isna().any(axis=1)
+    if missing_key.any():
+        logging.warning(f"Store {table_name}: skipping {int(missing_key.sum())} rows with a missing natural key {key_cols}.")
+        conformed = conformed[~missing_key]
+    columns = list(schema)
+    update_cols = [c for c in columns if c not in key_cols]
+    sql = (f"INSERT INTO {table_name} ({', '.join(_quote(c) for c in columns)}) VALUES ({', '.join('?' * len(columns))}) "
+           f"ON CONFLICT ({', '.join(_quote(c) for c in key_cols)}) DO UPDATE SET "
+           + ', '.join(f"{_quote(c)} = excluded.{_quote(c)}" for c in update_cols))
+    rows = [tuple(_to_sql_value(v) for v in record) for record in conformed[columns].itertuples(index=False, name=None)]
+    with conn: # One transaction: either the whole batch lands or none of it
+        conn.executemany(sql, rows)
+    return len(rows)
+
+def store_dataframe(table_name: str, df: pd.DataFrame, db_path: str = STORE_PATH) -> int:
+    """Convenience wrapper for the scrapers: open, upsert, close. Never raises."""
+    try:
+        conn = connect(db_path)
+        try:
+            written = upsert_dataframe(conn, table_name, df)
+        finally:
+            conn.close()
+        logging.info(f"Store {table_name}: upserted {written} rows into {db_path}")
+        return written
+    except Exception as e:
+        logging.error(f"SQLite store write failed for '{table_name}': {e}", exc_info=True)
+        return 0
+
+
+# --- Reading ---
+def fetch(conn: sqlite3.Connection, table_name: str, where: dict | None = None, columns: list | None = None) -> pd.DataFrame:
+    """
+    Equality lookup, e.g. fetch(conn, 'batting', {'Batter id': 253802}).
+    Uses the natural-key / lookup indexes when the filtered columns have one.
+    """
+    select_cols = ', '.join(_quote(c) for c in columns) if columns else '*'
+    sql = f"SELECT {select_cols} FROM {table_name}"
+    params = []
+    if where:
+        sql += " WHERE " + ' AND '.join(f"{_quote(col)} = ?" for col in where)
+        params = [_to_sql_value(v) for v in where.values()]
+    return pd.read_sql_query(sql, conn, params=params)
+
+def player_performances(conn: sqlite3.Connection, player_id) -> dict:
+    """All scorecard batting/bowling rows and career rows for one player ID."""
+    player_id = int(player_id)
+    return {
+        'batting': fetch(conn, 'batting', {'Batter id': player_id}),
+        'bowling': fetch(conn, 'bowling', {'Bowler id': player_id}),
+        'career_batting': fetch(conn, 'career_batting', {'Player ID': player_id}),
+        'career_bowling': fetch(conn, 'career_bowling', {'Player ID': player_id}),
+        'innings_batting': fetch(conn, 'innings_batting', {'Player ID': player_id}),
+    }
+
+def match_details(conn: sqlite3.Connection, match_id) -> dict:
+    """Summary, batting and bowling rows for one Match ID."""
+    match_id = int(match_id)
+    return {table_name: fetch(conn, table_name, {'Match ID': match_id}) for table_name in ('match_summary', 'batting', 'bowling')}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Statsguru format classes for the player engine pages.
+
+The engine scrapers used to hard-code class=6 into their URLs. STAT_FORMATS names
+each T20 record set a model can ask for:
+
+    t20    class=6              every T20 the player has played (what the CSVs always held)
+    t20i   class=3              T20 internationals only
+    ipl    class=6;trophy=117   IPL matches only
+
+Outputs are partitioned by format. The default format keeps the original CSV paths
+(career_batting_averages.csv, ...), and every other format writes beside it with a
+suffix (career_batting_averages_ipl.csv). In the Parquet warehouse the engine
+tables are partitioned by format=<t20|t20i|ipl> (see parquet_warehouse), so an
+IPL-only row is never mixed up with a trophy=117 scorecard partition. Career rows of a non-default format carry
+the format label in 'Format' ('IPL', 'T20I') because the engine labels the filtered
+summary row like the unfiltered one, and 'Format' is part of the career tables' key.
+
+    from stat_formats import load_stat_table
+    priors = load_stat_table('career_batting', formats=['ipl', 't20'])   # adds 'Stat Format'
+"""
+import logging
+import os
+import pandas as pd
+import compact_loader
+import parquet_warehouse
+
+# --- Configuration ---
+STAT_FORMATS = {
+    't20': {'query': 'class=6', 'label': 'T20s'},
+    't20i': {'query': 'class=3', 'label': 'T20I'},
+    'ipl': {'query': 'class=6;trophy=117', 'label': 'IPL'},
+}
+DEFAULT_FORMAT = parquet_warehouse.DEFAULT_STAT_FORMAT
+CAREER_TABLES = ('career_batting', 'career_bowling', 'career_fielding')
+
+
+def format_query(stat_format: str) -> str:
+    """Engine URL parameters selecting the format, e.g. 'class=6;trophy=117'."""
+    return STAT_FORMATS[stat_format]['query']
+
+def format_path(path: str, stat_format: str) -> str:
+    """The default format's path unchanged, '<name>_<format>.csv' beside it for the others."""
+    if stat_format == DEFAULT_FORMAT:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{stat_format}{ext}"
+
+def csv_path(table_name: str, stat_format: str) -> str:
+    """Output CSV of an engine table (compact_loader.ENGINE_CSV_PATHS) for one format."""
+    return format_path(compact_loader.ENGINE_CSV_PATHS[table_name], stat_format)
+
+def label_rows(rows: list, table_name: str, stat_format: str) -> list:
+    """Sets 'Format' on career rows of a non-default format (see module docstring); other rows are returned as they are."""
+    if stat_format == DEFAULT_FORMAT or table_name not in CAREER_TABLES:
+        return rows
+    return [{**row, 'Format': STAT_FORMATS[stat_format]['label']} for row in rows]
+
+
+# --- Loading ---
+def load_stat_table(table_name: str, formats: list | None = None, columns: list | None = None, seasons: list | None = None) -> pd.DataFrame:
+    """
+    The requested formats (default: DEFAULT_FORMAT) of an engine table with a 'Stat Format' column.
+    Reads only those formats' format= warehouse partitions when pyarrow is installed, otherwise only their
+    CSVs (`seasons` prunes the innings tables' year partitions and is ignored for the CSVs).
+    """
+    formats = formats or [DEFAULT_FORMAT]
+    if parquet_warehouse.warehouse_available():
+        read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ['format']))
+        table = parquet_warehouse.load_table(table_name, read_columns, seasons=seasons, formats=formats)
+        table['Stat Format'] = table['format'] if 'format' in table.columns else pd.NA
+        return table.drop(columns=[c for c in ['format'] if c not in (columns or [])])
+    frames = []
+    for stat_format in formats:
+        path = csv_path(table_name, stat_format)
+        if not os.path.exists(path):
+            logging.warning(f"No {table_name} data for format '{stat_format}' at {path}.")
+            continue
+        frame = compact_loader.load_csv(path, table_name, report=False)
+        frames.append((frame if columns is None else frame.reindex(columns=[c for c in columns if c not in ('format', 'season')])).assign(**{'Stat Format': stat_format}))
+    table = compact_loader.concat_compact(frames)
+    return table if not table.empty else pd.DataFrame(columns=(columns or list(compact_loader.COMPACT_SCHEMAS[table_name])) + ['Stat Format'])
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming table writer for the scrapers.
+
+Instead of collecting every record of a crawl in a list and writing one CSV at
+the end, a scraper hands each page's records to a StreamingTableWriter. The
+writer buffers at most `batch_size` rows, then applies the column order and
+type cleaning the scripts used to do on the final DataFrame and appends the
+batch to disk. Memory stays flat however long the crawl runs, and the output
+on disk is always a valid, readable file holding everything flushed so far.
+
+Formats:
+    'csv'     - one file; the first batch writes the header (utf-8-sig, as before), later batches append.
+    'parquet' - a directory with one part file per batch (a Parquet file is only readable once
+                closed, so each batch is its own closed file); needs pyarrow.
+
+An optional `on_flush` callback receives every cleaned batch (e.g. to upsert it
+into the SQLite store while the crawl is still running).
+
+With a `key` (keyed_upsert.RecordKey) a repeated key replaces the earlier row,
+last write wins: in the buffer that is an in-place swap; for a row already on
+disk the update is held back and merged into the file once, on close().
+
+A run that refreshes an existing CSV streams into a side file instead
+(side_file_path) and merges it in by key when it is done (merge_side_file), so
+an aborted run never truncates the complete file it was refreshing.
+"""
+import logging
+import os
+import pandas as pd
+from keyed_upsert import KeyedTable, RecordKey, merge_into_csv
+
+# --- Configuration ---
+DEFAULT_BATCH_SIZE = 250 # Rows buffered before a flush
+NULL_PLACEHOLDERS = ['-', 'N/A', '']
+
+
+class StreamingTableWriter:
+    """Appends records to a CSV file (or Parquet part files) in fixed-size batches."""
+
+    def __init__(self, path: str, columns: list, batch_size: int = DEFAULT_BATCH_SIZE, file_format: str = 'csv',
+                 int_columns: list | None = None, float_columns: list | None = None, date_columns: list | None = None,
+                 key: RecordKey | None = None, on_flush=None, encoding: str = 'utf-8-sig'):
+        """
+        columns: output column order; missing keys become NA, unknown keys are dropped (warned once).
+        int_columns / float_columns: numeric columns ('-', 'N/A', '' -> NA, coerced). Int columns are written
+            without a trailing '.0' (nullable Int64) as long as the batch holds whole numbers only.
+        key: when given, a row whose key was already seen replaces the earlier row (last one wins); a row
+            the key cannot identify (no player id and no name) is logged and dropped.
+        """
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported streaming format: {file_format}")
+        self.path = path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.file_format = file_format
+        self.int_columns = list(int_columns or [])
+        self.float_columns = list(float_columns or [])
+        self.date_columns = list(date_columns or [])
+        self.key = key
+        self.on_flush = on_flush
+        self.encoding = encoding
+        self.rows_written = 0
+        self.rows_replaced = 0
+        self.rows_rejected = 0 # Keyed rows with no player id and no name
+        self.batches_written = 0
+        self._buffer = []
+        self._buffer_index = {} # key -> position in _buffer
+        self._flushed_keys = set()
+        self._late_updates = {} # key -> record, for keys whose row is already on disk
+        self._warned_extra = set()
+        self._closed = False
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # --- Buffering ---
+    def append(self, record: dict):
+        extra = set(record) - set(self.columns) - self._warned_extra
+        if extra:
+            logging.warning(f"Streaming writer {os.path.basename(self.path)}: dropping columns not in the output layout: {sorted(extra)}")
+            self._warned_extra |= extra
+        if self.key:
+            record_key = self.key(record)
+            if record_key is None:
+                self.rows_rejected += 1
+                logging.warning(f"Streaming writer {os.path.basename(self.path)}: rejecting a row with neither {self.key.id_column} nor {self.key.name_column}: {record}")
+                return
+            position = self._buffer_index.get(record_key)
+            if position is not None:
+                self._buffer[position] = record; self.rows_replaced += 1
+                return
+            if record_key in self._flushed_keys:
+                self._late_updates[record_key] = record; self.rows_replaced += 1
+                return
+            self._buffer_index[record_key] = len(self._buffer)
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def extend(self, records):
+        """Adds a page's worth of records; flushes whenever a full batch is buffered."""
+        for record in records:
+            self.append(record)
+
+    # --- Writing ---
+    def _clean_batch(self, records: list) -> pd.DataFrame:
+        batch = pd.DataFrame.from_records(records).reindex(columns=self.columns)
+        for col in self.int_columns + self.float_columns:
+            batch[col] = pd.to_numeric(batch[col].replace(NULL_PLACEHOLDERS, pd.NA), errors='coerce')
+        for col in self.int_columns:
+            values = batch[col].dropna()
+            if (values % 1 == 0).all():
+                batch[col] = batch[col].astype('Int64')
+        for col in self.date_columns:
+            batch[col] = pd.to_datetime(batch[col], errors='coerce')
+        return batch
+
+    def flush(self):
+        """Writes the buffered rows (if any) and clears the buffer."""
+        if not self._buffer:
+            return
+        batch = self._clean_batch(self._buffer)
+        self._buffer = []
+        self._flushed_keys.update(self._buffer_index); self._buffer_index = {}
+        if self.file_format == 'csv':
+            first_batch = self.batches_written == 0
+            # The BOM belongs at the start of the file only, so appends use plain utf-8
+            batch.to_csv(self.path, mode='w' if first_batch else 'a', header=first_batch, index=False,
+                         encoding=self.encoding if first_batch else 'utf-8')
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            if self.batches_written == 0: # Start clean: stale parts from a previous run would be read back too
+                for name in os.listdir(self.path):
+                    if name.startswith('part-') and name.endswith('.parquet'): os.remove(os.path.join(self.path, name))
+            batch.to_parquet(os.path.join(self.path, f"part-{self.batches_written:05d}.parquet"), index=False)
+        self.batches_written += 1
+        self.rows_written += len(batch)
+        logging.debug(f"Streaming writer {os.path.basename(self.path)}: flushed {len(batch)} rows ({self.rows_written} total).")
+        if self.on_flush:
+            try: self.on_flush(batch)
+            except Exception as e: logging.error(f"on_flush callback failed for {self.path}: {e}", exc_info=True)
+
+    def _apply_late_updates(self):
+        """Merges updates for rows that were already flushed into the file on disk (one rewrite)."""
+        updates = self._clean_batch(list(self._late_updates.values()))
+        self._late_updates = {}
+        if self.file_format == 'csv':
+            merge_into_csv(self.path, updates.to_dict('records'), self.key, self.columns, self.encoding)
+        else:
+            part_paths = sorted(os.path.join(self.path, n) for n in os.listdir(self.path) if n.startswith('part-') and n.endswith('.parquet'))
+            table = KeyedTable.from_frame(pd.concat([pd.read_parquet(p) for p in part_paths], ignore_index=True), self.key)
+            table.upsert_many(updates.to_dict('records'))
+            merged = self._clean_batch(table.rows)
+            tmp_path = os.path.join(self.path, "merged.parquet.tmp")
+            merged.to_parquet(tmp_path, index=False)
+            for part_path in part_paths: os.remove(part_path)
+            os.replace(tmp_path, os.path.join(self.path, "part-00000.parquet"))
+        logging.info(f"Streaming writer {os.path.basename(self.path)}: merged {len(updates)} updates into rows already on disk.")
+        if self.on_flush:
+            try: self.on_flush(updates)
+            except Exception as e: logging.error(f"on_flush callback failed for {self.path}: {e}", exc_info=True)
+
+    def close(self) -> int:
+        """Flushes the remainder (and merges late updates). Returns the total rows written. Safe to call more than once."""
+        if not self._closed:
+            self.flush()
+            if self._late_updates: self._apply_late_updates()
+            self._closed = True
+            if self.rows_replaced:
+                logging.info(f"Streaming writer {os.path.basename(self.path)}: {self.rows_replaced} rows replaced by a later row with the same key.")
+        return self.rows_written
+
+
+# --- Side Files ---
+def side_file_path(path: str) -> str:
+    """Where a run streams rows meant for `path` until it is over: '<name>.partial<ext>' beside it."""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.partial{ext}"
+
+def merge_side_file(side_path: str, path: str, key: RecordKey, columns: list) -> int:
+    """
+    Upserts a closed side file into the CSV at `path` by key (keyed_upsert.merge_into_csv) and removes it,
+    so rows already in `path` that the run did not reach are kept. Returns the row count of `path`.
+    """
+    if not os.path.exists(side_path):
+        return 0
+    rows = pd.read_csv(side_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    total_rows = merge_into_csv(path, rows.to_dict('records'), key, columns)
+    os.remove(side_path)
+    return total_rows
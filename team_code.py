@@ -10,41 +10,55 @@ from selenium.common.exceptions import (
 )
 from bs4 import BeautifulSoup, Tag
 import pandas as pd
-from urllib.parse import urljoin, urlparse, parse_qs # Ensure parse_qs is imported
+from urllib.parse import urlparse, parse_qs # Ensure parse_qs is imported
 import traceback
 from datetime import datetime
 import re
 import logging
 import os # Ensure os is imported
+import sqlite_store
+from crawl_pool import fetch_html
 
 # --- Configuration ---
 TARGET_URL = 'https://www.espncricinfo.com/records/trophy/indian-premier-league-117'
+TEAM_LIST_SELECTOR = "#main-container > div.ds-relative > div > div.ds-flex.ds-space-x-5 > div.ds-grow > div.ds-grid.ds-grid-cols-3.ds-gap-2 > div:nth-child(2) > div:nth-child(1) > div.ds-p-0 > div:nth-child(1) > div > div.ReactCollapse--collapse > div > div > ul"
 
-# Output directory for logs and CSV file
-OUTPUT_DIR = "Team_code_output" # Directory to save output files
+# Output directory for logs and CSV file (anchored to the repo so importing scrapers find the same cache)
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(REPO_ROOT, "Team_code_output") # Directory to save output files
 os.makedirs(OUTPUT_DIR, exist_ok=True) # Create directory if it doesn't exist
 
-# CSV file name
+# CSV file name (also the resolver's cache)
 CSV_FILENAME = os.path.join(OUTPUT_DIR, 'team_code.csv') # Construct full path for CSV
+WRITE_SQLITE_STORE = True # Also upsert the team list into the SQLite store (sqlite_store.py)
 
-# --- Logging Setup ---
-log_filename = os.path.join(OUTPUT_DIR, f"ipl_team_list_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(module)s:%(lineno)d - %(funcName)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logging.getLogger("selenium").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("undetected_chromedriver").setLevel(logging.WARNING)
+# --- Resolver Cache ---
+CACHE_TTL_DAYS = 30 # team_code.csv older than this is refreshed from the site on the next lookup
+UNKNOWN_TEAM_REFRESH_HOURS = 6 # An unknown team forces a refresh only if the cache is at least this old
+TRY_HTTP_FIRST = True # Try a plain HTTP fetch of the trophy page before launching a browser
+
+# --- Logging Setup (only when run as a script; importing scrapers keep their own log) ---
+log_filename = None
+
+def setup_logging():
+    global log_filename
+    log_filename = os.path.join(OUTPUT_DIR, f"ipl_team_list_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(module)s:%(lineno)d - %(funcName)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_filename, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    logging.getLogger("selenium").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+    logging.getLogger("undetected_chromedriver").setLevel(logging.WARNING)
 
-logging.info(f"Log file: {log_filename}")
-logging.info(f"CSV Output file: {CSV_FILENAME}") # Log the CSV filename
-logging.info(f"Script started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-logging.info(f"Target URL: {TARGET_URL}")
+    logging.info(f"Log file: {log_filename}")
+    logging.info(f"CSV Output file: {CSV_FILENAME}") # Log the CSV filename
+    logging.info(f"Script started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    logging.info(f"Target URL: {TARGET_URL}")
 
 # --- Helper Functions ---
 def safe_get_text(element, default='N/A'):
@@ -110,106 +124,96 @@ def setup_driver():
         raise last_exception
     return driver # Should return the driver if successful
 
-# --- Main Scraping Logic ---
-if __name__ == "__main__":
-    overall_start_time = time.time()
-    driver = None
+# --- Team List Parsing ---
+def parse_team_list(page_soup: BeautifulSoup) -> list | None:
+    """[{'Team Name', 'Team ID'}, ...] from the trophy page, or None if the team list is not on the page."""
+    team_list_ul = page_soup.select_one(TEAM_LIST_SELECTOR)
+    if not team_list_ul:
+        return None
+    # Find all direct list item children (li) of the UL
+    list_items = team_list_ul.find_all('li', recursive=False)
+    logging.info(f"Found {len(list_items)} list items in the UL.")
+
     team_data_list = []
+    for item in list_items:
+        link_tag = item.find('a', href=True) # Find the anchor tag within the list item
+        if link_tag:
+            try:
+                # Extract Team Name (look for a span first, fallback to link text)
+                team_name_span = link_tag.find('span')
+                team_name = safe_get_text(team_name_span if team_name_span else link_tag, 'Unknown Team')
+
+                # Extract Team ID from the href using the helper function
+                href = link_tag.get('href')
+                team_id = extract_team_id_from_url(href)
+
+                # Validate extracted data before adding
+                if team_name != 'Unknown Team' and team_id != 'N/A':
+                    team_data_list.append({'Team Name': team_name, 'Team ID': team_id})
+                else:
+                    logging.warning(f"Skipping entry: Could not extract valid name/ID. Name='{team_name}', ID='{team_id}', URL='{href}'")
+
+            except Exception as e_item:
+                logging.error(f"Error processing list item: {e_item}", exc_info=True)
+                logging.debug(f"Problematic list item HTML: {item}") # Log the HTML of the failing item
+        else:
+            logging.warning(f"List item found without an anchor tag (<a>): {item}")
+
+    logging.info(f"Successfully extracted data for {len(team_data_list)} teams.")
+    return team_data_list
+
+def save_debug_html(page_source: str, reason: str):
+    debug_filename = os.path.join(OUTPUT_DIR, f"debug_team_list_{reason}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
+    try:
+        with open(debug_filename, "w", encoding="utf-8") as f:
+            f.write(page_source)
+        logging.info(f"Saved page HTML for debugging ({reason}) to {debug_filename}")
+    except Exception as save_err:
+        logging.error(f"Failed to save debug HTML: {save_err}")
+
+# --- Fetching ---
+def scrape_team_list_http() -> list | None:
+    """Browserless fetch of the trophy page. None when the list is not in the served HTML (caller falls back to a browser)."""
+    try:
+        team_data_list = parse_team_list(BeautifulSoup(fetch_html(TARGET_URL), 'lxml'))
+    except Exception as e:
+        logging.warning(f"HTTP fetch of the team list failed: {e}")
+        return None
+    if not team_data_list:
+        logging.info("Team list not in the served HTML; falling back to the browser.")
+        return None
+    return team_data_list
 
+def scrape_team_list_browser() -> list:
+    """Loads the trophy page in a browser and parses the team list. Raises on driver errors or timeout."""
+    driver = None
     try:
         driver = setup_driver()
         logging.info(f"Navigating to target URL: {TARGET_URL}")
         driver.get(TARGET_URL)
 
         # --- Wait for the specific list container element ---
-        # Using the user-provided selector (might be fragile)
-        list_selector = "#main-container > div.ds-relative > div > div.ds-flex.ds-space-x-5 > div.ds-grow > div.ds-grid.ds-grid-cols-3.ds-gap-2 > div:nth-child(2) > div:nth-child(1) > div.ds-p-0 > div:nth-child(1) > div > div.ReactCollapse--collapse > div > div > ul"
-        # Consider more robust selectors if possible (e.g., using data-testid attributes if they exist)
-        # list_selector = "div[data-testid='some-unique-id-for-list'] ul" # Example
-
         wait_time = 30
-        logging.info(f"Waiting up to {wait_time}s for team list UL ('{list_selector}')...")
-
+        logging.info(f"Waiting up to {wait_time}s for team list UL ('{TEAM_LIST_SELECTOR}')...")
         try:
             # Wait for the UL element to be present in the DOM
             WebDriverWait(driver, wait_time).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, list_selector))
+                EC.presence_of_element_located((By.CSS_SELECTOR, TEAM_LIST_SELECTOR))
             )
             logging.info("Team list UL found in DOM.")
             # Add a small delay in case content loads slightly after the element appears
             time.sleep(2)
         except TimeoutException:
-            logging.error(f"Timed out waiting for the team list UL using selector: {list_selector}")
-            # Save page source for debugging if the element is not found
-            debug_filename = os.path.join(OUTPUT_DIR, f"debug_team_list_timeout_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-            try:
-                with open(debug_filename, "w", encoding="utf-8") as f:
-                    f.write(driver.page_source)
-                logging.info(f"Saved page HTML for debugging list timeout to {debug_filename}")
-            except Exception as save_err:
-                logging.error(f"Failed to save debug HTML: {save_err}")
-            raise # Re-raise the exception to stop the script if the list isn't found
+            logging.error(f"Timed out waiting for the team list UL using selector: {TEAM_LIST_SELECTOR}")
+            save_debug_html(driver.page_source, "timeout")
+            raise # Re-raise the exception to stop if the list isn't found
 
         # --- Parse the page and extract data ---
-        page_soup = BeautifulSoup(driver.page_source, 'lxml') # Using lxml parser
-        team_list_ul = page_soup.select_one(list_selector)
-
-        if not team_list_ul:
-            logging.error(f"Could not select team list UL ('{list_selector}') from parsed HTML even after waiting.")
-            # Optionally save HTML again if parsing failed after successful wait
-            debug_filename_parse = os.path.join(OUTPUT_DIR, f"debug_team_list_parse_fail_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html")
-            try:
-                with open(debug_filename_parse, "w", encoding="utf-8") as f:
-                    f.write(driver.page_source)
-                logging.info(f"Saved page HTML for debugging parse failure to {debug_filename_parse}")
-            except Exception as save_err:
-                logging.error(f"Failed to save debug HTML on parse fail: {save_err}")
-        else:
-            # Find all direct list item children (li) of the UL
-            list_items = team_list_ul.find_all('li', recursive=False)
-            logging.info(f"Found {len(list_items)} list items in the UL.")
-
-            processed_count = 0
-            for item in list_items:
-                link_tag = item.find('a', href=True) # Find the anchor tag within the list item
-                if link_tag:
-                    try:
-                        # Extract Team Name (look for a span first, fallback to link text)
-                        team_name_span = link_tag.find('span')
-                        team_name = safe_get_text(team_name_span if team_name_span else link_tag, 'Unknown Team')
-
-                        # Extract href attribute
-                        href = link_tag.get('href')
-                        # Make URL absolute (useful for context, though not strictly needed for ID)
-                        absolute_url = urljoin(TARGET_URL, href)
-
-                        # Extract Team ID from the href using the helper function
-                        team_id = extract_team_id_from_url(href)
-
-                        # Validate extracted data before adding
-                        if team_name != 'Unknown Team' and team_id != 'N/A':
-                            team_data_list.append({
-                                'Team Name': team_name,
-                                'Team ID': team_id
-                                # 'URL': absolute_url # Optional: uncomment to include URL
-                            })
-                            processed_count += 1
-                            # logging.info(f"Extracted: Name='{team_name}', ID='{team_id}'") # Verbose logging if needed
-                        else:
-                            logging.warning(f"Skipping entry: Could not extract valid name/ID. Name='{team_name}', ID='{team_id}', URL='{href}'")
-
-                    except Exception as e_item:
-                        logging.error(f"Error processing list item: {e_item}", exc_info=True)
-                        logging.debug(f"Problematic list item HTML: {item}") # Log the HTML of the failing item
-                else:
-                    logging.warning(f"List item found without an anchor tag (<a>): {item}")
-
-            logging.info(f"Successfully extracted data for {processed_count} teams.")
-
-    except WebDriverException as e_wd:
-        logging.critical(f"A WebDriver error occurred: {e_wd}", exc_info=True)
-    except Exception as e_main:
-        logging.critical(f"An unexpected error occurred during scraping: {e_main}", exc_info=True)
+        team_data_list = parse_team_list(BeautifulSoup(driver.page_source, 'lxml'))
+        if team_data_list is None:
+            logging.error(f"Could not select team list UL ('{TEAM_LIST_SELECTOR}') from parsed HTML even after waiting.")
+            save_debug_html(driver.page_source, "parse_fail")
+        return team_data_list or []
     finally:
         # --- Quit Driver ---
         if driver:
@@ -220,38 +224,167 @@ if __name__ == "__main__":
             except Exception as quit_err:
                 logging.error(f"Error closing browser: {quit_err}")
 
-        # --- Process Data, Print, and Save to CSV ---
+def save_team_codes(team_df: pd.DataFrame):
+    """Writes team_code.csv (the resolver cache) and the SQLite copy."""
+    try:
+        logging.info(f"Attempting to save data to CSV: {CSV_FILENAME}")
+        tmp_path = f"{CSV_FILENAME}.tmp" # Readers in other scrapers never see a half-written cache
+        team_df.to_csv(tmp_path, index=False, encoding='utf-8')
+        os.replace(tmp_path, CSV_FILENAME)
+        logging.info(f"Successfully saved team data to {CSV_FILENAME}")
+        if WRITE_SQLITE_STORE: sqlite_store.store_dataframe('team_codes', team_df)
+    except IOError as e_io:
+        logging.error(f"Error saving data to CSV file '{CSV_FILENAME}': {e_io}", exc_info=True)
+    except Exception as e_csv:
+        logging.error(f"An unexpected error occurred while saving to CSV: {e_csv}", exc_info=True)
+
+def refresh_team_codes() -> pd.DataFrame:
+    """Scrapes the team list (HTTP first, then browser) and rewrites the cache. Returns the teams (empty on failure)."""
+    team_data_list = scrape_team_list_http() if TRY_HTTP_FIRST else None
+    if team_data_list is None:
+        team_data_list = scrape_team_list_browser()
+    team_df = pd.DataFrame(team_data_list, columns=['Team Name', 'Team ID']).drop_duplicates('Team ID')
+    if not team_df.empty:
+        save_team_codes(team_df)
+    else:
+        logging.warning("No team data collected, CSV file will not be created.")
+    return team_df
+
+
+# --- Resolver ---
+def _normalize_name(team_name: str) -> str:
+    return re.sub(r'\s+', ' ', str(team_name)).strip().casefold()
+
+class TeamCodeResolver:
+    """
+    Team ID <-> name lookups served from team_code.csv. The site is only scraped when the cache
+    is missing, older than ttl_days, or a lookup misses and the cache is older than UNKNOWN_TEAM_REFRESH_HOURS.
+    A failed refresh falls back to the stale cache.
+    """
+
+    def __init__(self, csv_path: str = CSV_FILENAME, ttl_days: float = CACHE_TTL_DAYS):
+        self.csv_path = csv_path
+        self.ttl_seconds = ttl_days * 86400
+        self._teams = None # {team_id: team_name}, in site order
+        self._ids_by_name = {}
+        self._refreshed_for_unknown = False
+
+    def cache_age_seconds(self) -> float | None:
+        return time.time() - os.path.getmtime(self.csv_path) if os.path.exists(self.csv_path) else None
+
+    def _load_cache(self) -> dict:
+        if not os.path.exists(self.csv_path):
+            return {}
+        try:
+            cached = pd.read_csv(self.csv_path, dtype=str, keep_default_na=False, encoding='utf-8')
+            return dict(zip(cached['Team ID'].str.strip(), cached['Team Name'].str.strip()))
+        except Exception as e:
+            logging.warning(f"Could not read team cache {self.csv_path}: {e}")
+            return {}
+
+    def _set_teams(self, teams: dict):
+        self._teams = teams
+        self._ids_by_name = {_normalize_name(name): team_id for team_id, name in teams.items()}
+
+    def refresh(self) -> bool:
+        """Re-scrapes the team list. Returns True if the cache was replaced."""
+        logging.info(f"Refreshing team codes from {TARGET_URL}")
+        try:
+            team_df = refresh_team_codes()
+        except Exception as e:
+            logging.error(f"Team code refresh failed: {e}. Using the cached list.")
+            return False
+        if team_df.empty:
+            return False
+        self._set_teams(self._load_cache())
+        return True
+
+    def teams(self) -> dict:
+        """{team_id: team_name}; refreshed from the site first if the cache is missing or past its TTL."""
+        if self._teams is None:
+            age = self.cache_age_seconds()
+            if age is None or age > self.ttl_seconds:
+                logging.info(f"Team cache {'missing' if age is None else f'is {age / 86400:.1f} days old'}; refreshing.")
+                self.refresh()
+            if self._teams is None:
+                self._set_teams(self._load_cache())
+        return dict(self._teams)
+
+    def _refresh_for_unknown(self, what: str) -> bool:
+        """At most one refresh per resolver for misses, and only if the cache is not brand new."""
+        age = self.cache_age_seconds()
+        if self._refreshed_for_unknown or (age is not None and age < UNKNOWN_TEAM_REFRESH_HOURS * 3600):
+            return False
+        self._refreshed_for_unknown = True
+        logging.info(f"Unknown team {what}; refreshing team codes.")
+        return self.refresh()
+
+    def team_name(self, team_id) -> str | None:
+        team_id = str(team_id).strip()
+        if team_id not in self.teams():
+            self._refresh_for_unknown(f"ID {team_id}")
+        return self._teams.get(team_id)
+
+    def team_id(self, team_name: str) -> str | None:
+        key = _normalize_name(team_name)
+        self.teams()
+        if key not in self._ids_by_name:
+            self._refresh_for_unknown(f"'{team_name}'")
+        return self._ids_by_name.get(key)
+
+_default_resolver = None
+
+def get_resolver() -> TeamCodeResolver:
+    global _default_resolver
+    if _default_resolver is None:
+        _default_resolver = TeamCodeResolver()
+    return _default_resolver
+
+def resolve_teams(fallback: dict | None = None) -> dict:
+    """
+    {team_id: team_name} for the scrapers: the cached site list plus any fallback IDs it lacks
+    (fallback order first, so output order stays stable). Never raises; returns the fallback if no list is available.
+    """
+    try:
+        teams = get_resolver().teams()
+    except Exception as e:
+        logging.error(f"Team code lookup failed: {e}", exc_info=True)
+        teams = {}
+    if not teams:
+        logging.warning("No team codes available from the cache or the site; using the built-in team list.")
+        return dict(fallback or {})
+    resolved = {team_id: teams.get(team_id, name) for team_id, name in (fallback or {}).items()}
+    new_teams = {team_id: name for team_id, name in teams.items() if team_id not in resolved}
+    if new_teams:
+        logging.info(f"Teams not in the built-in list picked up from team codes: {new_teams}")
+    resolved.update(new_teams)
+    return resolved
+
+
+# --- Main Scraping Logic ---
+if __name__ == "__main__":
+    setup_logging()
+    overall_start_time = time.time()
+    team_df = pd.DataFrame()
+
+    try:
+        team_df = refresh_team_codes()
+    except WebDriverException as e_wd:
+        logging.critical(f"A WebDriver error occurred: {e_wd}", exc_info=True)
+    except Exception as e_main:
+        logging.critical(f"An unexpected error occurred during scraping: {e_main}", exc_info=True)
+    finally:
+        # --- Print Data ---
         logging.info("\n" + "="*20 + " Processing and Saving Data " + "="*20)
-        if team_data_list:
-            try:
-                # Create DataFrame
-                team_df = pd.DataFrame(team_data_list)
-
-                # --- Print DataFrame to console ---
-                print(f"\n--- Extracted Team Data ({len(team_df)} entries) ---")
-                pd.set_option('display.max_rows', None)    # Show all rows
-                pd.set_option('display.max_columns', None) # Show all columns
-                pd.set_option('display.width', 2000)     # Set wide display for console
-                print(team_df.to_string(index=False)) # Use to_string for better console output without index
-
-                # --- Save DataFrame to CSV ---
-                try:
-                    logging.info(f"Attempting to save data to CSV: {CSV_FILENAME}")
-                    # Save the DataFrame to CSV, without the index, using UTF-8 encoding
-                    team_df.to_csv(CSV_FILENAME, index=False, encoding='utf-8')
-                    logging.info(f"Successfully saved team data to {CSV_FILENAME}")
-                except IOError as e_io:
-                    logging.error(f"Error saving data to CSV file '{CSV_FILENAME}': {e_io}", exc_info=True)
-                except Exception as e_csv:
-                    logging.error(f"An unexpected error occurred while saving to CSV: {e_csv}", exc_info=True)
-
-            except Exception as e_df:
-                logging.error(f"Error creating or processing DataFrame: {e_df}", exc_info=True)
-        else:
-            logging.warning("No team data collected, CSV file will not be created.")
+        if not team_df.empty:
+            print(f"\n--- Extracted Team Data ({len(team_df)} entries) ---")
+            pd.set_option('display.max_rows', None)    # Show all rows
+            pd.set_option('display.max_columns', None) # Show all columns
+            pd.set_option('display.width', 2000)     # Set wide display for console
+            print(team_df.to_string(index=False)) # Use to_string for better console output without index
 
         overall_end_time = time.time()
         total_duration = overall_end_time - overall_start_time
         logging.info(f"\nScript finished in {total_duration:.2f} seconds.")
-        logging.info(f"Total Teams Found and processed: {len(team_data_list)}")
-        logging.info("="*60) # Wider separator for end log
\ No newline at end of file
+        logging.info(f"Total Teams Found and processed: {len(team_df)}")
+        logging.info("="*60) # Wider separator for end log